@@ -0,0 +1,150 @@
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+from decision_engine import POLICIES
+from field_extractor import ENTITY_SYNONYMS, FIELD_SYNONYMS
+
+# Fixed corpora for the benchmarks. Everything is derived from the files
+# in data/ and a fixed seed, so two runs on the same checkout benchmark
+# exactly the same inputs.
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+SEED = 1234
+
+VALID_FILES = ["intent_valid.jsonl", "domain_valid.jsonl", "granularity_valid.jsonl"]
+TRAIN_FILE = "intent_train.jsonl"
+TRAIN_SAMPLE_SIZE = 512
+
+# Words per synthetic long prompt
+LONG_PROMPT_WORDS = (256, 1024)
+LONG_PROMPTS_PER_SIZE = 16
+
+LARGE_POLICY_COUNT = 5000
+
+# Policy set sizes and signal count of the replay suite
+REPLAY_POLICY_COUNTS = (5000, 20000, 40000)
+REPLAY_SIGNALS = 16384
+
+DOMAINS = ["healthcare", "hr", "finance", "sales", "support", "legal"]
+
+
+def _texts(filename: str) -> List[str]:
+    with open(DATA_DIR / filename) as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def valid_prompts() -> List[str]:
+    # Each validation prompt once, in file order
+    seen = set()
+    prompts = []
+    for filename in VALID_FILES:
+        for text in _texts(filename):
+            if text not in seen:
+                seen.add(text)
+                prompts.append(text)
+    return prompts
+
+
+def train_prompts() -> List[str]:
+    texts = _texts(TRAIN_FILE)
+    return random.Random(SEED).sample(texts, min(TRAIN_SAMPLE_SIZE, len(texts)))
+
+
+def long_prompts() -> List[str]:
+    # Real prompts glued together until the word budget is reached, so the
+    # rules and the classifiers both see realistic vocabulary
+    rng = random.Random(SEED)
+    source = valid_prompts()
+    prompts = []
+    for words in LONG_PROMPT_WORDS:
+        for _ in range(LONG_PROMPTS_PER_SIZE):
+            parts = []
+            count = 0
+            while count < words:
+                text = rng.choice(source)
+                parts.append(text)
+                count += len(text.split())
+            prompts.append(" ".join(parts))
+    return prompts
+
+
+def corpora() -> Dict[str, List[str]]:
+    return {
+        "valid": valid_prompts(),
+        "train_sample": train_prompts(),
+        "long": long_prompts(),
+    }
+
+
+def small_policies() -> List[Dict]:
+    return [dict(p) for p in POLICIES]
+
+
+def _synthetic_vocabulary():
+    entities = list(ENTITY_SYNONYMS) + [f"entity_{i}" for i in range(200)]
+    fields = list(FIELD_SYNONYMS) + ["salary"] + [f"field_{i}" for i in range(300)]
+    return entities, fields
+
+
+def large_policies(count: int = LARGE_POLICY_COUNT) -> List[Dict]:
+    """
+    The shipped policies plus synthetic ones over the known entities and
+    fields and a long tail of made-up ones, with mixed gates and actions.
+    """
+    rng = random.Random(SEED)
+    entities, fields = _synthetic_vocabulary()
+
+    policies = small_policies()
+    for i in range(count - len(policies)):
+        policy = {
+            "id": f"synthetic_{i}",
+            "applies_to_entity": rng.choice(entities),
+            "applies_to_domains": ["*"],
+            "blocked_fields": rng.sample(fields, rng.randint(1, 4)),
+            "blocked_granularity": rng.choice([["record_level"], ["record_level", "aggregate"]]),
+            "action": rng.choice(["rewrite", "deny"]),
+            "reason": f"Synthetic policy {i}",
+        }
+        if rng.random() < 0.3:
+            policy["allowed_domains"] = rng.sample(DOMAINS, rng.randint(1, 2))
+        if rng.random() < 0.2:
+            policy["allowed_granularity"] = ["aggregate"]
+        policies.append(policy)
+    return policies
+
+
+def signals(extractions: List[Dict]) -> List[Dict]:
+    # Decision-engine inputs: the corpus' rule output with the ML signals
+    # drawn from a fixed rotation instead of a model
+    rng = random.Random(SEED)
+    return [
+        {
+            "intent": "read",
+            "domain": rng.choice(DOMAINS),
+            "granularity": rng.choice(["record_level", "aggregate"]),
+            **extraction,
+        }
+        for extraction in extractions
+    ]
+
+
+def replay_signals(count: int = REPLAY_SIGNALS) -> List[Dict]:
+    # Mostly distinct signals over the large_policies() vocabulary, as in
+    # a replay of a long decision log
+    rng = random.Random(SEED)
+    entities, fields = _synthetic_vocabulary()
+    return [
+        {
+            "intent": "read",
+            "domain": rng.choice(DOMAINS),
+            "granularity": rng.choice(["record_level", "aggregate"]),
+            "entities": rng.sample(entities, rng.randint(1, 3)),
+            "mentioned_fields": rng.sample(fields, rng.randint(1, 6)),
+            "implied_fields": [],
+            "requested_scope": "full" if rng.random() < 0.1 else "partial",
+        }
+        for _ in range(count)
+    ]
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import decision_engine  # noqa: E402
+import orchestrator  # noqa: E402
+from benchmarks import corpora  # noqa: E402
+from field_extractor import extract_fields_and_entities_batch  # noqa: E402
+from inference_backends import BACKENDS, INT8_ONNX_FILENAME, ONNX_FILENAME, load_classifier  # noqa: E402
+from policy_matrix import decide_vectorized, get_policy_matrix  # noqa: E402
+
+# Run from the repository root (model directories are relative):
+#
+#   python3 benchmarks/run_benchmarks.py --output bench.json
+#   python3 benchmarks/run_benchmarks.py --output bench.json --compare baseline.json
+#
+# Results are keyed "<suite>/<variant>/bs=<batch size>" so two files can be
+# diffed key by key. Record the baseline on the deployment hardware; numbers
+# from another machine are not comparable.
+
+BATCH_SIZES = [1, 8, 16, 32, 64]
+QUICK_BATCH_SIZES = [1, 16]
+
+BACKEND_FILES = {"torch": None, "onnx": ONNX_FILENAME, "onnx-int8": INT8_ONNX_FILENAME}
+
+# A benchmark is slower than the baseline when its p50 latency grows, or
+# its throughput falls, by more than this fraction
+DEFAULT_TOLERANCE = 0.10
+
+
+def measure(fn: Callable[[List[str]], object], prompts: List, batch_size: int, min_time: float) -> Dict:
+    """
+    Call fn on consecutive batches of prompts, cycling through the corpus,
+    until at least min_time seconds and one full pass have elapsed.
+    """
+    batches = [prompts[i:i + batch_size] for i in range(0, len(prompts), batch_size)]
+    for batch in batches[:3]:
+        fn(batch)
+
+    latencies = []
+    total_prompts = 0
+    started = time.perf_counter()
+    while True:
+        for batch in batches:
+            start = time.perf_counter()
+            fn(batch)
+            latencies.append(time.perf_counter() - start)
+            total_prompts += len(batch)
+        if time.perf_counter() - started >= min_time:
+            break
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "batch_size": batch_size,
+        "calls": len(latencies),
+        "prompts": total_prompts,
+        "throughput_per_s": total_prompts / elapsed,
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def available_backends(model_dir: str, backends: List[str]) -> List[str]:
+    return [
+        backend for backend in backends
+        if BACKEND_FILES[backend] is None or os.path.exists(os.path.join(model_dir, BACKEND_FILES[backend]))
+    ]
+
+
+def bench_extractor(corpus: Dict[str, List[str]], batch_sizes: List[int], min_time: float, results: Dict):
+    for name, prompts in corpus.items():
+        for batch_size in batch_sizes:
+            key = f"extract/{name}/bs={batch_size}"
+            results[key] = measure(extract_fields_and_entities_batch, prompts, batch_size, min_time)
+            _report(key, results[key])
+
+
+def bench_decide(corpus: Dict[str, List[str]], min_time: float, results: Dict):
+    signals = corpora.signals(extract_fields_and_entities_batch(corpus["valid"]))
+    original = decision_engine.POLICIES
+    try:
+        for name, policies in (("small", corpora.small_policies()), ("large", corpora.large_policies())):
+            decision_engine.reload_policies(policies)
+            for batch_size in (1, 64):
+                key = f"decide/{name}/bs={batch_size}"
+                results[key] = measure(decision_engine.decide_batch, signals, batch_size, min_time)
+                _report(key, results[key])
+            for batch_size in (64, 4096):
+                key = f"decide_vectorized/{name}/bs={batch_size}"
+                results[key] = measure(decide_vectorized, signals, batch_size, min_time)
+                _report(key, results[key])
+    finally:
+        decision_engine.reload_policies(original)
+
+
+def bench_replay(min_time: float, results: Dict):
+    # decide_batch against the forced vectorized path on mostly distinct
+    # signals, across policy set sizes: where the two cross is what
+    # policy_matrix.MIN_SLOT_DENSITY encodes
+    signals = corpora.replay_signals()
+    original = decision_engine.POLICIES
+    try:
+        for count in corpora.REPLAY_POLICY_COUNTS:
+            decision_engine.reload_policies(corpora.large_policies(count))
+            print(f"replay/policies={count}: {get_policy_matrix().density:.2f} policies per slot")
+            for name, fn in (
+                ("decide_batch", decision_engine.decide_batch),
+                ("vectorized", lambda batch: decide_vectorized(batch, force=True)),
+            ):
+                key = f"replay/{name}/policies={count}/bs=4096"
+                results[key] = measure(fn, signals, 4096, min_time)
+                _report(key, results[key])
+    finally:
+        decision_engine.reload_policies(original)
+
+
+def bench_classifiers(
+    corpus: Dict[str, List[str]],
+    backends: List[str],
+    batch_sizes: List[int],
+    min_time: float,
+    results: Dict,
+    skipped: List[str],
+):
+    for model, model_dir in orchestrator.MODEL_DIRS.items():
+        if not os.path.isdir(model_dir):
+            skipped.append(f"classifier/{model}: no {model_dir}/")
+            continue
+        usable = available_backends(model_dir, backends)
+        skipped.extend(f"classifier/{b}/{model}: not exported" for b in backends if b not in usable)
+
+        for backend in usable:
+            classifier = load_classifier(model_dir, model, backend, multitask=model == "multitask")
+
+            def run(batch, classifier=classifier):
+                return classifier.probabilities(classifier.encode(batch))
+
+            for batch_size in batch_sizes:
+                key = f"classifier/{backend}/{model}/bs={batch_size}"
+                results[key] = measure(run, corpus["valid"], batch_size, min_time)
+                _report(key, results[key])
+
+
+def bench_end_to_end(
+    corpus: Dict[str, List[str]],
+    backends: List[str],
+    batch_sizes: List[int],
+    min_time: float,
+    results: Dict,
+    skipped: List[str],
+):
+    original = orchestrator.BACKEND
+    try:
+        for backend in backends:
+            missing = [
+                name for name in orchestrator._active_model_names()
+                if backend not in available_backends(orchestrator.MODEL_DIRS[name], [backend])
+            ]
+            if missing:
+                skipped.append(f"end_to_end/{backend}: not exported for {', '.join(missing)}")
+                continue
+
+            orchestrator.BACKEND = backend
+            orchestrator.unload_models()
+            orchestrator.warmup()
+
+            for name, prompts in corpus.items():
+                for batch_size in batch_sizes:
+                    key = f"end_to_end/{backend}/{name}/bs={batch_size}"
+                    results[key] = measure(orchestrator.run_guardrail_batch, prompts, batch_size, min_time)
+                    _report(key, results[key])
+    finally:
+        orchestrator.BACKEND = original
+        orchestrator.unload_models()
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key in sorted(set(results) & set(baseline)):
+        new, old = results[key], baseline[key]
+        latency_ratio = new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else 1.0
+        throughput_ratio = old["throughput_per_s"] / new["throughput_per_s"] if new["throughput_per_s"] else float("inf")
+        flag = ""
+        if latency_ratio > 1 + tolerance or throughput_ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(
+            f"{key:55s} p50 {old['p50_ms']:9.3f} -> {new['p50_ms']:9.3f} ms ({latency_ratio - 1:+.1%})  "
+            f"throughput {old['throughput_per_s']:10.1f} -> {new['throughput_per_s']:10.1f}/s{flag}"
+        )
+    for key in sorted(set(baseline) - set(results)):
+        print(f"{key:55s} missing from this run")
+    return regressions
+
+
+def metadata(args) -> Dict:
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model_mode": orchestrator.MODEL_MODE,
+        "args": vars(args),
+    }
+    try:
+        meta["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    try:
+        import torch
+        meta["torch"] = torch.__version__
+        meta["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return meta
+
+
+def _report(key: str, result: Dict):
+    print(
+        f"{key:55s} p50 {result['p50_ms']:9.3f}  p95 {result['p95_ms']:9.3f}  "
+        f"p99 {result['p99_ms']:9.3f} ms  {result['throughput_per_s']:10.1f} prompts/s",
+        flush=True,
+    )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every guardrail stage")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Baseline results file to diff against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--suites", nargs="+", default=["extract", "decide", "classifier", "end_to_end"],
+                        choices=["extract", "decide", "replay", "classifier", "end_to_end"])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--batch-sizes", nargs="+", type=int)
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per benchmark (at least one pass)")
+    parser.add_argument("--quick", action="store_true", help="Batch sizes 1 and 16, 0.2 s each")
+    args = parser.parse_args(argv)
+
+    batch_sizes = args.batch_sizes or (QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    min_time = 0.2 if args.quick else args.min_time
+
+    corpus = corpora.corpora()
+    results = {}
+    skipped = []
+
+    if "extract" in args.suites:
+        bench_extractor(corpus, batch_sizes, min_time, results)
+    if "decide" in args.suites:
+        bench_decide(corpus, min_time, results)
+    if "replay" in args.suites:
+        bench_replay(min_time, results)
+    if "classifier" in args.suites:
+        bench_classifiers(corpus, args.backends, batch_sizes, min_time, results, skipped)
+    if "end_to_end" in args.suites:
+        bench_end_to_end(corpus, args.backends, batch_sizes, min_time, results, skipped)
+
+    for note in skipped:
+        print(f"skipped {note}")
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "meta": metadata(args),
+                "corpora": {name: len(prompts) for name, prompts in corpus.items()},
+                "skipped": skipped,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
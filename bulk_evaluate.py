@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Tuple
+
+import orchestrator
+
+# Re-runs the guardrail over a JSONL file of logged prompts:
+#
+#   python3 bulk_evaluate.py prompts.jsonl decisions.jsonl --workers 8
+#   python3 bulk_evaluate.py prompts.jsonl decisions.jsonl --workers 8 --resume
+#
+# Input lines are JSON objects with the prompt under --prompt-field (or
+# bare JSON strings). Each output line is {"line": <input line number>,
+# "result": <run_guardrail result>}, plus "id" when --id-field is given,
+# or {"line": ..., "error": ...} for an unreadable input line. Output
+# order follows the input.
+#
+# Every --checkpoint-every batches the output is fsynced and the input and
+# output byte offsets are saved to <output>.ckpt. --resume truncates the
+# output to the saved offset and continues from the saved input offset,
+# so no line is lost or written twice.
+
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path + ".ckpt"
+
+
+def load_checkpoint(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_batches(
+    f,
+    batch_size: int,
+    prompt_field: str,
+    id_field: str,
+    line_number: int,
+) -> Iterator[Tuple[List[Dict], int, int]]:
+    """
+    Yield (records, input offset after the batch, next line number).
+    Each record holds the line number and either a prompt or an error.
+    """
+    records = []
+    while True:
+        raw = f.readline()
+        if not raw:
+            break
+        line_number += 1
+        if not raw.strip():
+            continue
+
+        record = {"line": line_number}
+        try:
+            item = json.loads(raw)
+            if isinstance(item, str):
+                record["prompt"] = item
+            else:
+                record["prompt"] = item[prompt_field]
+                if id_field:
+                    record["id"] = item.get(id_field)
+            if not isinstance(record["prompt"], str):
+                raise ValueError(f"{prompt_field!r} is not a string")
+        except (ValueError, KeyError, TypeError) as exc:
+            record.pop("prompt", None)
+            record["error"] = f"unreadable input: {exc}"
+        records.append(record)
+
+        if len(records) >= batch_size:
+            yield records, f.tell(), line_number
+            records = []
+
+    if records:
+        yield records, f.tell(), line_number
+
+
+def _evaluate_now(prompts: List[str]) -> Future:
+    future = Future()
+    future.set_result(orchestrator.run_guardrail_batch(prompts) if prompts else [])
+    return future
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream a JSONL file of prompts through the guardrail")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", help="Input field copied to each output line")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (1: evaluate in this process)")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Batches between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from <output>.ckpt")
+    args = parser.parse_args(argv)
+
+    ckpt_path = checkpoint_path(args.output)
+    checkpoint = {"input_offset": 0, "output_offset": 0, "lines": 0, "written": 0}
+    if args.resume:
+        if not os.path.exists(ckpt_path):
+            parser.error(f"--resume given but {ckpt_path} does not exist")
+        checkpoint = load_checkpoint(ckpt_path)
+        # Resuming into a lost or cut-short output would leave a gap
+        # (or NUL padding) where the checkpointed lines should be
+        if not os.path.exists(args.output):
+            parser.error(f"--resume given but {args.output} does not exist")
+        size = os.path.getsize(args.output)
+        if size < checkpoint["output_offset"]:
+            parser.error(
+                f"{args.output} is {size} bytes, shorter than the checkpoint's "
+                f"{checkpoint['output_offset']}; delete {ckpt_path} to start over"
+            )
+    elif os.path.exists(ckpt_path):
+        parser.error(f"{ckpt_path} exists: pass --resume, or delete it to start over")
+
+    pool = None
+    submit = _evaluate_now
+    if args.workers > 1:
+        from worker_pool import WorkerPool
+        pool = WorkerPool(args.workers).start()
+        submit = pool.submit_batch
+
+    actions = Counter()
+    started = time.monotonic()
+    written_at_start = checkpoint["written"]
+
+    # Output is opened without truncation; on resume everything past the
+    # last checkpoint (a partly written batch) is dropped
+    mode = "r+b" if args.resume else "wb"
+    with open(args.input, "rb") as infile, open(args.output, mode) as outfile:
+        infile.seek(checkpoint["input_offset"])
+        outfile.truncate(checkpoint["output_offset"])
+        outfile.seek(checkpoint["output_offset"])
+
+        # Batches in flight, oldest first; bounded so memory stays flat
+        in_flight = deque()
+        max_in_flight = max(2, 2 * args.workers)
+        batches_since_checkpoint = 0
+
+        def write_oldest():
+            nonlocal batches_since_checkpoint
+            records, input_offset, lines, future = in_flight.popleft()
+            results = iter(future.result())
+            for record in records:
+                out = {"line": record["line"]}
+                if "id" in record:
+                    out["id"] = record["id"]
+                if "error" in record:
+                    out["error"] = record["error"]
+                else:
+                    out["result"] = next(results)
+                    actions[out["result"]["decision"]["action"]] += 1
+                outfile.write(json.dumps(out).encode() + b"\n")
+
+            checkpoint["input_offset"] = input_offset
+            checkpoint["lines"] = lines
+            checkpoint["written"] += len(records)
+            batches_since_checkpoint += 1
+            if batches_since_checkpoint >= args.checkpoint_every:
+                flush_checkpoint()
+
+        def flush_checkpoint():
+            nonlocal batches_since_checkpoint
+            outfile.flush()
+            os.fsync(outfile.fileno())
+            checkpoint["output_offset"] = outfile.tell()
+            save_checkpoint(ckpt_path, checkpoint)
+            batches_since_checkpoint = 0
+
+            elapsed = time.monotonic() - started
+            done = checkpoint["written"] - written_at_start
+            print(
+                f"{checkpoint['written']} lines written ({done / elapsed if elapsed else 0:.0f}/s)",
+                file=sys.stderr,
+            )
+
+        try:
+            batches = read_batches(
+                infile, args.batch_size, args.prompt_field, args.id_field, checkpoint["lines"]
+            )
+            for records, input_offset, lines in batches:
+                prompts = [r["prompt"] for r in records if "prompt" in r]
+                in_flight.append((records, input_offset, lines, submit(prompts)))
+                if len(in_flight) >= max_in_flight:
+                    write_oldest()
+            while in_flight:
+                write_oldest()
+            flush_checkpoint()
+        except KeyboardInterrupt:
+            print(f"Interrupted; rerun with --resume to continue from {ckpt_path}", file=sys.stderr)
+            return 130
+        finally:
+            if pool is not None:
+                pool.close()
+
+    # A finished run needs no checkpoint
+    os.remove(ckpt_path)
+    print(json.dumps({"written": checkpoint["written"], "actions": dict(actions)}), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
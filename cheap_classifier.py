@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from typing import Dict, List
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline, make_union
+
+CHEAP_MODEL_DIR = "cheap_models"
+
+TASKS = ["intent", "domain", "granularity"]
+
+# Below this top-class probability the transformer decides instead
+DEFAULT_THRESHOLDS = {
+    "intent": 0.9,
+    "domain": 0.9,
+    "granularity": 0.9,
+}
+
+
+def build_pipeline():
+    # Hashed word and character n-grams: no vocabulary to store, so the
+    # model stays a few MB and scores a prompt in tens of microseconds.
+    features = make_union(
+        HashingVectorizer(analyzer="word", ngram_range=(1, 2), n_features=2 ** 18, alternate_sign=False),
+        HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18, alternate_sign=False),
+    )
+    return make_pipeline(features, LogisticRegression(max_iter=2000, C=10.0))
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class CheapCascade:
+    """
+    First stage of the classifier cascade: one hashed n-gram linear model
+    per task, plus counters of how many prompts had to be escalated.
+    """
+
+    def __init__(self, model_dir: str = CHEAP_MODEL_DIR, thresholds: Dict[str, float] = None):
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        self.thresholds.update(thresholds or {})
+        self.models = {
+            task: joblib.load(os.path.join(model_dir, f"{task}.joblib"))
+            for task in TASKS
+        }
+        # Changes whenever the cheap models are retrained
+        self.fingerprint = "-".join(
+            str(os.stat(os.path.join(model_dir, f"{task}.joblib")).st_mtime_ns)
+            for task in TASKS
+        )
+        self._lock = threading.Lock()
+        self._counts = {task: {"total": 0, "escalated": 0} for task in TASKS}
+
+    def predict(self, task: str, prompts: List[str]) -> List[Dict]:
+        model = self.models[task]
+        probs = model.predict_proba(prompts)
+        labels = model.classes_
+        return [
+            {task: str(labels[int(row.argmax())]), "confidence": round(float(row.max()), 3)}
+            for row in probs
+        ]
+
+    def is_confident(self, task: str, result: Dict) -> bool:
+        return result["confidence"] >= self.thresholds[task]
+
+    def record(self, task: str, total: int, escalated: int):
+        with self._lock:
+            self._counts[task]["total"] += total
+            self._counts[task]["escalated"] += escalated
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                task: {
+                    **counts,
+                    "threshold": self.thresholds[task],
+                    "escalation_rate": counts["escalated"] / counts["total"] if counts["total"] else 0.0,
+                }
+                for task, counts in self._counts.items()
+            }
+
+
+def main():
+    os.makedirs(CHEAP_MODEL_DIR, exist_ok=True)
+
+    for task in TASKS:
+        train = load_jsonl(f"data/{task}_train.jsonl")
+        valid = load_jsonl(f"data/{task}_valid.jsonl")
+
+        model = build_pipeline()
+        model.fit([e["text"] for e in train], [e["label"] for e in train])
+        joblib.dump(model, os.path.join(CHEAP_MODEL_DIR, f"{task}.joblib"))
+
+        # Threshold sweep: how much traffic escalates, and how accurate the
+        # cheap model is on what it keeps
+        probs = model.predict_proba([e["text"] for e in valid])
+        preds = model.classes_[probs.argmax(axis=-1)]
+        confidence = probs.max(axis=-1)
+        correct = preds == np.array([e["label"] for e in valid])
+
+        print(f"{task}: saved to ./{CHEAP_MODEL_DIR}/{task}.joblib")
+        for threshold in (0.5, 0.6, 0.7, 0.8, 0.9, 0.95):
+            kept = confidence >= threshold
+            kept_accuracy = float(correct[kept].mean()) if kept.any() else 0.0
+            print(
+                f"  threshold={threshold:.2f} escalated={1 - kept.mean():.1%} "
+                f"cheap_accuracy_on_kept={kept_accuracy:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
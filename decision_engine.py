@@ -1,4 +1,6 @@
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Set, Tuple
 
 FULL_SCOPE_PHRASES = [
     "all info",
@@ -30,7 +32,39 @@ SAFE_AGGREGATE_TEMPLATES = {
 }
 
 
-POLICIES = [
+class PolicyList(list):
+    """
+    A list that counts its own in-place changes (append, remove, item
+    assignment, ...), so the compiled index notices them without
+    rescanning every policy on each decision. Edits inside a policy
+    dict are not seen: call reload_policies() after those.
+    """
+
+    revision = 0
+
+
+def _counted(name: str):
+    method = getattr(list, name)
+
+    def counted(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        # Bumped after the change, so a concurrent compile of the old
+        # contents is never tagged with the new revision
+        self.revision += 1
+        return result
+
+    counted.__name__ = name
+    return counted
+
+
+for _name in (
+    "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+    "__setitem__", "__delitem__", "__iadd__", "__imul__",
+):
+    setattr(PolicyList, _name, _counted(_name))
+
+
+POLICIES = PolicyList([
     {
         "id": "no_doctor_contact_record_level",
         "applies_to_entity": "doctor",
@@ -79,7 +113,7 @@ POLICIES = [
         "action": "deny",
         "reason": "Salary data is only accessible in aggregate form"
     }
-]
+])
 
 
 def detect_requested_scope(text: str) -> str:
@@ -90,7 +124,132 @@ def detect_requested_scope(text: str) -> str:
     return "partial"
 
 
-def decide(signal: Dict) -> Dict:
+# Conservative scope closure:
+# If request scope is "full", assume all sensitive fields are requested
+SENSITIVE_FIELDS = {"email", "phone", "address", "EFN", "SSN"}
+
+
+def compile_policies(policies: List[Dict]) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    Index policies by applies_to_entity and then by blocked field, with
+    the domain / granularity lists turned into sets, so decide() only
+    visits policies whose entity is mentioned and whose fields are
+    requested.
+
+    index = {entity: {field: [compiled policy, ...]}}
+    """
+    index = {}
+    for policy in policies:
+        compiled = {
+            "id": policy.get("id"),
+            "blocked_fields": frozenset(policy["blocked_fields"]),
+            "allowed_domains": frozenset(policy.get("allowed_domains") or ()),
+            "allowed_granularity": frozenset(policy.get("allowed_granularity") or ()),
+            "blocked_granularity": frozenset(policy.get("blocked_granularity") or ()),
+            "deny": policy["action"] == "deny",
+            "reason": policy["reason"],
+        }
+        by_field = index.setdefault(policy["applies_to_entity"], {})
+        for field in compiled["blocked_fields"]:
+            by_field.setdefault(field, []).append(compiled)
+    return index
+
+
+# Bumped every time the compiled policy index is rebuilt
+POLICY_VERSION = 0
+
+# (POLICIES list the index was built from, its revision, index)
+_compiled = None
+
+
+def reload_policies(policies: List[Dict] = None):
+    """
+    Recompile the policy index. Pass a new list to replace POLICIES (it
+    is copied into a PolicyList unless it already is one). Adding,
+    removing or replacing entries of POLICIES, or rebinding
+    decision_engine.POLICIES, is picked up automatically; after editing
+    a policy dict in place, call reload_policies() with no arguments.
+    """
+    global POLICIES, POLICY_VERSION, _compiled
+    if policies is not None:
+        POLICIES = policies
+    if not isinstance(POLICIES, PolicyList):
+        POLICIES = PolicyList(POLICIES)
+    policies = POLICIES
+    # Read before compiling: a change made meanwhile triggers another reload
+    revision = policies.revision
+    compiled = (policies, revision, compile_policies(policies))
+    POLICY_VERSION += 1
+    _compiled = compiled
+
+
+def get_compiled_policies() -> Dict[str, Dict[str, List[Dict]]]:
+    compiled = _compiled
+    policies = POLICIES
+    if compiled is None or compiled[0] is not policies or compiled[1] != getattr(policies, "revision", None):
+        reload_policies()
+        compiled = _compiled
+    return compiled[2]
+
+
+def requested_fields(signal: Dict) -> set:
+    """Fields a signal asks for; a full-scope request asks for every sensitive one."""
+    if signal.get("requested_scope", "partial") == "full":
+        return set(SENSITIVE_FIELDS)
+    return set(signal.get("mentioned_fields", [])) | set(
+        signal.get("implied_fields", [])
+    )
+
+
+def policy_version(tenant: str = None) -> int:
+    if tenant is not None:
+        return _tenant_policies(tenant).version
+    get_compiled_policies()
+    return POLICY_VERSION
+
+
+# Per-tenant policy sets (policy_store.PolicyStore), off by default
+_policy_store = None
+
+
+def enable_policy_store(directory: str, poll_interval_s: float = 5.0):
+    """
+    Serve decide(signal, tenant=...) from per-tenant policy files in
+    directory (see policy_store.py). Changed files are picked up every
+    poll_interval_s seconds without a restart. Calls without a tenant
+    keep using POLICIES.
+    """
+    from policy_store import PolicyStore
+
+    global _policy_store
+    disable_policy_store()
+    _policy_store = PolicyStore(directory, poll_interval_s)
+    return _policy_store
+
+
+def disable_policy_store():
+    global _policy_store
+    store, _policy_store = _policy_store, None
+    if store is not None:
+        store.close()
+
+
+def _tenant_policies(tenant: str):
+    store = _policy_store
+    if store is None:
+        raise RuntimeError("A tenant was given but no policy store is enabled")
+    return store.get(tenant)
+
+
+def resolve_policies(tenant: str = None) -> Tuple[Dict[str, Dict[str, List[Dict]]], Dict]:
+    """(compiled policy index, safe aggregate templates) for tenant, or for POLICIES."""
+    if tenant is None:
+        return get_compiled_policies(), SAFE_AGGREGATE_TEMPLATES
+    policy_set = _tenant_policies(tenant)
+    return policy_set.index, policy_set.templates
+
+
+def decide(signal: Dict, tenant: str = None) -> Dict:
     """
     signal = {
         intent,
@@ -98,73 +257,138 @@ def decide(signal: Dict) -> Dict:
         mentioned_fields,
         implied_fields
     }
+
+    With a tenant, the tenant's policies and safe aggregate templates from
+    the enabled policy store are used instead of POLICIES.
+    """
+    table = _decision_table
+    if table is not None:
+        return table.decide(signal, tenant)
+    return _evaluate(signal, *resolve_policies(tenant))
+
+
+def _candidate_policies(
+    entities: List[str],
+    requested_fields: set,
+    index: Dict[str, Dict[str, List[Dict]]],
+) -> List[Dict]:
+    # Policies on a mentioned entity that block at least one requested field
+    candidates = []
+    visited = set()
+    for entity in dict.fromkeys(entities):
+        by_field = index.get(entity)
+        if not by_field:
+            continue
+        for field in requested_fields:
+            for policy in by_field.get(field, ()):
+                if id(policy) not in visited:
+                    visited.add(id(policy))
+                    candidates.append(policy)
+    return candidates
+
+
+def required_signals(signal: Dict, tenant: str = None) -> Set[str]:
     """
+    Which model-derived signals ("domain", "granularity") can still change
+    decide(signal), given its rule-derived parts (entities, fields,
+    requested_scope). decide() never reads intent.
+    """
+    candidates = _candidate_policies(
+        signal.get("entities", []),
+        requested_fields(signal),
+        resolve_policies(tenant)[0],
+    )
+    if not candidates:
+        # Nothing can be blocked: allow whatever the models say
+        return set()
 
-    blocked = []
-    reasons = []
+    required = set()
+    if any(policy["allowed_domains"] for policy in candidates):
+        required.add("domain")
+    # Granularity gates policies and decides whether alternatives are
+    # suggested; a "full" scope request is always record_level.
+    if signal.get("requested_scope", "partial") != "full":
+        required.add("granularity")
+    return required
 
-    # Conservative scope closure:
-    # If request scope is "full", assume all sensitive fields are requested
-    SENSITIVE_FIELDS = {"email", "phone", "address", "EFN", "SSN"}
 
-    requested_scope = signal.get("requested_scope", "partial")
+def deny_certain(signal: Dict, tenant: str = None) -> bool:
+    """
+    True when decide() returns "deny" for this signal's rule-derived parts
+    (entities, fields, requested_scope) whatever domain and granularity
+    the models report, so the models need not run.
+    """
+    index, templates = resolve_policies(tenant)
+    candidates = _candidate_policies(
+        signal.get("entities", []),
+        requested_fields(signal),
+        index,
+    )
+    if not any(policy["deny"] for policy in candidates):
+        return False
+
+    # Domain only matters through allow-lists: one domain outside every
+    # list plus each listed domain covers all cases
+    domains = {None}.union(*(policy["allowed_domains"] for policy in candidates))
+    granularities = ["record_level"]
+    if signal.get("requested_scope", "partial") != "full":
+        granularities.append("aggregate")
+
+    return all(
+        _evaluate({**signal, "domain": domain, "granularity": granularity}, index, templates)["action"] == "deny"
+        for domain in domains
+        for granularity in granularities
+    )
+
+
+def _evaluate(signal: Dict, index: Dict[str, Dict[str, List[Dict]]], templates: Dict = None) -> Dict:
+    blocked = set()
+    reasons = set()
+    deny = False
+
     granularity = signal.get("granularity", "record_level")
+    domain = signal.get("domain")
+    entities = signal.get("entities", [])
+    requested = requested_fields(signal)
 
-    if requested_scope == "full":
-        requested_fields = set(SENSITIVE_FIELDS)
-    else:
-        requested_fields = set(signal.get("mentioned_fields", [])) | set(
-            signal.get("implied_fields", [])
-        )
+    for policy in _candidate_policies(entities, requested, index):
+        hits = policy["blocked_fields"] & requested
 
-    for policy in POLICIES:
-        if policy["applies_to_entity"] not in signal.get("entities", []):
-            continue
+        # Any deny policy on a mentioned entity whose fields are
+        # requested turns a block into a deny, whatever its gates say
+        if policy["deny"]:
+            deny = True
 
         # Domain allow-list check
-        if policy.get("allowed_domains"):
-            if signal.get("domain") not in policy["allowed_domains"]:
-                pass
-            else:
-                continue
+        if policy["allowed_domains"] and domain in policy["allowed_domains"]:
+            continue
 
         # Granularity allow-list check
-        if policy.get("allowed_granularity"):
-            if granularity in policy["allowed_granularity"]:
-                continue
+        if granularity in policy["allowed_granularity"]:
+            continue
 
         # Granularity block check
-        if policy.get("blocked_granularity"):
-            if granularity not in policy["blocked_granularity"]:
-                continue
+        if policy["blocked_granularity"] and granularity not in policy["blocked_granularity"]:
+            continue
 
-        for field in policy["blocked_fields"]:
-            if field in requested_fields:
-                blocked.append(field)
-                reasons.append(policy["reason"])
+        blocked |= hits
+        reasons.add(policy["reason"])
 
     if blocked:
-        # if any deny policy matched → deny, else rewrite
-        action = "deny" if any(
-            p["action"] == "deny"
-            and p["applies_to_entity"] in signal.get("entities", [])
-            and any(f in requested_fields for f in p["blocked_fields"])
-            for p in POLICIES
-        ) else "rewrite"
-
         decision = {
-            "action": action,
-            "blocked_fields": sorted(set(blocked)),
-            "reason": "; ".join(sorted(set(reasons)))
+            "action": "deny" if deny else "rewrite",
+            "blocked_fields": sorted(blocked),
+            "reason": "; ".join(sorted(reasons))
         }
 
         # Deterministic safe alternatives:
         # Only suggest when record-level data is blocked
         if granularity == "record_level":
-            entities = signal.get("entities", [])
             if entities:
                 entity = entities[0]
-                decision["suggested_alternatives"] = SAFE_AGGREGATE_TEMPLATES.get(entity, [])
+                if templates is None:
+                    templates = SAFE_AGGREGATE_TEMPLATES
+                decision["suggested_alternatives"] = list(templates.get(entity, ()))
 
         return decision
 
@@ -175,6 +399,148 @@ def decide(signal: Dict) -> Dict:
     }
 
 
+class DecisionTable:
+    """
+    Memoized decide() results for the current policy set.
+
+    Signals are canonicalised to the parts decide() actually reads: the
+    first entity (for suggested alternatives), the entities and requested
+    fields that some policy governs, domain and granularity. Up to
+    max_entries decisions are kept, least recently used evicted first.
+    The table empties itself whenever POLICY_VERSION changes; edits to
+    SAFE_AGGREGATE_TEMPLATES need an explicit clear(). Tenant decisions
+    are keyed by tenant and policy-set version, so a reloaded tenant
+    never hits entries of its old version (they age out of the LRU).
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+        self._governed_fields = frozenset()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def _sync(self):
+        # Called under the lock
+        index = get_compiled_policies()
+        if self._version != POLICY_VERSION:
+            self._entries.clear()
+            self._version = POLICY_VERSION
+            self._index = index
+            self._governed_fields = frozenset(
+                field for by_field in index.values() for field in by_field
+            )
+
+    @staticmethod
+    def _key(signal: Dict, index: Dict, governed_fields: frozenset, version: Tuple) -> Tuple:
+        entities = signal.get("entities", [])
+        return version + (
+            entities[0] if entities else None,
+            frozenset(e for e in entities if e in index),
+            frozenset(requested_fields(signal) & governed_fields),
+            signal.get("domain"),
+            signal.get("granularity", "record_level"),
+        )
+
+    def decide(self, signal: Dict, tenant: str = None) -> Dict:
+        policy_set = templates = None
+        if tenant is not None:
+            policy_set = _tenant_policies(tenant)
+            templates = policy_set.templates
+
+        with self._lock:
+            self._sync()
+            if policy_set is None:
+                index = self._index
+                key = self._key(signal, index, self._governed_fields, (None,))
+            else:
+                index = policy_set.index
+                key = self._key(signal, index, policy_set.governed_fields, (tenant, policy_set.version))
+            decision = self._entries.get(key)
+            if decision is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy_decision(decision)
+            self.misses += 1
+
+        decision = _evaluate(signal, index, templates)
+
+        with self._lock:
+            if self._index is index or policy_set is not None:
+                self._entries[key] = decision
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return copy_decision(decision)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "policy_version": self._version,
+        }
+
+
+def copy_decision(decision: Dict) -> Dict:
+    """A copy of a decision whose lists the caller may modify."""
+    copied = dict(decision)
+    copied["blocked_fields"] = list(decision["blocked_fields"])
+    if "suggested_alternatives" in decision:
+        copied["suggested_alternatives"] = list(decision["suggested_alternatives"])
+    return copied
+
+
+# Shared decision table used by decide() (off by default)
+_decision_table = None
+
+
+def enable_decision_table(max_entries: int = 100_000) -> DecisionTable:
+    global _decision_table
+    _decision_table = DecisionTable(max_entries)
+    return _decision_table
+
+
+def disable_decision_table():
+    global _decision_table
+    _decision_table = None
+
+
+def decide_batch(signals: List[Dict], tenant: str = None) -> List[Dict]:
+    """
+    decide() for each signal. The policies are resolved once for the whole
+    batch, and signals that only differ in parts no policy reads (see
+    DecisionTable) are evaluated once.
+    """
+    table = _decision_table
+    if table is not None:
+        return [table.decide(signal, tenant) for signal in signals]
+
+    index, templates = resolve_policies(tenant)
+    governed_fields = frozenset(field for by_field in index.values() for field in by_field)
+    decisions = {}
+    results = []
+    for signal in signals:
+        key = DecisionTable._key(signal, index, governed_fields, ())
+        decision = decisions.get(key)
+        if decision is None:
+            decision = decisions[key] = _evaluate(signal, index, templates)
+            results.append(decision)
+        else:
+            results.append(copy_decision(decision))
+    return results
+
+
 if __name__ == "__main__":
     test_signal = {
         "intent": "data_retrieval",
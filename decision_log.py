@@ -0,0 +1,333 @@
+import collections
+import glob
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List
+
+SEGMENT_PREFIX = "decisions-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+# Suffix of the segment currently being written
+ACTIVE_SUFFIX = ".part"
+
+ON_FULL = ("block", "drop")
+
+# Shared by every DecisionLog in the process, so two logs writing to the
+# same directory never pick the same segment name
+_sequences = itertools.count(1)
+
+
+class DecisionLog:
+    """
+    Append-only audit log of guardrail results, written off the request path.
+
+    append() serializes a record into a bounded in-memory buffer; a
+    background thread drains it in batches into gzip-compressed JSONL
+    segments under directory. A segment is rotated once it holds
+    max_segment_bytes of uncompressed data or is max_segment_age_s old.
+    Each batch is flushed to the OS, and fsync runs at most every
+    fsync_interval_s (and on rotation and close), so a crash loses at
+    most that window.
+
+    When the buffer holds capacity records, on_full="block" makes
+    append() wait for room (up to block_timeout_s, then drop) and
+    on_full="drop" drops the record; both count drops in stats(). A
+    batch that cannot be written (disk full, segment removed) is dropped
+    and counted in write_errors; the writer carries on with a new segment.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        capacity: int = 10_000,
+        on_full: str = "block",
+        block_timeout_s: float = 5.0,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age_s: float = 3600.0,
+        fsync_interval_s: float = 1.0,
+        max_batch: int = 1024,
+    ):
+        if on_full not in ON_FULL:
+            raise ValueError(f"on_full must be one of {ON_FULL}, got {on_full!r}")
+
+        self.directory = directory
+        self.capacity = capacity
+        self.on_full = on_full
+        self.block_timeout_s = block_timeout_s
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age_s = max_segment_age_s
+        self.fsync_interval_s = fsync_interval_s
+        self.max_batch = max_batch
+
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self.write_errors = 0
+        self.last_error = None
+
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        # Set if the writer thread exits for any reason; append() then drops
+        self._stopped = False
+
+        # Writer-thread state
+        self._raw = None
+        self._gzip = None
+        self._segment_path = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._last_fsync = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        _seal_orphans(directory)
+
+        self._thread = threading.Thread(target=self._loop, name="guardrail-decision-log", daemon=True)
+        self._thread.start()
+
+    def append(self, record: Dict) -> bool:
+        """
+        Queue one record; returns False if it was dropped. The record is
+        serialized here, so later changes to it by the caller are not logged.
+        """
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DecisionLog is closed")
+            if len(self._buffer) >= self.capacity and self.on_full == "block":
+                self._not_full.wait_for(
+                    lambda: len(self._buffer) < self.capacity or self._closed or self._stopped,
+                    self.block_timeout_s,
+                )
+            if len(self._buffer) >= self.capacity or self._closed or self._stopped:
+                self.dropped += 1
+                return False
+            self._buffer.append(line)
+            self.appended += 1
+            self._not_empty.notify()
+        return True
+
+    def close(self):
+        # Everything already appended is written and fsynced first
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._thread.join()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "appended": self.appended,
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": len(self._buffer),
+                "segments": self.segments,
+                "write_errors": self.write_errors,
+                "last_error": self.last_error,
+            }
+
+    def __enter__(self) -> "DecisionLog":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _loop(self):
+        try:
+            while True:
+                with self._lock:
+                    self._not_empty.wait_for(lambda: self._buffer or self._closed, self._tick())
+                    batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.max_batch))]
+                    closing = self._closed and not self._buffer
+                    if batch:
+                        self._not_full.notify_all()
+
+                try:
+                    if batch:
+                        self._write(batch)
+                    self._maybe_rotate_or_sync()
+                    if closing:
+                        self._close_segment()
+                except Exception as exc:
+                    self._abandon_segment(exc, len(batch))
+
+                if closing:
+                    return
+        finally:
+            # Never leave append() waiting on a writer that is gone
+            with self._lock:
+                self._stopped = True
+                self.dropped += len(self._buffer)
+                self._buffer.clear()
+                self._not_full.notify_all()
+
+    def _tick(self) -> float:
+        # Wake up in time for the next fsync or age-based rotation
+        if self._raw is None:
+            return None
+        now = time.monotonic()
+        deadlines = [self._segment_opened + self.max_segment_age_s]
+        if self._last_fsync is not None:
+            deadlines.append(self._last_fsync + self.fsync_interval_s)
+        return max(0.0, min(deadlines) - now)
+
+    def _write(self, batch: List[bytes]):
+        if self._raw is None:
+            self._open_segment()
+        data = b"".join(batch)
+        self._gzip.write(data)
+        # Complete deflate blocks reach the file after every batch, so a
+        # reader (or a crash) sees every record written so far
+        self._gzip.flush(zlib.Z_SYNC_FLUSH)
+        self._raw.flush()
+        if self._last_fsync is None:
+            self._last_fsync = time.monotonic()
+        self._segment_bytes += len(data)
+        with self._lock:
+            self.written += len(batch)
+
+    def _maybe_rotate_or_sync(self):
+        if self._raw is None:
+            return
+        now = time.monotonic()
+        if self._segment_bytes >= self.max_segment_bytes or now - self._segment_opened >= self.max_segment_age_s:
+            self._close_segment()
+        elif self._last_fsync is not None and now - self._last_fsync >= self.fsync_interval_s:
+            os.fsync(self._raw.fileno())
+            # Nothing new to sync until the next write
+            self._last_fsync = None
+
+    def _open_segment(self):
+        sequence = next(_sequences)
+        name = f"{SEGMENT_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{sequence:06d}{SEGMENT_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._raw = open(self._segment_path + ACTIVE_SUFFIX, "ab")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        self._segment_bytes = 0
+        self._segment_opened = time.monotonic()
+        self._last_fsync = None
+
+    def _close_segment(self):
+        if self._raw is None:
+            return
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self._segment_path + ACTIVE_SUFFIX, self._segment_path)
+        self._raw = self._gzip = None
+        with self._lock:
+            self.segments += 1
+
+    def _abandon_segment(self, exc: Exception, lost: int):
+        # The batch may be partly in the segment; drop it and start a
+        # fresh segment on the next write rather than append to a
+        # stream in an unknown state
+        with self._lock:
+            self.write_errors += 1
+            self.dropped += lost
+            self.last_error = f"{type(exc).__name__}: {exc}"
+        if self._raw is None:
+            return
+        try:
+            self._raw.close()
+            os.replace(self._segment_path + ACTIVE_SUFFIX, self._segment_path)
+        except OSError:
+            pass
+        self._raw = self._gzip = None
+
+
+def _segment_pid(path: str) -> int:
+    # decisions-<time>-<pid>-<sequence>.jsonl.gz.part
+    name = os.path.basename(path)[len(SEGMENT_PREFIX): -len(SEGMENT_SUFFIX + ACTIVE_SUFFIX)]
+    try:
+        return int(name.split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def _seal_orphans(directory: str):
+    # Segments left active by a crashed process keep every synced record;
+    # give them their final name so readers treat them as complete. A
+    # segment whose writer is still running (another process, or another
+    # DecisionLog in this one) is left alone.
+    for path in glob.glob(os.path.join(directory, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}{ACTIVE_SUFFIX}")):
+        pid = _segment_pid(path)
+        if pid is None or _pid_alive(pid):
+            continue
+        try:
+            os.replace(path, path[: -len(ACTIVE_SUFFIX)])
+        except FileNotFoundError:
+            # Sealed by another process starting up at the same time
+            pass
+
+
+def segment_paths(directory: str, include_active: bool = False) -> List[str]:
+    # Names start with the open time, so name order is write order
+    pattern = f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"
+    paths = glob.glob(os.path.join(directory, pattern))
+    if include_active:
+        paths += glob.glob(os.path.join(directory, pattern + ACTIVE_SUFFIX))
+    return sorted(paths, key=os.path.basename)
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """
+    Stream the records of one segment. A segment cut short by a crash (no
+    gzip trailer, a partial block or a partial last line) yields every
+    record that was complete on disk.
+    """
+    # zlib rather than gzip.open: GzipFile raises on a truncated stream
+    # and loses whatever it had decompressed in that read
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(64 * 1024)
+            if not raw:
+                break
+            while raw:
+                try:
+                    pending += decompressor.decompress(raw)
+                except zlib.error:
+                    raw = b""
+                    break
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+
+                # Concatenated gzip members: continue with the next one
+                raw = decompressor.unused_data if decompressor.eof else b""
+                if decompressor.eof:
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+def read_decisions(directory: str, include_active: bool = False) -> Iterator[Dict]:
+    """
+    Stream every logged record under directory, oldest segment first.
+    include_active also reads segments still being written.
+    """
+    for path in segment_paths(directory, include_active):
+        yield from read_segment(path)
@@ -1,29 +1,28 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
+
+from inference_backends import load_classifier, label_results
 
 DOMAIN_MODEL_DIR = "domain_model"
 
-tokenizer = AutoTokenizer.from_pretrained(DOMAIN_MODEL_DIR)
-model = AutoModelForSequenceClassification.from_pretrained(DOMAIN_MODEL_DIR)
-model.eval()
+# "torch" (default), "onnx" (run export_onnx.py first) or "onnx-int8"
+BACKEND = os.environ.get("ABBOX_BACKEND", "torch")
+
+classifier = load_classifier(DOMAIN_MODEL_DIR, "domain", BACKEND)
+tokenizer = classifier.tokenizer
+
+
+def __getattr__(name: str):
+    # Keep <module>.model working for existing callers: the torch model,
+    # or the classifier itself on the ONNX backends
+    if name == "model":
+        return getattr(classifier, "model", classifier)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def predict_domain(text: str):
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128,
-    )
-    with torch.no_grad():
-        logits = model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
-
-    pred_id = int(torch.argmax(probs))
-    label = model.config.id2label[pred_id]
-    conf = float(probs[pred_id])
-
-    return {"domain": label, "confidence": round(conf, 3)}
+    inputs = classifier.encode([text])
+    probs = classifier.probabilities(inputs)["domain"]
+    return label_results(probs, classifier.task_labels["domain"], "domain")[0]
 
 if __name__ == "__main__":
     print(predict_domain("Show me 1 employee with all info"))
\ No newline at end of file
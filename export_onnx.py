@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+import torch
+from torch import nn
+
+from inference_backends import ONNX_FILENAME, OnnxClassifier, TorchClassifier
+
+# name -> (model dir, jsonl files used to check parity after export)
+EXPORTS = {
+    "intent": ("intent_model", ["data/intent_valid.jsonl", "data/intent_train.jsonl"]),
+    "domain": ("domain_model", ["data/domain_valid.jsonl", "data/domain_train.jsonl"]),
+    "granularity": ("granularity_model", ["data/granularity_valid.jsonl", "data/granularity_train.jsonl"]),
+    "multitask": ("multitask_model", [
+        "data/intent_valid.jsonl",
+        "data/domain_valid.jsonl",
+        "data/granularity_valid.jsonl",
+        "data/intent_train.jsonl",
+    ]),
+}
+
+# Max allowed |p_torch - p_onnx| on any class probability
+DEFAULT_TOLERANCE = 1e-3
+PARITY_PROMPTS = 256
+
+
+class _LogitsOnly(nn.Module):
+    # Plain (input_ids, attention_mask) -> logits tuple signature for export
+    def __init__(self, classifier: TorchClassifier):
+        super().__init__()
+        self.classifier = classifier
+        self.model = classifier.model
+
+    def forward(self, input_ids, attention_mask):
+        logits = self.classifier.forward({"input_ids": input_ids, "attention_mask": attention_mask})
+        return tuple(logits[task] for task in self.classifier.tasks)
+
+
+def load_prompts(paths: List[str], limit: int) -> List[str]:
+    prompts = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    prompts.append(json.loads(line)["text"])
+                if len(prompts) >= limit:
+                    return prompts
+    return prompts
+
+
+def export(name: str, model_dir: str, filename: str, opset: int) -> TorchClassifier:
+    reference = TorchClassifier(model_dir, name, multitask=name == "multitask")
+    # A padded batch, so masking is traced as a real dependency on
+    # attention_mask rather than folded away
+    sample = reference.encode(["Show me 3 doctors with all info except EFN", "Tell me a joke"])
+
+    torch.onnx.export(
+        _LogitsOnly(reference).eval(),
+        (sample["input_ids"], sample["attention_mask"]),
+        os.path.join(model_dir, filename),
+        input_names=["input_ids", "attention_mask"],
+        output_names=[f"{task}_logits" for task in reference.tasks],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            **{f"{task}_logits": {0: "batch"} for task in reference.tasks},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+    return reference
+
+
+def check_parity(reference: TorchClassifier, candidate: OnnxClassifier, prompts: List[str], batch_size: int = 32) -> Dict:
+    max_diff = 0.0
+    mismatches = 0
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        expected = reference.probabilities(reference.encode(batch))
+        actual = candidate.probabilities(candidate.encode(batch))
+        for task in reference.tasks:
+            max_diff = max(max_diff, float(np.abs(expected[task] - actual[task]).max()))
+            mismatches += int((expected[task].argmax(-1) != actual[task].argmax(-1)).sum())
+
+    return {
+        "prompts": len(prompts),
+        "max_abs_prob_diff": max_diff,
+        "label_mismatches": mismatches,
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the classifiers to ONNX and check parity with PyTorch")
+    parser.add_argument("models", nargs="*", default=["intent", "domain", "granularity"], choices=sorted(EXPORTS))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.models:
+        model_dir, data_files = EXPORTS[name]
+        tmp_name = ONNX_FILENAME + ".tmp"
+        tmp_path = os.path.join(model_dir, tmp_name)
+
+        reference = export(name, model_dir, tmp_name, args.opset)
+        candidate = OnnxClassifier(model_dir, name, multitask=name == "multitask", onnx_filename=tmp_name)
+        report = check_parity(reference, candidate, load_prompts(data_files, PARITY_PROMPTS))
+
+        ok = report["label_mismatches"] == 0 and report["max_abs_prob_diff"] <= args.tolerance
+        if ok:
+            os.replace(tmp_path, os.path.join(model_dir, ONNX_FILENAME))
+        else:
+            os.remove(tmp_path)
+            failed = True
+
+        status = "ok" if ok else "FAILED"
+        print(f"{name}: {status} {json.dumps(report)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,9 @@
-import re
-from typing import List, Dict
+import hashlib
+import json
+import os
+from typing import Callable, List, Dict, Set
+
+from pattern_matcher import FlatPatternMatcher, PatternMatcher, write_index
 
 # 1) Known entities and how users refer to them
 ENTITY_SYNONYMS = {
@@ -35,60 +39,192 @@ FULL_SCOPE_PHRASES = [
     "complete record",
 ]
 
-def detect_requested_scope(text: str) -> str:
-    text = text.lower()
-    for phrase in FULL_SCOPE_PHRASES:
-        if phrase in text:
-            return "full"
-    return "partial"
-
+# 4) Phrases that pull in IMPLIED_FIELDS_BY_ENTITY
+IMPLIED_SCOPE_PHRASES = [
+    "all info",
+    "all information",
+]
 
-def normalize(text: str) -> str:
-    return text.lower()
+# Synonyms are matched as literal, word-bounded phrases (same as
+# rf"\b{s}\b"); scope phrases are matched as plain substrings.
+_matcher = None
 
+# Fingerprint of the vocabularies _matcher was built from
+_vocabulary_version = None
 
-def extract_entities(text: str) -> List[str]:
-    text = normalize(text)
-    found = []
 
+def build_matcher() -> PatternMatcher:
+    # Text is lowercased before matching, so synonyms are too
+    matcher = PatternMatcher()
     for entity, synonyms in ENTITY_SYNONYMS.items():
         for s in synonyms:
-            if re.search(rf"\b{s}\b", text):
-                found.append(entity)
-                break
+            matcher.add(normalize(s), ("entity", entity))
+    for field, synonyms in FIELD_SYNONYMS.items():
+        for s in synonyms:
+            matcher.add(normalize(s), ("field", field))
+    for phrase in FULL_SCOPE_PHRASES:
+        matcher.add(phrase, ("scope", "full"), word_boundary=False)
+    for phrase in IMPLIED_SCOPE_PHRASES:
+        matcher.add(phrase, ("scope", "implied"), word_boundary=False)
+    return matcher.compile()
 
-    return found
 
+def rebuild_matcher():
+    """
+    Recompile the matcher after changing any of the vocabularies above.
+    """
+    global _matcher, _vocabulary_version
+    _matcher = build_matcher()
+    encoded = json.dumps(
+        [ENTITY_SYNONYMS, FIELD_SYNONYMS, IMPLIED_FIELDS_BY_ENTITY, FULL_SCOPE_PHRASES, IMPLIED_SCOPE_PHRASES],
+        sort_keys=True,
+    ).encode()
+    _vocabulary_version = "builtin:" + hashlib.sha256(encoded).hexdigest()[:16]
 
-def extract_mentioned_fields(text: str) -> List[str]:
-    text = normalize(text)
-    found = []
 
-    for field, synonyms in FIELD_SYNONYMS.items():
-        for s in synonyms:
-            if re.search(rf"\b{s}\b", text):
-                found.append(field)
-                break
+def vocabulary_version() -> str:
+    """
+    Fingerprint of the vocabularies in use; changes with every
+    rebuild_matcher() or load_catalog() that changes them.
+    """
+    return _vocabulary_version
+
 
+# Data catalogs: tens of thousands of column names and synonyms, kept in a
+# JSON file instead of the dicts above:
+#
+#   {
+#     "entities": {"employee": ["employee", "staff", ...], ...},
+#     "fields": {"phone": ["phone", "mobile", "tel_no", ...], ...},
+#     "implied_fields": {"employee": ["address", "phone"], ...}
+#   }
+#
+# load_catalog() replaces the three vocabularies with the catalog's and
+# matches with a FlatPatternMatcher memory-mapped from <catalog>.acindex.
+# The index is rebuilt (and rewritten atomically) only when the catalog or
+# the built-in scope phrases change, so later processes start without
+# recompiling the matcher and all of them share the index pages.
+CATALOG_INDEX_SUFFIX = ".acindex"
+
+# Bump when build_matcher() changes what goes into the matcher
+CATALOG_INDEX_VERSION = 1
+
+
+def _catalog_key(raw: bytes) -> str:
+    digest = hashlib.sha256(raw)
+    digest.update(json.dumps([CATALOG_INDEX_VERSION, FULL_SCOPE_PHRASES, IMPLIED_SCOPE_PHRASES]).encode())
+    return digest.hexdigest()
+
+
+def _validate_catalog(catalog: Dict, path: str):
+    if not isinstance(catalog, dict) or not isinstance(catalog.get("entities"), dict) or not isinstance(catalog.get("fields"), dict):
+        raise ValueError(f"{path}: a catalog needs \"entities\" and \"fields\" objects")
+    for section in ("entities", "fields", "implied_fields"):
+        for name, values in catalog.get(section, {}).items():
+            if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+                raise ValueError(f"{path}: {section}[{name!r}] must be a list of non-empty strings")
+
+
+def load_catalog(path: str, index_path: str = None):
+    """
+    Use the vocabularies of a catalog file from now on. The matcher index
+    is read from index_path (default: next to the catalog) when it was
+    built from this catalog, else rebuilt and saved there. If the index
+    cannot be written, the freshly built matcher is still used.
+    """
+    global ENTITY_SYNONYMS, FIELD_SYNONYMS, IMPLIED_FIELDS_BY_ENTITY, _matcher, _vocabulary_version
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    catalog = json.loads(raw)
+    _validate_catalog(catalog, path)
+    key = _catalog_key(raw)
+    index_path = index_path or path + CATALOG_INDEX_SUFFIX
+
+    matcher = None
+    try:
+        matcher = FlatPatternMatcher(index_path)
+        if matcher.key != key:
+            matcher = None
+    except (OSError, ValueError):
+        matcher = None
+
+    ENTITY_SYNONYMS = catalog["entities"]
+    FIELD_SYNONYMS = catalog["fields"]
+    IMPLIED_FIELDS_BY_ENTITY = catalog.get("implied_fields", {})
+
+    if matcher is None:
+        built = build_matcher()
+        try:
+            write_index(built, index_path, key)
+            matcher = FlatPatternMatcher(index_path)
+        except OSError:
+            # Read-only location: match with the in-memory automaton
+            matcher = built
+
+    _matcher = matcher
+    _vocabulary_version = "catalog:" + key[:16]
+
+
+def _scan(normalized_text: str) -> Dict[str, Set[str]]:
+    found = {"entity": set(), "field": set(), "scope": set()}
+    for kind, value in _matcher.payloads(normalized_text):
+        found[kind].add(value)
     return found
 
 
-def extract_implied_fields(text: str, entities: List[str]) -> List[str]:
-    text = normalize(text)
+def normalize(text: str) -> str:
+    return text.lower()
+
+
+def _entities(found: Dict[str, Set[str]]) -> List[str]:
+    return [e for e in ENTITY_SYNONYMS if e in found["entity"]]
+
+
+def _mentioned_fields(found: Dict[str, Set[str]]) -> List[str]:
+    return [f for f in FIELD_SYNONYMS if f in found["field"]]
+
+
+def _implied_fields(found: Dict[str, Set[str]], entities: List[str]) -> List[str]:
     implied = []
 
-    if "all info" in text or "all information" in text:
+    if "implied" in found["scope"]:
         for entity in entities:
             implied.extend(IMPLIED_FIELDS_BY_ENTITY.get(entity, []))
 
     return list(set(implied))
 
 
+def _requested_scope(found: Dict[str, Set[str]]) -> str:
+    return "full" if "full" in found["scope"] else "partial"
+
+
+def detect_requested_scope(text: str) -> str:
+    return _requested_scope(_scan(normalize(text)))
+
+
+def extract_entities(text: str) -> List[str]:
+    return _entities(_scan(normalize(text)))
+
+
+def extract_mentioned_fields(text: str) -> List[str]:
+    return _mentioned_fields(_scan(normalize(text)))
+
+
+def extract_implied_fields(text: str, entities: List[str]) -> List[str]:
+    return _implied_fields(_scan(normalize(text)), entities)
+
+
 def extract_fields_and_entities(text: str) -> Dict:
-    entities = extract_entities(text)
-    mentioned_fields = extract_mentioned_fields(text)
-    implied_fields = extract_implied_fields(text, entities)
-    requested_scope = detect_requested_scope(text)
+    # One lowercase + one pass over the text for every signal
+    return _extraction(_scan(normalize(text)))
+
+
+def _extraction(found: Dict[str, Set[str]]) -> Dict:
+    entities = _entities(found)
+    mentioned_fields = _mentioned_fields(found)
+    implied_fields = _implied_fields(found, entities)
+    requested_scope = _requested_scope(found)
 
     implied_fields = [
         f for f in implied_fields if f not in mentioned_fields
@@ -102,6 +238,67 @@ def extract_fields_and_entities(text: str) -> Dict:
     }
 
 
+rebuild_matcher()
+
+if os.environ.get("ABBOX_CATALOG"):
+    load_catalog(os.environ["ABBOX_CATALOG"])
+
+
+def extract_fields_and_entities_batch(texts: List[str]) -> List[Dict]:
+    """
+    extract_fields_and_entities for each text; texts that normalize to the
+    same string (templated prompts, retries) are scanned once.
+    """
+    extractions = {}
+    results = []
+    for text in texts:
+        normalized = normalize(text)
+        extraction = extractions.get(normalized)
+        if extraction is None:
+            extraction = extractions[normalized] = _extraction(_scan(normalized))
+            results.append(extraction)
+        else:
+            results.append({key: list(value) if isinstance(value, list) else value for key, value in extraction.items()})
+    return results
+
+
+# Long inputs are scanned this many characters at a time
+LONG_INPUT_CHUNK_CHARS = 2048
+
+
+def extract_fields_and_entities_chunked(
+    text: str,
+    chunk_chars: int = LONG_INPUT_CHUNK_CHARS,
+    stop: Callable[[Dict], bool] = None,
+) -> Dict:
+    """
+    extract_fields_and_entities, scanning the text one chunk at a time.
+
+    After each chunk stop(extraction so far) is called; if it returns True
+    the scan ends there and the result only covers the text read so far.
+    Without an early stop the result equals extract_fields_and_entities.
+    """
+    normalized = normalize(text)
+    found = {"entity": set(), "field": set(), "scope": set()}
+
+    # Each match is counted in the chunk where it ends. The slice reaches
+    # back far enough for the longest pattern plus the character before
+    # it, and one character ahead, so word boundaries are checked against
+    # the real neighbours.
+    overlap = _matcher.max_pattern_length + 1
+    for start in range(0, max(len(normalized), 1), chunk_chars):
+        end = min(len(normalized), start + chunk_chars)
+        offset = max(0, start - overlap)
+        for _, match_end, (kind, value) in _matcher.iter_matches(normalized[offset:end + 1]):
+            if start < offset + match_end <= end:
+                found[kind].add(value)
+
+        if stop is not None and end < len(normalized) and stop(_extraction(found)):
+            break
+
+    return _extraction(found)
+
+
 if __name__ == "__main__":
     prompt = "Show me 3 doctors with all info except EFN"
     result = extract_fields_and_entities(prompt)
@@ -1,22 +1,28 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
+
+from inference_backends import load_classifier, label_results
 
 MODEL_DIR = "granularity_model"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-model.eval()
+# "torch" (default), "onnx" (run export_onnx.py first) or "onnx-int8"
+BACKEND = os.environ.get("ABBOX_BACKEND", "torch")
+
+classifier = load_classifier(MODEL_DIR, "granularity", BACKEND)
+tokenizer = classifier.tokenizer
+
+
+def __getattr__(name: str):
+    # Keep <module>.model working for existing callers: the torch model,
+    # or the classifier itself on the ONNX backends
+    if name == "model":
+        return getattr(classifier, "model", classifier)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def predict_granularity(text: str):
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128)
-    with torch.no_grad():
-        logits = model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
-    pred_id = int(torch.argmax(probs))
-    return {
-        "granularity": model.config.id2label[pred_id],
-        "confidence": round(float(probs[pred_id]), 3),
-    }
+    inputs = classifier.encode([text])
+    probs = classifier.probabilities(inputs)["granularity"]
+    return label_results(probs, classifier.task_labels["granularity"], "granularity")[0]
 
 if __name__ == "__main__":
     print(predict_granularity("Show average salary by team"))
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# "torch": eager PyTorch (default)
+# "onnx": ONNX Runtime on CPU, using <model_dir>/model.onnx from export_onnx.py
+# "onnx-int8": the int8 model published by quantize_models.py
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_FILENAME = "model.onnx"
+INT8_ONNX_FILENAME = "model.int8.onnx"
+
+MAX_LENGTH = 128
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def tokenizer_fingerprint(tokenizer, return_tensors: str) -> Optional[str]:
+    """
+    Hash of everything that determines a fast tokenizer's output (vocab,
+    merges, normalizer, pre/post-processing, truncation settings), or
+    None when the tokenizer cannot be fingerprinted and must not be shared.
+    """
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is None:
+        return None
+
+    digest = hashlib.sha1()
+    digest.update(type(tokenizer).__name__.encode())
+    digest.update(return_tensors.encode())
+    digest.update(f"{tokenizer.model_max_length}:{tokenizer.padding_side}:{tokenizer.truncation_side}".encode())
+    digest.update(backend.to_str().encode())
+    return digest.hexdigest()
+
+
+class Classifier:
+    """
+    A tokenizer plus a model with one or more classification heads.
+
+    probabilities() returns {task: (batch, num_labels) array}; a
+    single-task model exposes one task named after its model slot
+    (intent / domain / granularity).
+    """
+
+    return_tensors = "np"
+
+    def __init__(self, tokenizer, task_labels: Dict[str, Dict[int, str]]):
+        self.tokenizer = tokenizer
+        self.task_labels = task_labels
+        # Classifiers with equal fingerprints can share one tokenizer
+        # instance and one encoding of a batch
+        self.tokenizer_fingerprint = tokenizer_fingerprint(tokenizer, self.return_tensors)
+        # Fast tokenizers mutate their Rust-side truncation/padding state on
+        # every call and raise "Already borrowed" when called concurrently
+        self.tokenizer_lock = threading.Lock()
+
+    @property
+    def tasks(self) -> List[str]:
+        return list(self.task_labels)
+
+    def encode(self, prompts: List[str]):
+        with self.tokenizer_lock:
+            return self.tokenizer(
+                prompts,
+                return_tensors=self.return_tensors,
+                truncation=True,
+                padding=True,
+                max_length=MAX_LENGTH,
+            )
+
+    def encode_windows(self, prompts: List[str], stride: int) -> Tuple[List[Dict], List[int]]:
+        """
+        Split each prompt into overlapping MAX_LENGTH-token windows that
+        share stride tokens with their neighbour. Returns the unpadded
+        windows (pass a group of them to pad_windows) and, per window,
+        the index of the prompt it came from.
+        """
+        with self.tokenizer_lock:
+            encoded = self.tokenizer(
+                prompts,
+                truncation=True,
+                max_length=MAX_LENGTH,
+                stride=stride,
+                return_overflowing_tokens=True,
+            )
+        keys = [k for k in encoded.keys() if k not in ("overflow_to_sample_mapping", "offset_mapping")]
+        windows = [
+            {key: encoded[key][i] for key in keys}
+            for i in range(len(encoded["input_ids"]))
+        ]
+        return windows, list(encoded["overflow_to_sample_mapping"])
+
+    def pad_windows(self, windows: List[Dict]):
+        with self.tokenizer_lock:
+            return self.tokenizer.pad(windows, padding=True, return_tensors=self.return_tensors)
+
+    def probabilities(self, inputs) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+
+class TorchClassifier(Classifier):
+    return_tensors = "pt"
+
+    def __init__(self, model_dir: str, task: str, multitask: bool = False, device=None):
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        if multitask:
+            from multitask_model import MultiTaskClassifier
+            model = MultiTaskClassifier.from_pretrained(model_dir)
+            task_labels = {t: model.id2label(t) for t in model.task_labels}
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+            task_labels = {task: model.config.id2label}
+
+        if device is not None:
+            model.to(device)
+        model.eval()
+
+        super().__init__(tokenizer, task_labels)
+        self.model = model
+        self.multitask = multitask
+        self.device = device
+
+    def forward(self, inputs) -> Dict:
+        import torch
+
+        if self.device is not None:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+
+        if self.multitask:
+            return {task: outputs[f"{task}_logits"] for task in self.task_labels}
+        return {self.tasks[0]: outputs.logits}
+
+    def probabilities(self, inputs) -> Dict[str, np.ndarray]:
+        import torch
+
+        return {
+            task: torch.softmax(logits, dim=-1).cpu().numpy()
+            for task, logits in self.forward(inputs).items()
+        }
+
+
+class OnnxClassifier(Classifier):
+    def __init__(
+        self,
+        model_dir: str,
+        task: str,
+        multitask: bool = False,
+        onnx_filename: str = ONNX_FILENAME,
+        intra_op_threads: int = None,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        if multitask:
+            import json
+            from multitask_model import TASK_LABELS_FILE
+            with open(os.path.join(model_dir, TASK_LABELS_FILE)) as f:
+                task_labels = {t: dict(enumerate(labels)) for t, labels in json.load(f).items()}
+        else:
+            task_labels = {task: AutoConfig.from_pretrained(model_dir).id2label}
+
+        super().__init__(tokenizer, task_labels)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, onnx_filename),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def probabilities(self, inputs) -> Dict[str, np.ndarray]:
+        feed = {name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names}
+        outputs = self.session.run(self.output_names, feed)
+        # export_onnx.py names outputs "<task>_logits"
+        return {
+            name[: -len("_logits")]: _softmax(logits)
+            for name, logits in zip(self.output_names, outputs)
+        }
+
+
+def load_classifier(
+    model_dir: str,
+    task: str,
+    backend: str = "torch",
+    multitask: bool = False,
+    device=None,
+    intra_op_threads: int = None,
+) -> Classifier:
+    if backend == "torch":
+        return TorchClassifier(model_dir, task, multitask, device=device)
+    if backend == "onnx":
+        return OnnxClassifier(model_dir, task, multitask, intra_op_threads=intra_op_threads)
+    if backend == "onnx-int8":
+        return OnnxClassifier(
+            model_dir,
+            task,
+            multitask,
+            onnx_filename=INT8_ONNX_FILENAME,
+            intra_op_threads=intra_op_threads,
+        )
+    raise ValueError(f"Unknown inference backend: {backend!r}")
+
+
+def label_results(probs: np.ndarray, id2label: Dict[int, str], key: str) -> List[Dict]:
+    results = []
+    for row in probs:
+        pred_id = int(row.argmax())
+        results.append({key: id2label[pred_id], "confidence": round(float(row[pred_id]), 3)})
+    return results
@@ -1,37 +1,33 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
+
+from inference_backends import load_classifier, label_results
 
 MODEL_DIR = "intent_model"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
-device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
-model.to(device)
-model.eval()
+# "torch" (default), "onnx" (run export_onnx.py first) or "onnx-int8"
+BACKEND = os.environ.get("ABBOX_BACKEND", "torch")
+
+device = None
+if BACKEND == "torch":
+    import torch
+    device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
+
+classifier = load_classifier(MODEL_DIR, "intent", BACKEND, device=device)
+tokenizer = classifier.tokenizer
+
+
+def __getattr__(name: str):
+    # Keep <module>.model working for existing callers: the torch model,
+    # or the classifier itself on the ONNX backends
+    if name == "model":
+        return getattr(classifier, "model", classifier)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def predict_intent(text: str):
-    inputs = tokenizer(
-        text,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128
-    )
-    inputs = {k: v.to(device) for k, v in inputs.items()}
-
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
-        probs = torch.softmax(logits, dim=-1)[0]
-
-    pred_id = int(torch.argmax(probs))
-    intent = model.config.id2label[pred_id]
-    confidence = float(probs[pred_id])
-
-    return {
-        "intent": intent,
-        "confidence": round(confidence, 3)
-    }
+    inputs = classifier.encode([text])
+    probs = classifier.probabilities(inputs)["intent"]
+    return label_results(probs, classifier.task_labels["intent"], "intent")[0]
 
 
 if __name__ == "__main__":
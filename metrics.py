@@ -0,0 +1,161 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+# Upper bounds in seconds; stages range from microseconds (decide) to
+# hundreds of milliseconds (a CPU forward pass on a full batch)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+CONFIDENCE_BUCKETS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
+
+# name -> (type, buckets, help)
+DEFINITIONS = {
+    "stage_seconds": ("histogram", LATENCY_BUCKETS, "Time spent per call of each pipeline stage"),
+    "stage_prompts": ("counter", None, "Prompts processed by each pipeline stage"),
+    "model_confidence": ("histogram", CONFIDENCE_BUCKETS, "Top-class confidence of each classifier"),
+    "decisions_total": ("counter", None, "Decisions returned, by action"),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds values <= buckets[i]."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th value
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in zip(self.buckets + (float("inf"),), self._running()):
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def _running(self) -> Iterator[int]:
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class Metrics:
+    """
+    Thread-safe registry of the pipeline's histograms and counters.
+
+    Series are keyed by metric name plus labels (e.g. stage="forward",
+    model="intent"). Export with prometheus_text() or snapshot().
+    """
+
+    def __init__(self, namespace: str = "abbox"):
+        self.namespace = namespace
+        # (name, sorted label items) -> Histogram or int
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        kind, buckets, _ = DEFINITIONS[name]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, stage: str, prompts: int = None, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+            if prompts is not None:
+                self.inc("stage_prompts", prompts, stage=stage, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        {name: [{"labels": {...}, ...}]}: counters carry "value",
+        histograms count, sum, mean, approximate p50/p95/p99 and
+        cumulative bucket counts.
+        """
+        snapshot = {}
+        with self._lock:
+            for (name, labels), series in sorted(self._series.items()):
+                entry = {"labels": dict(labels)}
+                if isinstance(series, Histogram):
+                    entry.update(
+                        count=series.count,
+                        sum=series.sum,
+                        mean=series.sum / series.count if series.count else 0.0,
+                        p50=series.quantile(0.50),
+                        p95=series.quantile(0.95),
+                        p99=series.quantile(0.99),
+                        buckets=dict(series.cumulative()),
+                    )
+                else:
+                    entry["value"] = series
+                snapshot.setdefault(name, []).append(entry)
+        return snapshot
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        described = set()
+        with self._lock:
+            for (name, labels), series in sorted(self._series.items()):
+                full_name = f"{self.namespace}_{name}"
+                kind, _, help_text = DEFINITIONS[name]
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {full_name} {help_text}")
+                    lines.append(f"# TYPE {full_name} {kind}")
+
+                if isinstance(series, Histogram):
+                    for bound, total in series.cumulative():
+                        lines.append(f"{full_name}_bucket{_labels(labels + (('le', bound),))} {total}")
+                    lines.append(f"{full_name}_sum{_labels(labels)} {series.sum!r}")
+                    lines.append(f"{full_name}_count{_labels(labels)} {series.count}")
+                else:
+                    lines.append(f"{full_name}{_labels(labels)} {series}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(items: Tuple[Tuple[str, str], ...]) -> str:
+    if not items:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in items
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Turns concurrent single-item calls into batched calls of batch_fn.
+
+    A batch is flushed when it holds max_batch_size items or when its
+    oldest item has waited max_wait_ms, whichever comes first. batch_fn
+    must return one result per item, in input order.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="guardrail-micro-batcher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, future))
+        return future
+
+    def run(self, item: Any, timeout: float = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self):
+        # Items already queued are still flushed before the worker exits
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._flush(batch)
+
+    def _flush(self, batch: List):
+        # Callers that gave up (cancelled futures) are dropped from the batch
+        live = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        try:
+            results = list(self.batch_fn([item for item, _ in live]))
+            if len(results) != len(live):
+                raise RuntimeError(f"batch_fn returned {len(results)} results for {len(live)} items")
+        except BaseException as exc:
+            # Every caller gets an answer, or it would wait forever
+            for _, future in live:
+                future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(live, results):
+            future.set_result(result)
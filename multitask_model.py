@@ -0,0 +1,114 @@
+import json
+import os
+from typing import Dict, List
+
+import torch
+from torch import nn
+from transformers import AutoModel
+
+# Task order is also the order of the logits returned by forward()
+TASKS = ["intent", "domain", "granularity"]
+
+HEADS_FILE = "heads.pt"
+TASK_LABELS_FILE = "task_labels.json"
+
+
+class ClassificationHead(nn.Module):
+    # Same shape as RobertaClassificationHead: <s> token -> dense -> tanh -> out
+    def __init__(self, hidden_size: int, num_labels: int, dropout: float = 0.1):
+        super().__init__()
+        self.dropout = nn.Dropout(dropout)
+        self.dense = nn.Linear(hidden_size, hidden_size)
+        self.out_proj = nn.Linear(hidden_size, num_labels)
+
+    def forward(self, features):
+        x = features[:, 0, :]
+        x = self.dropout(x)
+        x = torch.tanh(self.dense(x))
+        x = self.dropout(x)
+        return self.out_proj(x)
+
+
+class MultiTaskClassifier(nn.Module):
+    """
+    One shared encoder pass, one classification head per task.
+
+    task_labels = {
+        "intent": [...],
+        "domain": [...],
+        "granularity": [...]
+    }
+    """
+
+    def __init__(self, encoder, task_labels: Dict[str, List[str]]):
+        super().__init__()
+        self.encoder = encoder
+        self.task_labels = {task: list(task_labels[task]) for task in TASKS}
+        hidden_size = encoder.config.hidden_size
+        self.heads = nn.ModuleDict({
+            task: ClassificationHead(hidden_size, len(labels))
+            for task, labels in self.task_labels.items()
+        })
+
+    def id2label(self, task: str) -> Dict[int, str]:
+        return dict(enumerate(self.task_labels[task]))
+
+    def forward(
+        self,
+        input_ids,
+        attention_mask=None,
+        intent_labels=None,
+        domain_labels=None,
+        granularity_labels=None,
+    ) -> Dict:
+        features = self.encoder(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+        ).last_hidden_state
+
+        outputs = {}
+        for task in TASKS:
+            outputs[f"{task}_logits"] = self.heads[task](features)
+
+        # Each training row is labelled for one task only; the other
+        # tasks carry -100 and are ignored by the loss.
+        task_targets = {
+            "intent": intent_labels,
+            "domain": domain_labels,
+            "granularity": granularity_labels,
+        }
+        loss = None
+        for task, labels in task_targets.items():
+            if labels is None or not bool((labels != -100).any()):
+                continue
+            task_loss = nn.functional.cross_entropy(
+                outputs[f"{task}_logits"], labels, ignore_index=-100
+            )
+            loss = task_loss if loss is None else loss + task_loss
+
+        if loss is not None:
+            return {"loss": loss, **outputs}
+        return outputs
+
+    def save_pretrained(self, model_dir: str):
+        os.makedirs(model_dir, exist_ok=True)
+        self.encoder.save_pretrained(model_dir)
+        torch.save(self.heads.state_dict(), os.path.join(model_dir, HEADS_FILE))
+        with open(os.path.join(model_dir, TASK_LABELS_FILE), "w") as f:
+            json.dump(self.task_labels, f, indent=2)
+
+    @classmethod
+    def from_pretrained(cls, model_dir: str) -> "MultiTaskClassifier":
+        with open(os.path.join(model_dir, TASK_LABELS_FILE)) as f:
+            task_labels = json.load(f)
+
+        encoder = AutoModel.from_pretrained(model_dir, add_pooling_layer=False)
+        model = cls(encoder, task_labels)
+
+        state = torch.load(
+            os.path.join(model_dir, HEADS_FILE),
+            map_location="cpu",
+            weights_only=True,
+        )
+        model.heads.load_state_dict(state)
+        return model
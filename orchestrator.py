@@ -1,122 +1,604 @@
-from typing import Dict
+import asyncio
+import collections
+import copy
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Dict, List
 
-# Intent analyzer
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+# torch / transformers are imported on first model use only, so the
+# rule-only paths (extraction, decide, rewrite) stay cheap to import.
 
 # Local modules
-from field_extractor import extract_fields_and_entities
-from decision_engine import decide
+from field_extractor import (
+    LONG_INPUT_CHUNK_CHARS,
+    extract_fields_and_entities_batch,
+    extract_fields_and_entities_chunked,
+    vocabulary_version,
+)
+import decision_engine
+from decision_engine import decide_batch, deny_certain, policy_version, required_signals
 from prompt_rewriter import rewrite_prompt
+from decision_log import DecisionLog
+from micro_batcher import MicroBatcher
+from metrics import Metrics
+from result_cache import ResultCache
 
 GRANULARITY_CONFIDENCE_THRESHOLD = 0.75
 
+# "separate": three fine-tuned classifiers, one encoder pass each
+# "multitask": one shared encoder with three heads (train_multitask.py)
+MODEL_MODE = os.environ.get("ABBOX_MODEL_MODE", "separate")
+if MODEL_MODE not in ("separate", "multitask"):
+    raise ValueError(f"Unknown ABBOX_MODEL_MODE: {MODEL_MODE!r}")
+
 INTENT_MODEL_DIR = "intent_model"
+DOMAIN_MODEL_DIR = "domain_model"
+GRANULARITY_MODEL_DIR = "granularity_model"
+MULTITASK_MODEL_DIR = "multitask_model"
 
-intent_tokenizer = AutoTokenizer.from_pretrained(INTENT_MODEL_DIR)
-intent_model = AutoModelForSequenceClassification.from_pretrained(INTENT_MODEL_DIR)
-intent_model.eval()
+# "torch": eager PyTorch; "onnx": ONNX Runtime on CPU (see export_onnx.py);
+# "onnx-int8": quantized ONNX model (see quantize_models.py)
+BACKEND = os.environ.get("ABBOX_BACKEND", "torch")
 
-DOMAIN_MODEL_DIR = "domain_model"
+MODEL_DIRS = {
+    "intent": INTENT_MODEL_DIR,
+    "domain": DOMAIN_MODEL_DIR,
+    "granularity": GRANULARITY_MODEL_DIR,
+    "multitask": MULTITASK_MODEL_DIR,
+}
 
-domain_tokenizer = AutoTokenizer.from_pretrained(DOMAIN_MODEL_DIR)
-domain_model = AutoModelForSequenceClassification.from_pretrained(DOMAIN_MODEL_DIR)
-domain_model.eval()
+# name -> inference_backends.Classifier, filled on first use
+_models = {}
+_models_lock = threading.Lock()
 
-GRANULARITY_MODEL_DIR = "granularity_model"
+# model directory -> fingerprint of its artifacts, taken when the model
+# is loaded (or first asked for by model_version())
+_model_versions = {}
 
-granularity_tokenizer = AutoTokenizer.from_pretrained(GRANULARITY_MODEL_DIR)
-granularity_model = AutoModelForSequenceClassification.from_pretrained(GRANULARITY_MODEL_DIR)
-granularity_model.eval()
+# tokenizer fingerprint -> (tokenizer, lock) kept for it
+_tokenizers = {}
 
-def predict_intent(prompt: str) -> Dict:
-    inputs = intent_tokenizer(
-        prompt,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128
+# Thread pool for running independent stages concurrently (off by default)
+_stage_pool = None
+
+# Per-stage intra-op thread count, set by enable_parallel_stages()
+_intra_op_threads = None
+
+# Stage timers, decision counts and confidence histograms (off by default)
+_metrics = None
+
+
+def enable_metrics() -> Metrics:
+    """
+    Time every pipeline stage (tokenize, forward per model, cascade,
+    extract, decide, rewrite, total) and count decisions per action.
+    Export with metrics.prometheus_text() or metrics.snapshot().
+    """
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+
+def disable_metrics():
+    global _metrics
+    _metrics = None
+
+
+def _stage(stage: str, prompts: int = None, **labels):
+    metrics = _metrics
+    if metrics is None:
+        return nullcontext()
+    return metrics.time(stage, prompts, **labels)
+
+
+def _load_model(name: str):
+    from inference_backends import load_classifier
+
+    return load_classifier(
+        MODEL_DIRS[name],
+        name,
+        BACKEND,
+        multitask=name == "multitask",
+        intra_op_threads=_intra_op_threads,
     )
 
-    with torch.no_grad():
-        logits = intent_model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
 
-    pred_id = int(torch.argmax(probs))
-    intent = intent_model.config.id2label[pred_id]
-    confidence = float(probs[pred_id])
+def _get_model(name: str):
+    loaded = _models.get(name)
+    if loaded is None:
+        with _models_lock:
+            loaded = _models.get(name)
+            if loaded is None:
+                _model_versions[MODEL_DIRS[name]] = _artifact_fingerprint(MODEL_DIRS[name])
+                loaded = _load_model(name)
+                _share_tokenizer(loaded)
+                _models[name] = loaded
+    return loaded
+
+
+def _share_tokenizer(classifier):
+    # All three classifiers are fine-tuned from distilroberta-base, so
+    # their tokenizers are normally identical: keep a single instance.
+    fingerprint = classifier.tokenizer_fingerprint
+    if fingerprint is None:
+        return
+    shared = _tokenizers.setdefault(fingerprint, (classifier.tokenizer, classifier.tokenizer_lock))
+    classifier.tokenizer, classifier.tokenizer_lock = shared
+
+
+def _artifact_fingerprint(model_dir: str) -> str:
+    # Cheap stand-in for hashing the weights: a retrain rewrites these files
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(model_dir)):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, model_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def model_version() -> str:
+    """
+    Fingerprint of everything besides the policies that shapes a result:
+    the model artifacts for MODEL_MODE, BACKEND, the granularity
+    threshold, the extractor vocabularies and the optional stages. Built
+    from configuration, so it never loads a model.
+    """
+    names = _active_model_names()
+    version = "+".join(f"{name}:{_artifact_version(MODEL_DIRS[name])}" for name in names)
+    version += f"+backend:{BACKEND}+granularity-threshold:{GRANULARITY_CONFIDENCE_THRESHOLD}"
+    version += f"+vocabulary:{vocabulary_version()}"
+
+    cascade = _cascade
+    if cascade is not None:
+        thresholds = ",".join(f"{t}={cascade.thresholds[t]}" for t in SIGNAL_TASKS)
+        version += f"+cascade:{cascade.fingerprint}:{thresholds}"
+    if DEMAND_DRIVEN_SIGNALS:
+        version += "+demand-driven"
+    long_inputs = _long_inputs
+    if long_inputs is not None:
+        version += "+long-inputs:{stride}:{max_windows}:{chunk_chars}".format(**long_inputs)
+    return version
+
+
+def _artifact_version(model_dir: str) -> str:
+    version = _model_versions.get(model_dir)
+    if version is None:
+        # Not loaded yet: the files it will be loaded from
+        version = _model_versions.setdefault(model_dir, _artifact_fingerprint(model_dir))
+    return version
 
+
+def _active_model_names() -> List[str]:
+    if MODEL_MODE == "multitask":
+        return ["multitask"]
+    return ["intent", "domain", "granularity"]
+
+
+def warmup():
+    """
+    Load the models for MODEL_MODE and run one prompt through the full
+    pipeline, so the first real request does not pay the startup cost.
+    """
+    for name in _active_model_names():
+        _get_model(name)
+    run_guardrail_batch(["warmup"])
+
+
+def unload_models():
+    """
+    Drop every loaded model, e.g. after changing BACKEND or MODEL_MODE;
+    the next request loads them again.
+    """
+    with _models_lock:
+        _models.clear()
+        _model_versions.clear()
+        _tokenizers.clear()
+
+
+def __getattr__(name: str):
+    # Keep orchestrator.intent_model, orchestrator.domain_tokenizer, ...
+    # working for existing callers; they now load on first access.
+    for suffix, attr in (("_tokenizer", "tokenizer"), ("_model", "model")):
+        if name.endswith(suffix) and name[: -len(suffix)] in MODEL_DIRS:
+            classifier = _get_model(name[: -len(suffix)])
+            return getattr(classifier, attr, classifier)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Upper bound on prompts per forward pass; each batch is only padded to
+# its own longest prompt.
+MAX_BATCH_SIZE = 32
+
+
+def _length_sorted_chunks(prompts: List[str]) -> List[List[int]]:
+    # Group prompts of similar length so dynamic padding stays short
+    order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+    return [order[i:i + MAX_BATCH_SIZE] for i in range(0, len(order), MAX_BATCH_SIZE)]
+
+
+def _predict_shared(names: List[str], prompts: List[str]) -> Dict[str, List[Dict]]:
+    """
+    Run the classifiers loaded as `names`, which must share a tokenizer
+    fingerprint, on one encoding per chunk. Returns, per name and prompt,
+    {task: {task: label, "confidence": ...}} for each of its heads.
+    """
+    from inference_backends import label_results
+
+    classifiers = {name: _get_model(name) for name in names}
+    encoder = classifiers[names[0]]
+    results = {name: [None] * len(prompts) for name in names}
+
+    for chunk in _length_sorted_chunks(prompts):
+        with _stage("tokenize", len(chunk), model="+".join(names)):
+            inputs = encoder.encode([prompts[i] for i in chunk])
+
+        chunk_probs = _forward_all(classifiers, inputs, len(chunk))
+        for name, classifier in classifiers.items():
+            probs = chunk_probs[name]
+            per_task = {
+                task: label_results(probs[task], classifier.task_labels[task], task)
+                for task in classifier.tasks
+            }
+            for pos, i in enumerate(chunk):
+                results[name][i] = {task: rows[pos] for task, rows in per_task.items()}
+    return results
+
+
+def _forward(name: str, classifier, inputs, size: int) -> Dict:
+    with _stage("forward", size, model=name):
+        return classifier.probabilities(inputs)
+
+
+def _forward_all(classifiers: Dict, inputs, size: int) -> Dict[str, Dict]:
+    # Forward passes are independent once the chunk is encoded
+    pool = _stage_pool
+    if pool is not None and len(classifiers) > 1:
+        futures = {
+            name: pool.submit(_forward, name, classifier, inputs, size)
+            for name, classifier in classifiers.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
     return {
-        "intent": intent,
-        "confidence": round(confidence, 3)
+        name: _forward(name, classifier, inputs, size)
+        for name, classifier in classifiers.items()
     }
 
 
-def predict_domain(prompt: str) -> dict:
-    inputs = domain_tokenizer(
-        prompt,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128,
+# Long-input mode (off by default): prompts longer than one MAX_LENGTH
+# window are scored window by window instead of being truncated.
+_long_inputs = None
+
+MIXED_DOMAIN = "mixed"
+
+# Per task, the labels that win over the others when windows disagree
+WINDOW_PRIORITY = {
+    "intent": ["write", "read"],
+    "granularity": ["record_level"],
+}
+
+# Most conservative value of each signal: once every task of a prompt has
+# reached it, its remaining windows cannot change the result
+WINDOW_SATURATED = {
+    "intent": "write",
+    "granularity": "record_level",
+    "domain": MIXED_DOMAIN,
+}
+
+
+def enable_long_inputs(stride: int = 32, max_windows: int = 64, chunk_chars: int = LONG_INPUT_CHUNK_CHARS):
+    """
+    Score every MAX_LENGTH-token window of a prompt (neighbours overlap by
+    stride tokens) instead of truncating it. Windows of all prompts share
+    batched passes, and window results are combined conservatively: any
+    write, any record_level, and a "mixed" domain when the windows
+    disagree. A prompt stops being scored once all its signals are at
+    their most conservative value. Past max_windows windows the remaining
+    text counts as unknown, so each signal gets that value.
+
+    Rules are scanned chunk_chars characters at a time. When the rules
+    alone make a deny certain (decision_engine.deny_certain), the scan
+    stops there and no model runs for that prompt.
+    """
+    global _long_inputs
+    _long_inputs = {"stride": stride, "max_windows": max_windows, "chunk_chars": chunk_chars}
+
+
+def disable_long_inputs():
+    global _long_inputs
+    _long_inputs = None
+
+
+def _aggregate_windows(task: str, results: List[Dict], truncated: bool) -> Dict:
+    labels = [r[task] for r in results]
+    distinct = set(labels)
+
+    priority = [label for label in WINDOW_PRIORITY.get(task, []) if label in distinct]
+    if priority:
+        # The strongest evidence for the conservative label
+        label = priority[0]
+        confidence = max(r["confidence"] for r in results if r[task] == label)
+    else:
+        if len(distinct) == 1:
+            label = labels[0]
+        elif task == "domain":
+            label = MIXED_DOMAIN
+        else:
+            label = max(distinct, key=labels.count)
+        # The weakest window bounds the confidence of a benign label
+        confidence = min(r["confidence"] for r in results if r[task] == label or label == MIXED_DOMAIN)
+
+    if truncated and label != WINDOW_SATURATED.get(task, label):
+        label, confidence = WINDOW_SATURATED[task], 0.0
+    return {task: label, "confidence": confidence}
+
+
+def _window_saturated(scored: List[Dict], tasks: List[str]) -> bool:
+    for task in tasks:
+        labels = {window[task][task] for window in scored}
+        saturated = WINDOW_SATURATED.get(task)
+        if saturated is None:
+            return False
+        if not (saturated in labels or (task == "domain" and len(labels) > 1)):
+            return False
+    return True
+
+
+def _predict_windows(names: List[str], prompts: List[str]) -> Dict[str, List[Dict]]:
+    """
+    _predict_shared for long-input mode: same result shape, with each
+    prompt's per-window results combined by _aggregate_windows.
+    """
+    from inference_backends import label_results
+
+    config = _long_inputs
+    classifiers = {name: _get_model(name) for name in names}
+    encoder = classifiers[names[0]]
+    tasks = [task for classifier in classifiers.values() for task in classifier.tasks]
+
+    with _stage("tokenize", len(prompts), model="+".join(names)):
+        windows, owners = encoder.encode_windows(prompts, config["stride"])
+
+    per_prompt = [[] for _ in prompts]
+    for w, owner in enumerate(owners):
+        per_prompt[owner].append(w)
+    truncated = [len(ws) > config["max_windows"] for ws in per_prompt]
+
+    # Every prompt's first window, then every second window, ... so short
+    # prompts finish early and long ones can stop as soon as they saturate
+    queue = collections.deque(
+        w for _, _, w in sorted(
+            (pos, owner, w)
+            for owner, ws in enumerate(per_prompt)
+            for pos, w in enumerate(ws[:config["max_windows"]])
+        )
     )
-    with torch.no_grad():
-        logits = domain_model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
 
-    pred_id = int(torch.argmax(probs))
-    domain = domain_model.config.id2label[pred_id]
-    confidence = float(probs[pred_id])
+    # prompt -> one {task: result} per scored window, all heads together
+    scored = [[] for _ in prompts]
+    saturated = [False] * len(prompts)
+    while queue:
+        chunk = []
+        while queue and len(chunk) < MAX_BATCH_SIZE:
+            w = queue.popleft()
+            if not saturated[owners[w]]:
+                chunk.append(w)
+        if not chunk:
+            break
+
+        with _stage("tokenize", len(chunk), model="+".join(names)):
+            inputs = encoder.pad_windows([windows[w] for w in chunk])
+        chunk_probs = _forward_all(classifiers, inputs, len(chunk))
+
+        chunk_results = [{} for _ in chunk]
+        for name, classifier in classifiers.items():
+            for task in classifier.tasks:
+                rows = label_results(chunk_probs[name][task], classifier.task_labels[task], task)
+                for window_results, row in zip(chunk_results, rows):
+                    window_results[task] = row
+        for w, window_results in zip(chunk, chunk_results):
+            scored[owners[w]].append(window_results)
+        for owner in {owners[w] for w in chunk}:
+            saturated[owner] = _window_saturated(scored[owner], tasks)
+
+    results = {name: [None] * len(prompts) for name in names}
+    for i, prompt_windows in enumerate(scored):
+        for name, classifier in classifiers.items():
+            results[name][i] = {
+                task: _aggregate_windows(task, [window[task] for window in prompt_windows], truncated[i])
+                for task in classifier.tasks
+            }
+    return results
+
+
+def _predict_group(names: List[str], prompts: List[str]) -> Dict[str, List[Dict]]:
+    if _long_inputs is not None:
+        return _predict_windows(names, prompts)
+    return _predict_shared(names, prompts)
+
+
+def _predict_batch(name: str, prompts: List[str]) -> List[Dict]:
+    return _predict_group([name], prompts)[name]
+
+
+def predict_multitask_batch(prompts: List[str]) -> List[Dict]:
+    # One encoder pass feeds all three heads
+    return _predict_batch("multitask", prompts)
 
-    return {"domain": domain, "confidence": round(confidence, 3)}
+
+def predict_multitask(prompt: str) -> Dict:
+    return predict_multitask_batch([prompt])[0]
+
+
+def predict_intent_batch(prompts: List[str]) -> List[Dict]:
+    if MODEL_MODE == "multitask":
+        return [r["intent"] for r in predict_multitask_batch(prompts)]
+    return [r["intent"] for r in _predict_batch("intent", prompts)]
+
+
+def predict_domain_batch(prompts: List[str]) -> List[Dict]:
+    if MODEL_MODE == "multitask":
+        return [r["domain"] for r in predict_multitask_batch(prompts)]
+    return [r["domain"] for r in _predict_batch("domain", prompts)]
+
+
+def predict_granularity_batch(prompts: List[str]) -> List[Dict]:
+    if MODEL_MODE == "multitask":
+        return [r["granularity"] for r in predict_multitask_batch(prompts)]
+    return [r["granularity"] for r in _predict_batch("granularity", prompts)]
+
+
+def predict_intent(prompt: str) -> Dict:
+    return predict_intent_batch([prompt])[0]
+
+
+def predict_domain(prompt: str) -> dict:
+    return predict_domain_batch([prompt])[0]
 
 
 def predict_granularity(prompt: str) -> dict:
-    inputs = granularity_tokenizer(
-        prompt,
-        return_tensors="pt",
-        truncation=True,
-        padding=True,
-        max_length=128,
-    )
-    with torch.no_grad():
-        logits = granularity_model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
+    return predict_granularity_batch([prompt])[0]
+
+
+SIGNAL_TASKS = ["intent", "domain", "granularity"]
+
+# When True, run_guardrail extracts rules first and only runs the
+# classifiers whose signal the applicable policies depend on
+# (decision_engine.required_signals); the others are reported as SKIPPED.
+DEMAND_DRIVEN_SIGNALS = False
+
+SKIPPED = "skipped"
+
+# Cheap-model-first cascade (off by default), see cheap_classifier.py
+_cascade = None
 
-    pred_id = int(torch.argmax(probs))
-    granularity = granularity_model.config.id2label[pred_id]
-    confidence = float(probs[pred_id])
 
-    return {"granularity": granularity, "confidence": round(confidence, 3)}
+def enable_cascade(thresholds: Dict[str, float] = None, model_dir: str = None):
+    """
+    Score every prompt with the hashed n-gram models first and only run
+    the transformer for tasks whose cheap confidence is below
+    thresholds[task]. cascade_stats() reports the escalation rate.
+    """
+    global _cascade
+    from cheap_classifier import CHEAP_MODEL_DIR, CheapCascade
 
+    _cascade = CheapCascade(model_dir or CHEAP_MODEL_DIR, thresholds)
+    return _cascade
 
-def run_guardrail(prompt: str) -> Dict:
-    # Intent analysis (ML)
-    intent_result = predict_intent(prompt)
-    
-    # Domain analysis (ML)
-    domain_result = predict_domain(prompt)
 
-    # Field & entity extraction (rules)
-    extraction = extract_fields_and_entities(prompt)
+def disable_cascade():
+    global _cascade
+    _cascade = None
 
-    # Granularity analysis (ML)
-    granularity_result = predict_granularity(prompt)
 
+def cascade_stats() -> Dict:
+    cascade = _cascade
+    return cascade.stats() if cascade is not None else {}
+
+
+def _predict_signals_batch(prompts: List[str], needed: Dict[str, List[int]] = None) -> Dict[str, List[Dict]]:
+    """
+    {task: [result per prompt]} for intent, domain and granularity.
+
+    needed maps each task to the prompt indices that must be scored
+    (default: all of them); the rest get a "skipped" result.
+    """
+    if needed is None:
+        needed = {task: list(range(len(prompts))) for task in SIGNAL_TASKS}
+
+    results = {
+        task: [{task: SKIPPED, "confidence": None} for _ in prompts]
+        for task in SIGNAL_TASKS
+    }
+    escalate = {task: list(needed[task]) for task in SIGNAL_TASKS}
+
+    cascade = _cascade
+    if cascade is not None:
+        for task in SIGNAL_TASKS:
+            escalate[task] = []
+            indices = needed[task]
+            if not indices:
+                continue
+            with _stage("cascade", len(indices), model=task):
+                cheap = cascade.predict(task, [prompts[i] for i in indices])
+            for i, result in zip(indices, cheap):
+                if cascade.is_confident(task, result):
+                    results[task][i] = result
+                else:
+                    escalate[task].append(i)
+
+    if MODEL_MODE == "multitask":
+        # One shared encoder pass; an escalated prompt takes all three heads
+        indices = sorted(set().union(*escalate.values()))
+        if indices:
+            predicted = predict_multitask_batch([prompts[i] for i in indices])
+            for i, signals in zip(indices, predicted):
+                for task in SIGNAL_TASKS:
+                    results[task][i] = signals[task]
+            escalate = {
+                task: [i for i in indices if i in set(needed[task])]
+                for task in SIGNAL_TASKS
+            }
+    else:
+        # Classifiers with the same tokenizer that need the same prompts
+        # share one tokenization; differing tokenizers fall back to their own
+        groups = {}
+        for task in SIGNAL_TASKS:
+            indices = escalate[task]
+            if indices:
+                fingerprint = _get_model(task).tokenizer_fingerprint or task
+                groups.setdefault((fingerprint, tuple(indices)), []).append(task)
+
+        for (_, indices), tasks in groups.items():
+            predicted = _predict_group(tasks, [prompts[i] for i in indices])
+            for task in tasks:
+                for i, signals in zip(indices, predicted[task]):
+                    results[task][i] = signals[task]
+
+    if cascade is not None:
+        for task in SIGNAL_TASKS:
+            cascade.record(task, len(needed[task]), len(escalate[task]))
+
+    return results
+
+
+def _needed_signals(extractions: List[Dict], tenant: str = None) -> Dict[str, List[int]]:
+    # Only score what the applicable policies can actually depend on
+    needed = {task: [] for task in SIGNAL_TASKS}
+    for i, extraction in enumerate(extractions):
+        for task in required_signals(extraction, tenant):
+            needed[task].append(i)
+    return needed
+
+
+def _build_signal(intent_result: Dict, domain_result: Dict, granularity_result: Dict, extraction: Dict) -> Dict:
     # Conservative granularity override:
     # Never allow aggregate when confidence is low or scope is full
+    # (or when the granularity model was skipped)
     granularity = granularity_result["granularity"]
     granularity_conf = granularity_result["confidence"]
     if (
-        granularity_conf < GRANULARITY_CONFIDENCE_THRESHOLD
+        granularity == SKIPPED
+        or granularity_conf < GRANULARITY_CONFIDENCE_THRESHOLD
         or extraction.get("requested_scope") == "full"
     ):
         granularity = "record_level"
 
+    domain = domain_result["domain"]
+    if domain == SKIPPED:
+        domain = None
+
     # Build signal object for decision engine
-    signal = {
+    return {
         "intent": intent_result["intent"],
-        "domain": domain_result["domain"],
+        "domain": domain,
         "entities": extraction["entities"],
         "mentioned_fields": extraction["mentioned_fields"],
         "implied_fields": extraction["implied_fields"],
@@ -124,13 +606,20 @@ def run_guardrail(prompt: str) -> Dict:
         "granularity": granularity,
     }
 
-    # Decision
-    decision = decide(signal)
 
+def _build_result(
+    prompt: str,
+    intent_result: Dict,
+    domain_result: Dict,
+    granularity_result: Dict,
+    extraction: Dict,
+    decision: Dict,
+) -> Dict:
     # Rewrite if needed
     final_prompt = prompt
     if decision["action"] == "rewrite":
-        final_prompt = rewrite_prompt(prompt, decision)
+        with _stage("rewrite", 1):
+            final_prompt = rewrite_prompt(prompt, decision)
 
     return {
         "original_prompt": prompt,
@@ -150,6 +639,426 @@ def run_guardrail(prompt: str) -> Dict:
     }
 
 
+# Prompt -> result cache in front of the pipeline (off by default)
+_result_cache = None
+
+
+def enable_result_cache(
+    max_entries: int = 10_000,
+    ttl_seconds: float = None,
+    max_bytes: int = 64 * 1024 * 1024,
+) -> ResultCache:
+    """
+    Cache results by exact prompt text. Keys include model_version(),
+    the policy version and the safe aggregate templates, so a retrained
+    model, a configuration change or a policy edit never serves stale
+    decisions.
+    """
+    global _result_cache
+    _result_cache = ResultCache(max_entries, ttl_seconds, max_bytes)
+    return _result_cache
+
+
+def disable_result_cache():
+    global _result_cache
+    _result_cache = None
+
+
+def _run_guardrail_cached(cache: ResultCache, prompts: List[str], tenant: str = None) -> List[Dict]:
+    # Keyed on the exact text: the extractor and the tokenizer are both
+    # whitespace- and case-sensitive, so no normalization is safe
+    versions = (model_version(), policy_version(tenant), _templates_version(tenant), tenant)
+    keys = [(p,) + versions for p in prompts]
+
+    results = [None] * len(prompts)
+    pending = {}
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is not None:
+            results[i] = copy.deepcopy(cached)
+        else:
+            pending.setdefault(key, []).append(i)
+
+    if pending:
+        # Repeats inside one batch are computed once
+        firsts = [indices[0] for indices in pending.values()]
+        computed = _run_guardrail_uncached([prompts[i] for i in firsts], tenant)
+        for (key, indices), result in zip(pending.items(), computed):
+            cache.put(key, copy.deepcopy(result), len(json.dumps(result)))
+            results[indices[0]] = result
+            for i in indices[1:]:
+                results[i] = copy.deepcopy(result)
+
+    return results
+
+
+def _templates_version(tenant: str = None) -> str:
+    # Tenant templates are part of the tenant's policy version; the
+    # global ones are a plain dict that may be edited at any time
+    if tenant is not None:
+        return None
+    encoded = json.dumps(decision_engine.SAFE_AGGREGATE_TEMPLATES, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def run_guardrail_batch(prompts: List[str], tenant: str = None) -> List[Dict]:
+    """
+    Batched run_guardrail: results come back in input order and match
+    calling run_guardrail on each prompt. With a tenant, decisions use
+    that tenant's policies (decision_engine.enable_policy_store).
+    """
+    results = _evaluate_batch(prompts, tenant)
+    _record_results(results, tenant)
+    return results
+
+
+def _evaluate_batch(prompts: List[str], tenant: str = None) -> List[Dict]:
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    if tenant is not None:
+        # An unknown tenant fails before any model runs
+        policy_version(tenant)
+
+    with _stage("total", len(prompts)):
+        cache = _result_cache
+        if cache is not None:
+            return _run_guardrail_cached(cache, prompts, tenant)
+        return _run_guardrail_uncached(prompts, tenant)
+
+
+def _record_results(results: List[Dict], tenant: str = None, background: bool = False):
+    # Metrics and the decision log see exactly what the caller got back.
+    # background hands the log writes to the recorder thread, for callers
+    # (the event loop) that must not wait on a full log buffer.
+    if not results:
+        return
+    metrics = _metrics
+    if metrics is not None:
+        for result in results:
+            metrics.inc("decisions_total", action=result["decision"]["action"])
+
+    log = _decision_log
+    if log is not None:
+        # Versions are taken now, for what was returned now; neither call
+        # loads a model
+        record = {"ts": time.time(), "model_version": model_version(), "policy_version": policy_version(tenant)}
+        if tenant is not None:
+            record["tenant"] = tenant
+        if background:
+            _get_record_executor().submit(_append_records, log, record, results)
+        else:
+            _append_records(log, record, results)
+
+
+def _append_records(log: DecisionLog, record: Dict, results: List[Dict]):
+    for result in results:
+        log.append({**record, "result": result})
+
+
+# One thread, so records reach the log in the order they were returned
+_record_executor = None
+_record_executor_lock = threading.Lock()
+
+
+def _get_record_executor() -> ThreadPoolExecutor:
+    global _record_executor
+    with _record_executor_lock:
+        if _record_executor is None:
+            _record_executor = ThreadPoolExecutor(1, thread_name_prefix="guardrail-record")
+        return _record_executor
+
+
+# Audit log of every returned result (off by default)
+_decision_log = None
+
+
+def enable_decision_log(directory: str, **options) -> DecisionLog:
+    """
+    Append every result returned by run_guardrail / run_guardrail_batch,
+    with a timestamp and the model and policy versions, to a DecisionLog
+    under directory. Writing, compression and fsync happen on a
+    background thread; options are passed to DecisionLog (capacity,
+    on_full, segment rotation, fsync interval).
+    """
+    global _decision_log
+    disable_decision_log()
+    _decision_log = DecisionLog(directory, **options)
+    return _decision_log
+
+
+def disable_decision_log():
+    global _decision_log
+    log, _decision_log = _decision_log, None
+    if log is not None:
+        # Records handed to the recorder thread are appended first
+        executor = _record_executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+        log.close()
+
+
+def _extract_batch(prompts: List[str], tenant: str = None) -> List[Dict]:
+    long_inputs = _long_inputs
+    with _stage("extract", len(prompts)):
+        if long_inputs is None:
+            return extract_fields_and_entities_batch(prompts)
+        stop = functools.partial(deny_certain, tenant=tenant)
+        return [
+            extract_fields_and_entities_chunked(prompt, long_inputs["chunk_chars"], stop=stop)
+            for prompt in prompts
+        ]
+
+
+def _skip_certain_denies(
+    extractions: List[Dict],
+    needed: Dict[str, List[int]] = None,
+    tenant: str = None,
+) -> Dict[str, List[int]]:
+    # A prompt the rules already deny whatever the models say needs no model
+    if needed is None:
+        needed = {task: list(range(len(extractions))) for task in SIGNAL_TASKS}
+    certain = {i for i, extraction in enumerate(extractions) if deny_certain(extraction, tenant)}
+    if not certain:
+        return needed
+    return {task: [i for i in indices if i not in certain] for task, indices in needed.items()}
+
+
+def _run_guardrail_uncached(prompts: List[str], tenant: str = None) -> List[Dict]:
+    pool = _stage_pool
+    long_inputs = _long_inputs
+    if DEMAND_DRIVEN_SIGNALS or long_inputs is not None or pool is None:
+        # Field & entity extraction (rules)
+        extractions = _extract_batch(prompts, tenant)
+
+        needed = None
+        if DEMAND_DRIVEN_SIGNALS:
+            needed = _needed_signals(extractions, tenant)
+        if long_inputs is not None:
+            needed = _skip_certain_denies(extractions, needed, tenant)
+
+        # Intent, domain & granularity analysis (ML)
+        ml = _predict_signals_batch(prompts, needed)
+    else:
+        # Rules run on the pool while this thread drives the models
+        extraction_future = pool.submit(_extract_batch, prompts, tenant)
+        ml = _predict_signals_batch(prompts)
+        extractions = extraction_future.result()
+
+    intent_results = ml["intent"]
+    domain_results = ml["domain"]
+    granularity_results = ml["granularity"]
+
+    signals = [
+        _build_signal(*parts)
+        for parts in zip(intent_results, domain_results, granularity_results, extractions)
+    ]
+
+    metrics = _metrics
+    if metrics is not None:
+        for task in SIGNAL_TASKS:
+            for result in ml[task]:
+                if result["confidence"] is not None:
+                    metrics.observe("model_confidence", result["confidence"], task=task)
+
+    # Decision
+    with _stage("decide", len(signals)):
+        decisions = decide_batch(signals, tenant)
+
+    return [
+        _build_result(*parts)
+        for parts in zip(prompts, intent_results, domain_results, granularity_results, extractions, decisions)
+    ]
+
+
+def enable_parallel_stages(max_workers: int = 4, intra_op_threads: int = None):
+    """
+    Run the classifier forward passes and rule extraction of a request
+    concurrently on a shared thread pool (torch and ONNX Runtime release
+    the GIL). Each stage is limited to intra_op_threads threads
+    (default: cores // 3) so parallel passes do not oversubscribe the
+    machine. Call before the first request: ONNX sessions pick up the
+    thread count when they are created.
+    """
+    global _stage_pool, _intra_op_threads
+    disable_parallel_stages()
+
+    _intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // 3)
+    if BACKEND == "torch":
+        import torch
+        torch.set_num_threads(_intra_op_threads)
+
+    _stage_pool = ThreadPoolExecutor(max_workers, thread_name_prefix="guardrail-stage")
+
+
+def disable_parallel_stages():
+    global _stage_pool
+    pool, _stage_pool = _stage_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+# Shared scheduler for concurrent run_guardrail callers (off by default)
+_micro_batcher = None
+
+
+def enable_micro_batching(max_batch_size: int = 16, max_wait_ms: float = 5.0):
+    """
+    Queue concurrent run_guardrail calls and serve them with one
+    run_guardrail_batch call per flush (max_batch_size prompts or
+    max_wait_ms after the first queued prompt, whichever comes first).
+    """
+    global _micro_batcher
+    disable_micro_batching()
+    _micro_batcher = MicroBatcher(_run_micro_batch, max_batch_size, max_wait_ms)
+
+
+def _run_micro_batch(items: List[tuple]) -> List[Dict]:
+    # items are (prompt, record): run_guardrail callers are recorded here,
+    # once per flush; async callers record what they end up returning
+    results = _evaluate_batch([prompt for prompt, _ in items])
+    _record_results([result for (_, record), result in zip(items, results) if record])
+    return results
+
+
+def disable_micro_batching():
+    global _micro_batcher
+    batcher, _micro_batcher = _micro_batcher, None
+    if batcher is not None:
+        batcher.close()
+
+
+def run_guardrail(prompt: str, tenant: str = None) -> Dict:
+    # The micro-batcher serves the default policies only
+    batcher = _micro_batcher
+    if batcher is not None and tenant is None:
+        return batcher.run((prompt, True))
+    return run_guardrail_batch([prompt], tenant)[0]
+
+
+# asyncio API: inference runs on worker threads, never on the event loop.
+# At most ASYNC_MAX_CONCURRENCY calls run at once; the rest wait their turn.
+ASYNC_MAX_CONCURRENCY = 8
+
+# Default per-call timeout in seconds for the async API (None: no limit)
+ASYNC_TIMEOUT_S = None
+
+TIMEOUT_REASON = "Guardrail timed out; denied conservatively"
+
+_async_executor = None
+_async_executor_lock = threading.Lock()
+
+# event loop -> semaphore enforcing ASYNC_MAX_CONCURRENCY on that loop
+_async_limits = weakref.WeakKeyDictionary()
+
+
+def _get_async_executor() -> ThreadPoolExecutor:
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(
+                ASYNC_MAX_CONCURRENCY,
+                thread_name_prefix="guardrail-async",
+            )
+        return _async_executor
+
+
+def _get_async_limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _async_limits.get(loop)
+    if limit is None:
+        limit = _async_limits[loop] = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    return limit
+
+
+def _timeout_result(prompt: str) -> Dict:
+    # No signal is trusted when the pipeline did not finish in time
+    return {
+        "original_prompt": prompt,
+        "intent": None,
+        "intent_confidence": None,
+        "domain": None,
+        "domain_confidence": None,
+        "granularity": None,
+        "granularity_confidence": None,
+        "entities": [],
+        "mentioned_fields": [],
+        "implied_fields": [],
+        "requested_scope": None,
+        "decision": {
+            "action": "deny",
+            "blocked_fields": [],
+            "reason": TIMEOUT_REASON,
+        },
+        "suggested_alternatives": [],
+        "final_prompt": prompt,
+    }
+
+
+async def _run_limited(prompts: List[str], tenant: str = None) -> List[Dict]:
+    limit = _get_async_limit()
+    await limit.acquire()
+    try:
+        batcher = _micro_batcher
+        if batcher is not None and len(prompts) == 1 and tenant is None:
+            # The batcher's own worker does the work; cancelling this
+            # call drops the prompt from its pending batch
+            future = batcher.submit((prompts[0], False))
+            single = True
+        else:
+            future = _get_async_executor().submit(_evaluate_batch, prompts, tenant)
+            single = False
+    except BaseException:
+        limit.release()
+        raise
+
+    # The slot is held until the work itself is done, not until the
+    # caller gives up: a timed-out batch still occupies a worker thread,
+    # and new calls must wait for it rather than queue behind it
+    loop = asyncio.get_running_loop()
+    future.add_done_callback(lambda _: _release_on(loop, limit))
+    result = await asyncio.wrap_future(future)
+    return [result] if single else result
+
+
+def _release_on(loop: asyncio.AbstractEventLoop, limit: asyncio.Semaphore):
+    try:
+        loop.call_soon_threadsafe(limit.release)
+    except RuntimeError:
+        # The loop is closed, and its semaphore with it
+        pass
+
+
+async def run_guardrail_batch_async(prompts: List[str], timeout: float = None, tenant: str = None) -> List[Dict]:
+    """
+    Async run_guardrail_batch. If the batch has not finished within
+    timeout seconds (default ASYNC_TIMEOUT_S), every prompt gets a
+    conservative deny instead of an error. Cancelling the caller
+    cancels the call; a batch already running on a worker thread
+    finishes there, its result is discarded, and it keeps its
+    ASYNC_MAX_CONCURRENCY slot until then.
+    """
+    prompts = list(prompts)
+    if not prompts:
+        return []
+
+    if timeout is None:
+        timeout = ASYNC_TIMEOUT_S
+    try:
+        results = await asyncio.wait_for(_run_limited(prompts, tenant), timeout)
+    except asyncio.TimeoutError:
+        results = [_timeout_result(prompt) for prompt in prompts]
+    # Logged here rather than on the worker thread, so a timed-out batch
+    # is logged as the deny the caller got; the log writes themselves
+    # happen off the event loop
+    _record_results(results, tenant, background=True)
+    return results
+
+
+async def run_guardrail_async(prompt: str, timeout: float = None, tenant: str = None) -> Dict:
+    return (await run_guardrail_batch_async([prompt], timeout, tenant))[0]
+
+
 if __name__ == "__main__":
     prompt = "Show me 1 doctor with all information"
     result = run_guardrail(prompt)
@@ -0,0 +1,368 @@
+import array
+import json
+import mmap
+import os
+import re
+import sys
+from bisect import bisect_left
+from typing import Any, Iterator, List, Tuple
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def is_word_boundary(text: str, i: int) -> bool:
+    # Same rule as the regex \b: a word char on exactly one side of i
+    before = i > 0 and _WORD_CHAR.match(text, i - 1) is not None
+    after = i < len(text) and _WORD_CHAR.match(text, i) is not None
+    return before != after
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over literal patterns.
+
+    Finds every occurrence of every pattern (overlapping ones included) in
+    one pass over the text. A pattern added with word_boundary=True only
+    matches where rf"\\b{pattern}\\b" would; otherwise it matches as a
+    plain substring.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        # Patterns ending exactly at each state, and (once compiled) those
+        # plus the ones inherited along the failure chain
+        self._own = [[]]
+        self._out = [[]]
+        # pattern id -> (pattern, payload, word_boundary)
+        self._patterns = []
+        self._compiled = False
+
+    def add(self, pattern: str, payload: Any, word_boundary: bool = True):
+        if not pattern:
+            raise ValueError("Empty pattern")
+
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+            state = nxt
+
+        self._own[state].append(len(self._patterns))
+        self._patterns.append((pattern, payload, word_boundary))
+        self._compiled = False
+
+    def compile(self) -> "PatternMatcher":
+        # Breadth-first failure links; each state also inherits the
+        # outputs of its failure state. Rebuilt from the own outputs, so
+        # compiling again after more add() calls gives the same automaton.
+        self._out = [list(own) for own in self._own]
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        self._compiled = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Yield (start, end, payload) for every match, in order of end offset.
+        """
+        if not self._compiled:
+            self.compile()
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        patterns = self._patterns
+
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            if out[state]:
+                end = i + 1
+                for pattern_id in out[state]:
+                    pattern, payload, word_boundary = patterns[pattern_id]
+                    start = end - len(pattern)
+                    if word_boundary and not (
+                        is_word_boundary(text, start) and is_word_boundary(text, end)
+                    ):
+                        continue
+                    yield start, end, payload
+
+    def payloads(self, text: str) -> List[Any]:
+        return [payload for _, _, payload in self.iter_matches(text)]
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    @property
+    def max_pattern_length(self) -> int:
+        return max((len(pattern) for pattern, _, _ in self._patterns), default=0)
+
+
+# On-disk layout of a FlatPatternMatcher ("index file"):
+#
+#   magic (8 bytes) | header length (uint32) | JSON header | padding | sections
+#
+# The header holds a caller-supplied key (e.g. a digest of the vocabulary
+# the matcher was built from), max_pattern_length and, per section, its
+# byte offset and item count. Sections are little-endian uint32 arrays,
+# 8-byte aligned, except "payload_blob" (UTF-8 "kind\0value" strings).
+INDEX_MAGIC = b"ABXAC01\n"
+
+_SECTIONS = (
+    "root",             # 128: next state from the root for ASCII chars
+    "fail",             # per state
+    "out_state",        # per state: nearest state on its failure chain (itself
+                        # included) that ends a pattern, 0 if none
+    "trans_offsets",    # per state + 1: its transitions in trans_chars / trans_targets
+    "trans_chars",      # code points, sorted within each state
+    "trans_targets",
+    "out_offsets",      # per state + 1: patterns ending exactly at the state
+    "out_patterns",
+    "pattern_lengths",  # per pattern
+    "pattern_flags",    # per pattern: 1 for word-bounded
+    "pattern_payloads",  # per pattern: payload id
+    "payload_offsets",  # per payload + 1, into payload_blob
+    "payload_blob",
+)
+
+
+class FlatPatternMatcher:
+    """
+    A compiled PatternMatcher flattened into integer arrays, read straight
+    from a memory-mapped index file. Loading costs a header parse, not a
+    rebuild, and every process mapping the same file shares its pages.
+
+    Same matches, in the same order, as the PatternMatcher it was written
+    from. Payloads must be (kind, value) string pairs.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._mmap)
+        if data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{path}: not a pattern index")
+        header_length = int.from_bytes(data[len(INDEX_MAGIC):len(INDEX_MAGIC) + 4], "little")
+        start = len(INDEX_MAGIC) + 4
+        header = json.loads(bytes(data[start:start + header_length]))
+
+        self.path = path
+        self.key = header["key"]
+        self.max_pattern_length = header["max_pattern_length"]
+        arrays = {}
+        for name, (offset, count) in header["sections"].items():
+            if offset + count * (1 if name == "payload_blob" else 4) > len(data):
+                raise ValueError(f"{path}: truncated pattern index")
+            if name == "payload_blob":
+                arrays[name] = data[offset:offset + count]
+                continue
+            values = data[offset:offset + 4 * count].cast("I")
+            if sys.byteorder != "little":
+                values = memoryview(_to_array(values, byteswap=True))
+            arrays[name] = values
+
+        self._root = arrays["root"]
+        self._fail = arrays["fail"]
+        self._out_state = arrays["out_state"]
+        self._trans_offsets = arrays["trans_offsets"]
+        self._trans_chars = arrays["trans_chars"]
+        self._trans_targets = arrays["trans_targets"]
+        self._out_offsets = arrays["out_offsets"]
+        self._out_patterns = arrays["out_patterns"]
+        self._pattern_lengths = arrays["pattern_lengths"]
+        self._pattern_flags = arrays["pattern_flags"]
+        self._pattern_payloads = arrays["pattern_payloads"]
+        self._payload_offsets = arrays["payload_offsets"]
+        self._payload_blob = arrays["payload_blob"]
+        # payload id -> decoded (kind, value), filled as payloads are matched
+        self._payloads = {}
+
+    def _payload(self, payload_id: int) -> Tuple[str, str]:
+        payload = self._payloads.get(payload_id)
+        if payload is None:
+            raw = bytes(self._payload_blob[self._payload_offsets[payload_id]:self._payload_offsets[payload_id + 1]])
+            payload = self._payloads[payload_id] = tuple(raw.decode().split("\0", 1))
+        return payload
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Yield (start, end, payload) for every match, in order of end offset.
+        """
+        root = self._root
+        fail = self._fail
+        out_state = self._out_state
+        trans_offsets = self._trans_offsets
+        trans_chars = self._trans_chars
+        trans_targets = self._trans_targets
+        out_offsets = self._out_offsets
+        out_patterns = self._out_patterns
+        lengths = self._pattern_lengths
+        flags = self._pattern_flags
+        payloads = self._pattern_payloads
+
+        state = 0
+        for i, ch in enumerate(text):
+            code = ord(ch)
+            while state:
+                lo = trans_offsets[state]
+                hi = trans_offsets[state + 1]
+                j = bisect_left(trans_chars, code, lo, hi)
+                if j < hi and trans_chars[j] == code:
+                    state = trans_targets[j]
+                    break
+                state = fail[state]
+            else:
+                # At the root: a table lookup for ASCII
+                if code < 128:
+                    state = root[code]
+                else:
+                    hi = trans_offsets[1]
+                    j = bisect_left(trans_chars, code, 0, hi)
+                    state = trans_targets[j] if j < hi and trans_chars[j] == code else 0
+
+            match_state = out_state[state]
+            end = i + 1
+            while match_state:
+                for k in range(out_offsets[match_state], out_offsets[match_state + 1]):
+                    pattern_id = out_patterns[k]
+                    start = end - lengths[pattern_id]
+                    if flags[pattern_id] and not (
+                        is_word_boundary(text, start) and is_word_boundary(text, end)
+                    ):
+                        continue
+                    yield start, end, self._payload(payloads[pattern_id])
+                match_state = out_state[fail[match_state]]
+
+    def payloads(self, text: str) -> List[Any]:
+        return [payload for _, _, payload in self.iter_matches(text)]
+
+    def __len__(self) -> int:
+        return len(self._pattern_lengths)
+
+
+def _to_array(values, byteswap: bool = False) -> array.array:
+    result = array.array("I", values)
+    if byteswap:
+        result.byteswap()
+    return result
+
+
+def write_index(matcher: PatternMatcher, path: str, key: str):
+    """
+    Flatten a PatternMatcher (payloads: (kind, value) string pairs) into
+    an index file for FlatPatternMatcher. Written to a temporary file and
+    renamed, so readers never see a partial index.
+    """
+    if not matcher._compiled:
+        matcher.compile()
+    goto, fail, own, patterns = matcher._goto, matcher._fail, matcher._own, matcher._patterns
+    state_count = len(goto)
+
+    out_state = [0] * state_count
+    for s in _breadth_first(goto):
+        out_state[s] = s if own[s] else out_state[fail[s]] if s else 0
+
+    trans_offsets, trans_chars, trans_targets = [0], [], []
+    for s in range(state_count):
+        for ch, target in sorted(goto[s].items()):
+            trans_chars.append(ord(ch))
+            trans_targets.append(target)
+        trans_offsets.append(len(trans_chars))
+    out_offsets, out_patterns = [0], []
+    for s in range(state_count):
+        out_patterns.extend(own[s])
+        out_offsets.append(len(out_patterns))
+
+    payload_ids = {}
+    blob = bytearray()
+    payload_offsets = [0]
+    pattern_payloads = []
+    for _, payload, _ in patterns:
+        if payload not in payload_ids:
+            kind, value = payload
+            payload_ids[payload] = len(payload_ids)
+            blob += f"{kind}\0{value}".encode()
+            payload_offsets.append(len(blob))
+        pattern_payloads.append(payload_ids[payload])
+
+    sections = {
+        "root": [goto[0].get(chr(code), 0) for code in range(128)],
+        "fail": fail,
+        "out_state": out_state,
+        "trans_offsets": trans_offsets,
+        "trans_chars": trans_chars,
+        "trans_targets": trans_targets,
+        "out_offsets": out_offsets,
+        "out_patterns": out_patterns,
+        "pattern_lengths": [len(pattern) for pattern, _, _ in patterns],
+        "pattern_flags": [int(word_boundary) for _, _, word_boundary in patterns],
+        "pattern_payloads": pattern_payloads,
+        "payload_offsets": payload_offsets,
+    }
+    encoded = {}
+    for name, values in sections.items():
+        flat = _to_array(values, byteswap=sys.byteorder != "little")
+        encoded[name] = (flat.tobytes(), len(flat))
+    encoded["payload_blob"] = (bytes(blob), len(blob))
+
+    # Offsets depend on the header length, which depends on the offsets:
+    # reserve room for the header first, then lay out the sections
+    header = {"key": key, "max_pattern_length": matcher.max_pattern_length, "sections": {}}
+    reserved = len(json.dumps(header)) + 64 * len(_SECTIONS) + 64
+    offset = _align(len(INDEX_MAGIC) + 4 + reserved)
+    for name in _SECTIONS:
+        header["sections"][name] = (offset, encoded[name][1])
+        offset = _align(offset + len(encoded[name][0]))
+    header_bytes = json.dumps(header).encode()
+    assert len(header_bytes) <= reserved
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(INDEX_MAGIC + len(header_bytes).to_bytes(4, "little") + header_bytes)
+            for name in _SECTIONS:
+                f.seek(header["sections"][name][0])
+                f.write(encoded[name][0])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _breadth_first(goto: List[dict]) -> List[int]:
+    # Failure states are shallower, so they come first in this order
+    order = [0]
+    for state in order:
+        order.extend(goto[state].values())
+    return order
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
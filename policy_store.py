@@ -0,0 +1,296 @@
+import glob
+import itertools
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+
+from decision_engine import compile_policies
+
+# One file per tenant under the store directory, named <tenant>.json:
+#
+#   {
+#     "policies": [{"id": ..., "applies_to_entity": ..., ...}, ...],
+#     "safe_aggregate_templates": {"employee": ["Show employee count by department"]}
+#   }
+#
+# A bare list of policies is accepted too. Policies follow the schema in
+# the README. Replace files atomically (write a temporary file, then
+# rename it over the old one) so a reload never sees a half-written file;
+# a file that fails validation anyway keeps its tenant on the last good
+# version.
+
+POLICY_SUFFIX = ".json"
+
+ACTIONS = ("deny", "rewrite")
+GRANULARITIES = ("record_level", "aggregate")
+
+REQUIRED_KEYS = {
+    "id": str,
+    "applies_to_entity": str,
+    "blocked_fields": list,
+    "action": str,
+    "reason": str,
+}
+# Optional keys are lists of strings
+OPTIONAL_KEYS = ("applies_to_domains", "allowed_domains", "allowed_granularity", "blocked_granularity")
+
+
+# Shared by every store: a re-created store never reuses a version
+_versions = itertools.count(1)
+
+
+class PolicyValidationError(ValueError):
+    pass
+
+
+class UnknownTenantError(KeyError):
+    pass
+
+
+class CompiledPolicySet(NamedTuple):
+    """One tenant's policies, compiled and read-only."""
+
+    tenant: str
+    # Unique in the process, so (tenant, version) identifies its contents
+    version: int
+    # {entity: {field: (compiled policy, ...)}} as in compile_policies()
+    index: Mapping
+    templates: Mapping
+    governed_fields: frozenset
+    path: str
+
+
+def validate_policies(policies: List[Dict], source: str = "policies"):
+    if not isinstance(policies, list):
+        raise PolicyValidationError(f"{source}: expected a list of policies")
+
+    seen_ids = set()
+    for i, policy in enumerate(policies):
+        where = f"{source}[{i}]"
+        if not isinstance(policy, dict):
+            raise PolicyValidationError(f"{where}: expected an object")
+        where = f"{source}[{i}] ({policy.get('id', 'no id')})"
+
+        # Unknown keys are rejected: a misspelt gate must not be ignored
+        unknown = set(policy) - set(REQUIRED_KEYS) - set(OPTIONAL_KEYS)
+        if unknown:
+            raise PolicyValidationError(f"{where}: unknown keys {sorted(unknown)}")
+        for key, kind in REQUIRED_KEYS.items():
+            if not isinstance(policy.get(key), kind):
+                raise PolicyValidationError(f"{where}: {key!r} must be a {kind.__name__}")
+        for key in ("blocked_fields",) + OPTIONAL_KEYS:
+            values = policy.get(key, [])
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise PolicyValidationError(f"{where}: {key!r} must be a list of strings")
+
+        if not policy["blocked_fields"]:
+            raise PolicyValidationError(f"{where}: 'blocked_fields' is empty")
+        if policy["action"] not in ACTIONS:
+            raise PolicyValidationError(f"{where}: 'action' must be one of {ACTIONS}")
+        for key in ("allowed_granularity", "blocked_granularity"):
+            bad = set(policy.get(key, [])) - set(GRANULARITIES)
+            if bad:
+                raise PolicyValidationError(f"{where}: unknown granularity {sorted(bad)} in {key!r}")
+        if policy["id"] in seen_ids:
+            raise PolicyValidationError(f"{where}: duplicate id")
+        seen_ids.add(policy["id"])
+
+
+def validate_templates(templates: Dict, source: str = "safe_aggregate_templates"):
+    if not isinstance(templates, dict):
+        raise PolicyValidationError(f"{source}: expected an object")
+    for entity, suggestions in templates.items():
+        if not isinstance(suggestions, list) or not all(isinstance(s, str) for s in suggestions):
+            raise PolicyValidationError(f"{source}[{entity!r}]: expected a list of strings")
+
+
+def load_policy_file(path: str) -> Tuple[List[Dict], Dict]:
+    """Read and validate one tenant file; returns (policies, templates)."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except ValueError as exc:
+        raise PolicyValidationError(f"{path}: invalid JSON: {exc}") from None
+
+    if isinstance(data, list):
+        data = {"policies": data}
+    if not isinstance(data, dict):
+        raise PolicyValidationError(f"{path}: expected an object or a list of policies")
+    unknown = set(data) - {"policies", "safe_aggregate_templates"}
+    if unknown:
+        raise PolicyValidationError(f"{path}: unknown keys {sorted(unknown)}")
+
+    policies = data.get("policies", [])
+    templates = data.get("safe_aggregate_templates", {})
+    validate_policies(policies, f"{path}: policies")
+    validate_templates(templates, f"{path}: safe_aggregate_templates")
+    return policies, templates
+
+
+def freeze_index(index: Dict[str, Dict[str, List[Dict]]]) -> Mapping:
+    # Compiled policies are shared between the fields they block; freeze
+    # each one once so decide()'s identity-based dedup still works
+    frozen = {}
+
+    def freeze(policy):
+        key = id(policy)
+        if key not in frozen:
+            frozen[key] = MappingProxyType(dict(policy))
+        return frozen[key]
+
+    return MappingProxyType({
+        entity: MappingProxyType({
+            field: tuple(freeze(policy) for policy in policies)
+            for field, policies in by_field.items()
+        })
+        for entity, by_field in index.items()
+    })
+
+
+def compile_policy_set(tenant: str, version: int, policies: List[Dict], templates: Dict, path: str = None) -> CompiledPolicySet:
+    index = freeze_index(compile_policies(policies))
+    return CompiledPolicySet(
+        tenant=tenant,
+        version=version,
+        index=index,
+        templates=MappingProxyType({entity: tuple(s) for entity, s in templates.items()}),
+        governed_fields=frozenset(field for by_field in index.values() for field in by_field),
+        path=path,
+    )
+
+
+def _signature(path: str) -> Tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class PolicyStore:
+    """
+    Per-tenant policy sets loaded from <tenant>.json files in directory.
+
+    Every tenant's file is validated and compiled into an immutable
+    CompiledPolicySet. reload() recompiles the files that changed and
+    publishes them by swapping in a new tenant -> set mapping, so get()
+    never takes a lock and always sees one complete version. With
+    poll_interval_s set, a background thread calls reload() that often.
+
+    At construction an invalid file raises PolicyValidationError; later
+    reloads keep the last good version of that tenant and record the
+    error in errors. A deleted file removes its tenant.
+    """
+
+    def __init__(self, directory: str, poll_interval_s: float = None):
+        self.directory = directory
+        self.poll_interval_s = poll_interval_s
+
+        self.reloads = 0
+        self.failures = 0
+        # tenant -> last reload error for that tenant's file
+        self.errors = {}
+
+        # Replaced wholesale, never mutated, so readers need no lock
+        self._sets = MappingProxyType({})
+        self._signatures = {}
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.reload(strict=True)
+
+        if poll_interval_s is not None:
+            self._thread = threading.Thread(target=self._poll, name="guardrail-policy-store", daemon=True)
+            self._thread.start()
+
+    def get(self, tenant: str) -> CompiledPolicySet:
+        policy_set = self._sets.get(tenant)
+        if policy_set is None:
+            raise UnknownTenantError(tenant)
+        return policy_set
+
+    def tenants(self) -> List[str]:
+        return sorted(self._sets)
+
+    def reload(self, strict: bool = False) -> List[str]:
+        """
+        Recompile every tenant file added, changed or removed since the
+        last reload; returns the affected tenants. strict raises on the
+        first invalid file instead of keeping the old version.
+        """
+        with self._reload_lock:
+            if not os.path.isdir(self.directory):
+                # An unmounted or mistyped directory must not drop every tenant
+                raise FileNotFoundError(f"Policy directory not found: {self.directory}")
+            self.errors.pop(None, None)
+            paths = {
+                os.path.basename(path)[: -len(POLICY_SUFFIX)]: path
+                for path in glob.glob(os.path.join(self.directory, f"*{POLICY_SUFFIX}"))
+            }
+            sets = dict(self._sets)
+            changed = []
+
+            for tenant in set(sets) - set(paths):
+                del sets[tenant]
+                self._signatures.pop(tenant, None)
+                self.errors.pop(tenant, None)
+                changed.append(tenant)
+
+            for tenant, path in sorted(paths.items()):
+                try:
+                    signature = _signature(path)
+                except FileNotFoundError:
+                    # Removed between the listing and now; the next reload drops it
+                    continue
+                if self._signatures.get(tenant) == signature:
+                    continue
+                try:
+                    policies, templates = load_policy_file(path)
+                except (OSError, PolicyValidationError) as exc:
+                    if strict:
+                        raise
+                    self.failures += 1
+                    self.errors[tenant] = str(exc)
+                    # Not retried until the file changes again
+                    self._signatures[tenant] = signature
+                    continue
+                sets[tenant] = compile_policy_set(tenant, next(_versions), policies, templates, path)
+                self._signatures[tenant] = signature
+                self.errors.pop(tenant, None)
+                changed.append(tenant)
+
+            if changed:
+                self._sets = MappingProxyType(sets)
+                self.reloads += 1
+            return sorted(changed)
+
+    def stats(self) -> Dict:
+        sets = self._sets
+        return {
+            "tenants": len(sets),
+            "versions": {tenant: policy_set.version for tenant, policy_set in sorted(sets.items())},
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "errors": dict(self.errors),
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "PolicyStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                self.reload()
+            except OSError as exc:
+                # The directory itself is unreadable: keep serving, retry next tick
+                self.failures += 1
+                self.errors[None] = str(exc)
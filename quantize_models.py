@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+
+from inference_backends import INT8_ONNX_FILENAME, ONNX_FILENAME, OnnxClassifier
+from train_intent import compute_metrics
+
+# name -> (model dir, {task: validation file})
+MODELS = {
+    "intent": ("intent_model", {"intent": "data/intent_valid.jsonl"}),
+    "domain": ("domain_model", {"domain": "data/domain_valid.jsonl"}),
+    "granularity": ("granularity_model", {"granularity": "data/granularity_valid.jsonl"}),
+    "multitask": ("multitask_model", {
+        "intent": "data/intent_valid.jsonl",
+        "domain": "data/domain_valid.jsonl",
+        "granularity": "data/granularity_valid.jsonl",
+    }),
+}
+
+REPORT_FILENAME = "quantization_report.json"
+
+# Largest allowed absolute drop vs the fp32 model, per task
+DEFAULT_MAX_ACCURACY_DROP = 0.01
+DEFAULT_MAX_F1_DROP = 0.01
+
+
+def load_examples(path: str) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _ValidationReader(CalibrationDataReader):
+    # Feeds validation prompts one at a time for static calibration
+    def __init__(self, classifier: OnnxClassifier, prompts: List[str]):
+        self._batches = iter([
+            {name: np.asarray(inputs[name], dtype=np.int64) for name in classifier.input_names}
+            for inputs in (classifier.encode([p]) for p in prompts)
+        ])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def quantize(model_dir: str, output_name: str, mode: str, calibration_prompts: List[str], fp32: OnnxClassifier):
+    source = os.path.join(model_dir, ONNX_FILENAME)
+    target = os.path.join(model_dir, output_name)
+    if mode == "dynamic":
+        quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    else:
+        quantize_static(source, target, _ValidationReader(fp32, calibration_prompts))
+
+
+def evaluate(classifier: OnnxClassifier, examples_by_task: Dict[str, List[Dict]]) -> Dict:
+    report = {}
+    for task, examples in examples_by_task.items():
+        label2id = {label: i for i, label in classifier.task_labels[task].items()}
+        examples = [e for e in examples if e["label"] in label2id]
+
+        probs = []
+        latencies = []
+        for example in examples:
+            start = time.perf_counter()
+            probs.append(classifier.probabilities(classifier.encode([example["text"]]))[task][0])
+            latencies.append(time.perf_counter() - start)
+
+        labels = np.array([label2id[e["label"]] for e in examples])
+        metrics = compute_metrics((np.array(probs), labels)) if examples else {}
+        report[task] = {
+            "examples": len(examples),
+            "accuracy": float(metrics.get("accuracy", 0.0)),
+            "f1_macro": float(metrics.get("f1_macro", 0.0)),
+            "latency_ms_p50": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+            "latency_ms_mean": float(np.mean(latencies) * 1000) if latencies else 0.0,
+        }
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Quantize exported ONNX classifiers to int8 behind an accuracy gate")
+    parser.add_argument("models", nargs="*", default=["intent", "domain", "granularity"], choices=sorted(MODELS))
+    parser.add_argument("--mode", choices=["dynamic", "static"], default="dynamic")
+    parser.add_argument("--max-accuracy-drop", type=float, default=DEFAULT_MAX_ACCURACY_DROP)
+    parser.add_argument("--max-f1-drop", type=float, default=DEFAULT_MAX_F1_DROP)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.models:
+        model_dir, valid_files = MODELS[name]
+        multitask = name == "multitask"
+        examples_by_task = {task: load_examples(path) for task, path in valid_files.items()}
+        calibration_prompts = [e["text"] for examples in examples_by_task.values() for e in examples]
+
+        fp32 = OnnxClassifier(model_dir, name, multitask)
+        tmp_name = INT8_ONNX_FILENAME + ".tmp"
+        quantize(model_dir, tmp_name, args.mode, calibration_prompts, fp32)
+        int8 = OnnxClassifier(model_dir, name, multitask, onnx_filename=tmp_name)
+
+        fp32_report = evaluate(fp32, examples_by_task)
+        int8_report = evaluate(int8, examples_by_task)
+
+        violations = []
+        for task in examples_by_task:
+            accuracy_drop = fp32_report[task]["accuracy"] - int8_report[task]["accuracy"]
+            f1_drop = fp32_report[task]["f1_macro"] - int8_report[task]["f1_macro"]
+            if accuracy_drop > args.max_accuracy_drop:
+                violations.append(f"{task} accuracy dropped by {accuracy_drop:.4f}")
+            if f1_drop > args.max_f1_drop:
+                violations.append(f"{task} f1_macro dropped by {f1_drop:.4f}")
+
+        published = not violations
+        tmp_path = os.path.join(model_dir, tmp_name)
+        if published:
+            os.replace(tmp_path, os.path.join(model_dir, INT8_ONNX_FILENAME))
+        else:
+            os.remove(tmp_path)
+            failed = True
+
+        report = {
+            "model": name,
+            "mode": args.mode,
+            "max_accuracy_drop": args.max_accuracy_drop,
+            "max_f1_drop": args.max_f1_drop,
+            "fp32": fp32_report,
+            "int8": int8_report,
+            "fp32_bytes": os.path.getsize(os.path.join(model_dir, ONNX_FILENAME)),
+            "published": published,
+            "violations": violations,
+        }
+        if published:
+            report["int8_bytes"] = os.path.getsize(os.path.join(model_dir, INT8_ONNX_FILENAME))
+        with open(os.path.join(model_dir, REPORT_FILENAME), "w") as f:
+            json.dump(report, f, indent=2)
+
+        status = "published" if published else "REFUSED: " + "; ".join(violations)
+        print(f"{name}: {status}")
+        print(json.dumps({"fp32": fp32_report, "int8": int8_report}, indent=2))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import itertools
+import json
+import socket
+import threading
+from concurrent.futures import Future
+from typing import Dict, List
+
+# Standard library only: app processes talk to the sidecar without
+# importing torch or loading any model.
+
+
+class OverloadedError(RuntimeError):
+    """The sidecar's queue was full; retry later or fail closed."""
+
+
+class SidecarError(RuntimeError):
+    pass
+
+
+class SidecarClient:
+    """
+    Persistent, thread-safe connection to sidecar_server.py.
+
+    Calls from any number of threads are pipelined over the one socket;
+    a reader thread matches responses to callers by request id. A call
+    that times out (or a cancelled submit() future) forgets its request.
+    Any read error, including a malformed response, fails every pending
+    call and closes the client.
+    """
+
+    def __init__(self, unix_path: str = None, host: str = "127.0.0.1", port: int = None, timeout: float = None):
+        if unix_path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(unix_path)
+        elif port is not None:
+            self._sock = socket.create_connection((host, port))
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            raise ValueError("Give a Unix socket path or a TCP port")
+
+        self.timeout = timeout
+        self._file = self._sock.makefile("rb")
+        self._ids = itertools.count()
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # request id -> Future
+        self._pending = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_loop, name="guardrail-sidecar-client", daemon=True)
+        self._reader.start()
+
+    def submit(self, message: Dict) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise SidecarError("Connection closed")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        future.add_done_callback(lambda f: self._forget(request_id, f))
+
+        line = json.dumps({**message, "id": request_id}).encode() + b"\n"
+        try:
+            with self._send_lock:
+                self._sock.sendall(line)
+        except OSError as exc:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise SidecarError(f"Send failed: {exc}") from exc
+        return future
+
+    def run_guardrail(self, prompt: str) -> Dict:
+        return self._call({"prompt": prompt})["result"]
+
+    def run_guardrail_batch(self, prompts: List[str]) -> List[Dict]:
+        return self._call({"prompts": list(prompts)})["results"]
+
+    def stats(self) -> Dict:
+        return self._call({"op": "stats"})["stats"]
+
+    def _call(self, message: Dict) -> Dict:
+        future = self.submit(message)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # A late response is then dropped by the reader
+            future.cancel()
+            raise
+
+    def _forget(self, request_id: int, future: Future):
+        if future.cancelled():
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._reader.join()
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "SidecarClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_loop(self):
+        reason = "Connection closed"
+        try:
+            for line in self._file:
+                response = json.loads(line)
+                with self._lock:
+                    future = self._pending.pop(response.get("id"), None)
+                # Skips callers that gave up meanwhile
+                if future is None or not future.set_running_or_notify_cancel():
+                    continue
+
+                error = response.get("error")
+                if error == "overloaded":
+                    future.set_exception(OverloadedError("Guardrail sidecar overloaded"))
+                elif error is not None:
+                    future.set_exception(SidecarError(error))
+                else:
+                    future.set_result(response)
+        except Exception as exc:
+            # A malformed line means the stream can no longer be trusted
+            reason = f"Connection lost: {type(exc).__name__}: {exc}"
+        finally:
+            # Fail everything still waiting; new calls fail fast
+            with self._lock:
+                self._closed = True
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(SidecarError(reason))
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import orchestrator
+
+# Protocol: one JSON object per line in each direction.
+#   request:  {"id": 1, "prompt": "..."} or {"id": 2, "prompts": ["...", ...]}
+#             {"id": 3, "op": "stats"}
+#   response: {"id": 1, "result": {...}} / {"id": 2, "results": [...]}
+#             {"id": 1, "error": "overloaded"} / {"id": 1, "error": "bad request: ..."}
+# Clients may pipeline: send many requests without waiting and match the
+# responses, which can arrive out of order, by id.
+
+OVERLOADED = "overloaded"
+
+# Longest accepted request line
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class _Request:
+    __slots__ = ("prompts", "future")
+
+    def __init__(self, prompts: List[str], future: asyncio.Future):
+        self.prompts = prompts
+        self.future = future
+
+
+class SidecarServer:
+    """
+    asyncio server around orchestrator.run_guardrail_batch.
+
+    Requests from all connections share one bounded queue. A batcher task
+    drains it into batches of up to max_batch_size prompts, waiting at most
+    max_wait_ms for a batch to fill, and runs each batch on a worker
+    thread. A request that finds max_queue requests already waiting is
+    answered "overloaded" straight away; the bound counts requests, not
+    prompts, so a "prompts" request takes one slot however long it is.
+    When a connection closes, its requests still waiting in the queue are
+    dropped instead of computed.
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 5.0, max_queue: int = 1024):
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+
+        self.stats = {
+            "requests": 0,
+            "prompts": 0,
+            "batches": 0,
+            "overloaded": 0,
+            "cancelled": 0,
+            "bad_requests": 0,
+            "connections": 0,
+        }
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="guardrail-sidecar")
+        self._servers = []
+        self._batcher = None
+
+    async def start(self, unix_path: str = None, host: str = None, port: int = None):
+        if unix_path is None and port is None:
+            raise ValueError("Give a Unix socket path, a TCP port, or both")
+
+        self._queue = asyncio.Queue(self.max_queue)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+        if unix_path is not None:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self._servers.append(
+                await asyncio.start_unix_server(self._handle, path=unix_path, limit=MAX_LINE_BYTES)
+            )
+        if port is not None:
+            self._servers.append(
+                await asyncio.start_server(self._handle, host or "127.0.0.1", port, limit=MAX_LINE_BYTES)
+            )
+
+    async def serve_forever(self):
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self._executor.shutdown(wait=True)
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "queued": self._queue.qsize() if self._queue else 0}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Line over MAX_LINE_BYTES: the stream cannot be resynced
+                    self.stats["bad_requests"] += 1
+                    self._send(writer, {"id": None, "error": "bad request: line too long"})
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                task = asyncio.create_task(self._serve_line(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Nobody is left to read the answers: cancelling a task cancels
+            # its request, which the batcher then skips if still queued
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _serve_line(self, line: bytes, writer: asyncio.StreamWriter):
+        request_id = None
+        try:
+            message = json.loads(line)
+            request_id = message.get("id")
+            if message.get("op") == "stats":
+                self._send(writer, {"id": request_id, "stats": self.snapshot()})
+                return
+
+            single = "prompt" in message
+            prompts = [message["prompt"]] if single else message["prompts"]
+            if not isinstance(prompts, list) or not all(isinstance(p, str) for p in prompts):
+                raise ValueError("prompts must be strings")
+        except (ValueError, KeyError, AttributeError) as exc:
+            self.stats["bad_requests"] += 1
+            self._send(writer, {"id": request_id, "error": f"bad request: {exc}"})
+            return
+
+        self.stats["requests"] += 1
+        self.stats["prompts"] += len(prompts)
+
+        request = _Request(prompts, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(request)
+        except asyncio.QueueFull:
+            self.stats["overloaded"] += 1
+            self._send(writer, {"id": request_id, "error": OVERLOADED})
+            return
+
+        try:
+            results = await request.future
+        except Exception as exc:
+            self._send(writer, {"id": request_id, "error": f"{type(exc).__name__}: {exc}"})
+            return
+
+        if single:
+            self._send(writer, {"id": request_id, "result": results[0]})
+        else:
+            self._send(writer, {"id": request_id, "results": results})
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, message: Dict):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0].prompts)
+            deadline = time.monotonic() + self.max_wait_s
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                size += len(request.prompts)
+
+            # Requests of closed connections are not computed
+            live = [r for r in batch if not r.future.done()]
+            self.stats["cancelled"] += len(batch) - len(live)
+            batch = live
+            if not batch:
+                continue
+
+            prompts = [p for r in batch for p in r.prompts]
+            self.stats["batches"] += 1
+            try:
+                results = await loop.run_in_executor(self._executor, orchestrator.run_guardrail_batch, prompts)
+            except Exception as exc:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+                continue
+
+            offset = 0
+            for request in batch:
+                count = len(request.prompts)
+                if not request.future.done():
+                    request.future.set_result(results[offset:offset + count])
+                offset += count
+
+
+async def _serve(args):
+    server = SidecarServer(args.max_batch_size, args.max_wait_ms, args.max_queue)
+    await server.start(args.unix, args.host, args.port)
+    print(f"Guardrail sidecar listening ({args.unix or ''} {args.host}:{args.port or '-'})")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Serve run_guardrail to local processes")
+    parser.add_argument("--unix", help="Unix domain socket path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="TCP port")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=1024, help="Waiting requests (not prompts) before shedding load")
+    args = parser.parse_args(argv)
+    if args.unix is None and args.port is None:
+        parser.error("give --unix and/or --port")
+
+    # Load the models before accepting connections
+    orchestrator.warmup()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import sys
+from typing import Dict, List
+
+import pytest
+
+# Flat layout: the modules live in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import orchestrator  # noqa: E402
+
+# Model directories are relative to the working directory, as in the
+# orchestrator itself; tests that need trained models skip without them
+requires_models = pytest.mark.skipif(
+    not all(os.path.isdir(orchestrator.MODEL_DIRS[name]) for name in orchestrator._active_model_names()),
+    reason="trained models not found in the working directory",
+)
+
+
+def fake_signals(prompts: List[str], needed: Dict[str, List[int]] = None) -> Dict[str, List[Dict]]:
+    # Deterministic stand-in for the classifiers, keyed on the prompt text
+    results = {task: [] for task in orchestrator.SIGNAL_TASKS}
+    for prompt in prompts:
+        text = prompt.lower()
+        results["intent"].append({"intent": "read", "confidence": 0.9})
+        results["domain"].append({"domain": "hr" if "hr" in text.split() else "healthcare", "confidence": 0.9})
+        results["granularity"].append({
+            "granularity": "aggregate" if "count" in text else "record_level",
+            "confidence": 0.9,
+        })
+    return results
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Run the pipeline with fake_signals instead of the trained classifiers."""
+    monkeypatch.setattr(orchestrator, "_predict_signals_batch", fake_signals)
+    yield
+    orchestrator.disable_result_cache()
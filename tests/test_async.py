@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+import orchestrator
+
+
+@pytest.fixture
+def one_slot(fake_models, monkeypatch):
+    monkeypatch.setattr(orchestrator, "ASYNC_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(orchestrator, "_async_executor", None)
+    release = threading.Event()
+    started = []
+    evaluate = orchestrator._evaluate_batch
+
+    def evaluate_batch(prompts, tenant=None):
+        started.append(prompts[0])
+        if prompts[0] == "slow":
+            release.wait(10)
+        return evaluate(prompts, tenant)
+
+    monkeypatch.setattr(orchestrator, "_evaluate_batch", evaluate_batch)
+    yield release, started
+    release.set()
+    orchestrator._async_executor.shutdown(wait=True)
+
+
+def test_timed_out_work_keeps_its_slot(one_slot):
+    release, started = one_slot
+
+    async def scenario():
+        slow = await orchestrator.run_guardrail_async("slow", timeout=0.05)
+        # The slow batch still runs: this call waits for the slot instead
+        # of queueing on the executor, and times out without starting
+        blocked = await orchestrator.run_guardrail_async("Show me 1 doctor", timeout=0.05)
+        assert started == ["slow"]
+
+        release.set()
+        done = await orchestrator.run_guardrail_async("Show me 1 doctor", timeout=5)
+        return slow, blocked, done
+
+    slow, blocked, done = asyncio.run(scenario())
+    assert slow["decision"]["reason"] == orchestrator.TIMEOUT_REASON
+    assert blocked["decision"]["reason"] == orchestrator.TIMEOUT_REASON
+    assert done["decision"]["reason"] != orchestrator.TIMEOUT_REASON
+    assert started == ["slow", "Show me 1 doctor"]
+
+
+def test_slot_is_released_after_errors(one_slot, monkeypatch):
+    monkeypatch.setattr(orchestrator, "_evaluate_batch", lambda prompts, tenant=None: 1 / 0)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(ZeroDivisionError):
+                await orchestrator.run_guardrail_async("Show me 1 doctor", timeout=5)
+
+    asyncio.run(scenario())
+
+
+def test_micro_batched_calls_return_and_free_their_slots(fake_models):
+    orchestrator.enable_micro_batching(max_batch_size=4, max_wait_ms=5)
+    try:
+        async def scenario():
+            prompts = [f"Show me {i} doctor" for i in range(10)]
+            results = await asyncio.gather(*(orchestrator.run_guardrail_async(p, timeout=5) for p in prompts))
+            # Released from the batcher's thread; let the callbacks run
+            await asyncio.sleep(0.01)
+            return prompts, results, orchestrator._get_async_limit()
+
+        prompts, results, limit = asyncio.run(scenario())
+    finally:
+        orchestrator.disable_micro_batching()
+
+    assert [result["original_prompt"] for result in results] == prompts
+    assert limit._value == orchestrator.ASYNC_MAX_CONCURRENCY
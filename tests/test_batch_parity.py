@@ -0,0 +1,39 @@
+import orchestrator
+from conftest import requires_models
+
+# Lengths vary widely so most prompts in the batch are padded, and the
+# longest one sets the padded length
+PROMPTS = [
+    "Show me 1 doctor with all information",
+    "email",
+    "",
+    "What is the average salary by department?",
+    "Give me the phone number and home address of every employee in the Berlin office, "
+    "along with their EFN, date of birth and emergency contacts, sorted by hire date",
+    "Count customers by region",
+    "user phone",
+    "Show me 1 doctor with all information",
+    "List patients " + "and their doctors " * 40,
+    "Show employee count by department",
+]
+
+
+def _comparable(result):
+    # implied_fields comes from a set: order is not meaningful
+    return {**result, "implied_fields": sorted(result["implied_fields"])}
+
+
+@requires_models
+def test_batch_matches_single_calls():
+    batch = orchestrator.run_guardrail_batch(PROMPTS)
+    assert len(batch) == len(PROMPTS)
+    for prompt, result in zip(PROMPTS, batch):
+        assert _comparable(result) == _comparable(orchestrator.run_guardrail(prompt)), prompt
+
+
+@requires_models
+def test_batch_results_do_not_depend_on_batch_mates():
+    # The same prompt padded to different lengths decides the same way
+    short = orchestrator.run_guardrail_batch(["email", "user phone"])
+    long = orchestrator.run_guardrail_batch(["email", PROMPTS[8], "user phone"])
+    assert [_comparable(r) for r in short] == [_comparable(long[0]), _comparable(long[2])]
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from bulk_evaluate import checkpoint_path, main, save_checkpoint
+
+
+@pytest.fixture
+def paths(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    source.write_text("".join(json.dumps({"prompt": f"Show me {i} doctor"}) + "\n" for i in range(5)))
+    return str(source), str(tmp_path / "decisions.jsonl")
+
+
+def test_writes_one_line_per_prompt(paths, fake_models):
+    source, output = paths
+    assert main([source, output, "--batch-size", "2"]) == 0
+    with open(output) as f:
+        assert [json.loads(line)["line"] for line in f] == [1, 2, 3, 4, 5]
+
+
+def _checkpoint(output: str, output_offset: int):
+    save_checkpoint(checkpoint_path(output), {
+        "input_offset": 0, "output_offset": output_offset, "lines": 0, "written": 0,
+    })
+
+
+def test_resume_without_output_fails(paths, capsys):
+    source, output = paths
+    _checkpoint(output, 0)
+    with pytest.raises(SystemExit):
+        main([source, output, "--resume"])
+    assert "does not exist" in capsys.readouterr().err
+
+
+def test_resume_with_short_output_fails(paths, capsys):
+    source, output = paths
+    with open(output, "w") as f:
+        f.write("{}\n")
+    _checkpoint(output, 100)
+    with pytest.raises(SystemExit):
+        main([source, output, "--resume"])
+    assert "shorter than the checkpoint" in capsys.readouterr().err
+    # Left untouched, not padded
+    with open(output, "rb") as f:
+        assert f.read() == b"{}\n"
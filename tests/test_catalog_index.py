@@ -0,0 +1,136 @@
+import json
+import os
+import random
+
+import pytest
+
+import field_extractor
+import orchestrator
+from field_extractor import CATALOG_INDEX_SUFFIX, load_catalog
+from pattern_matcher import FlatPatternMatcher, PatternMatcher, write_index
+
+CATALOG = {
+    "entities": {"employee": ["employee", "staff", "medical staff"], "doctor": ["doctor", "physician"]},
+    "fields": {"email": ["email", "e-mail"], "phone": ["phone", "phone number"], "salary": ["salary"]},
+    "implied_fields": {"employee": ["email", "phone"]},
+}
+
+
+@pytest.fixture(autouse=True)
+def restore_vocabularies(monkeypatch):
+    # monkeypatch puts the originals back after each test
+    for name in ("ENTITY_SYNONYMS", "FIELD_SYNONYMS", "IMPLIED_FIELDS_BY_ENTITY", "_matcher", "_vocabulary_version"):
+        monkeypatch.setattr(field_extractor, name, getattr(field_extractor, name))
+
+
+def _write_catalog(directory, catalog) -> str:
+    path = os.path.join(directory, "catalog.json")
+    with open(path, "w") as f:
+        json.dump(catalog, f)
+    return path
+
+
+def test_flat_matcher_equals_in_memory(tmp_path):
+    matcher = PatternMatcher()
+    words = []
+    for kind, vocabulary in (("entity", CATALOG["entities"]), ("field", CATALOG["fields"])):
+        for name, synonyms in vocabulary.items():
+            for s in synonyms:
+                matcher.add(s, (kind, name))
+                words.append(s)
+    matcher.add("all info", ("scope", "implied"), word_boundary=False)
+    matcher.compile()
+    path = str(tmp_path / "index")
+    write_index(matcher, path, "key")
+    flat = FlatPatternMatcher(path)
+    assert flat.key == "key"
+
+    rng = random.Random(0)
+    words += ["all info", "all information", "of", "x"]
+    for _ in range(2000):
+        text = "".join(rng.choice(words) + rng.choice([" ", "", "_", "-", "é"]) for _ in range(rng.randint(0, 8)))
+        assert list(flat.iter_matches(text)) == list(matcher.iter_matches(text)), text
+
+
+def test_index_is_reused_then_rebuilt_on_change(tmp_path, monkeypatch):
+    writes = []
+
+    def counting_write_index(*args):
+        writes.append(args[1])
+        write_index(*args)
+
+    monkeypatch.setattr(field_extractor, "write_index", counting_write_index)
+    path = _write_catalog(tmp_path, CATALOG)
+    load_catalog(path)
+    assert isinstance(field_extractor._matcher, FlatPatternMatcher)
+    assert field_extractor.extract_entities("a physician") == ["doctor"]
+    assert writes == [path + CATALOG_INDEX_SUFFIX]
+
+    # Unchanged catalog: the index is read, not rebuilt
+    key = field_extractor._matcher.key
+    load_catalog(path)
+    assert len(writes) == 1
+
+    # Changed catalog: a new key, so the index is rebuilt
+    changed = json.loads(json.dumps(CATALOG))
+    changed["entities"]["doctor"].append("clinician")
+    _write_catalog(tmp_path, changed)
+    load_catalog(path)
+    assert len(writes) == 2
+    assert field_extractor._matcher.key != key
+    assert field_extractor.extract_entities("a clinician") == ["doctor"]
+
+
+def test_index_with_another_key_is_rebuilt(tmp_path):
+    path = _write_catalog(tmp_path, CATALOG)
+    stale = PatternMatcher()
+    stale.add("physician", ("entity", "nurse"))
+    write_index(stale, path + CATALOG_INDEX_SUFFIX, "another catalog")
+
+    load_catalog(path)
+    assert field_extractor._matcher.key != "another catalog"
+    assert field_extractor.extract_entities("a physician") == ["doctor"]
+
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    path = _write_catalog(tmp_path, CATALOG)
+    with open(path + CATALOG_INDEX_SUFFIX, "wb") as f:
+        f.write(b"garbage")
+
+    load_catalog(path)
+    assert isinstance(field_extractor._matcher, FlatPatternMatcher)
+    assert field_extractor.extract_entities("a physician") == ["doctor"]
+
+
+def test_read_only_location_falls_back_to_in_memory(tmp_path, monkeypatch):
+    path = _write_catalog(tmp_path, CATALOG)
+
+    def read_only(*args):
+        raise PermissionError("read-only file system")
+
+    # chmod is no protection when the tests run as root
+    monkeypatch.setattr(field_extractor, "write_index", read_only)
+    load_catalog(path)
+    assert isinstance(field_extractor._matcher, PatternMatcher)
+    assert not os.path.exists(path + CATALOG_INDEX_SUFFIX)
+    assert field_extractor.extract_fields_and_entities("medical staff phone number")["entities"] == ["employee"]
+
+
+def test_catalog_changes_miss_the_result_cache(tmp_path, fake_models):
+    prompt = "Show 1 employee pay"
+    path = _write_catalog(tmp_path, CATALOG)
+    load_catalog(path)
+    cache = orchestrator.enable_result_cache()
+    assert orchestrator.run_guardrail(prompt)["decision"]["action"] == "allow"
+
+    # "pay" now names the salary field, so the cached allow is stale
+    changed = json.loads(json.dumps(CATALOG))
+    changed["fields"]["salary"].append("pay")
+    _write_catalog(tmp_path, changed)
+    load_catalog(path)
+    assert orchestrator.run_guardrail(prompt)["decision"]["action"] == "deny"
+
+    field_extractor.FIELD_SYNONYMS = {**field_extractor.FIELD_SYNONYMS, "salary": ["salary"]}
+    field_extractor.rebuild_matcher()
+    assert orchestrator.run_guardrail(prompt)["decision"]["action"] == "allow"
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import decision_log
+import orchestrator
+from decision_log import DecisionLog, read_decisions, segment_paths
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _part(directory, pid: int) -> str:
+    path = os.path.join(directory, f"decisions-20260101T000000-{pid}-000001.jsonl.gz.part")
+    with open(path, "wb"):
+        pass
+    return path
+
+
+def test_only_segments_of_exited_processes_are_sealed(tmp_path):
+    live = _part(tmp_path, os.getpid())
+    dead = _part(tmp_path, _dead_pid())
+
+    DecisionLog(str(tmp_path)).close()
+    assert os.path.exists(live)
+    assert not os.path.exists(dead)
+    assert os.path.exists(dead[: -len(decision_log.ACTIVE_SUFFIX)])
+
+
+def test_two_logs_share_a_directory(tmp_path):
+    first = DecisionLog(str(tmp_path), fsync_interval_s=0.0)
+    first.append({"n": 1})
+    while first.stats()["written"] < 1:
+        time.sleep(0.01)
+
+    # Starting the second log must not seal the first one's active segment
+    second = DecisionLog(str(tmp_path))
+    second.append({"n": 2})
+    first.append({"n": 3})
+    second.close()
+    first.close()
+
+    assert first.stats()["write_errors"] == 0
+    assert sorted(record["n"] for record in read_decisions(str(tmp_path))) == [1, 2, 3]
+    assert len(segment_paths(str(tmp_path))) == 2
+
+
+def test_write_errors_are_counted_not_fatal(tmp_path, monkeypatch):
+    log = DecisionLog(str(tmp_path), capacity=1, block_timeout_s=2.0)
+    failing = threading.Event()
+    failing.set()
+    write = log._write
+
+    def flaky_write(batch):
+        if failing.is_set():
+            raise OSError("disk full")
+        write(batch)
+
+    monkeypatch.setattr(log, "_write", flaky_write)
+    log.append({"n": 1})
+    while log.stats()["write_errors"] < 1:
+        time.sleep(0.01)
+    failing.clear()
+    assert log.append({"n": 2})
+    log.close()
+
+    stats = log.stats()
+    assert stats["dropped"] == 1
+    assert stats["last_error"] == "OSError: disk full"
+    assert [record["n"] for record in read_decisions(str(tmp_path))] == [2]
+
+
+class WriterKilled(BaseException):
+    pass
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_append_does_not_block_after_the_writer_stops(tmp_path, monkeypatch):
+    log = DecisionLog(str(tmp_path), capacity=1, block_timeout_s=None)
+
+    def killed(batch):
+        # Not an Exception, so it escapes the per-batch handling
+        raise WriterKilled
+
+    monkeypatch.setattr(log, "_write", killed)
+    log.append({"n": 1})
+    log._thread.join(5)
+    assert not log._thread.is_alive()
+
+    started = time.monotonic()
+    assert not log.append({"n": 2})
+    assert not log.append({"n": 3})
+    assert time.monotonic() - started < 1
+    log.close()
+
+
+def test_async_timeout_logs_the_returned_deny(tmp_path, fake_models, monkeypatch):
+    evaluate = orchestrator._evaluate_batch
+
+    def slow_evaluate(prompts, tenant=None):
+        time.sleep(0.3)
+        return evaluate(prompts, tenant)
+
+    monkeypatch.setattr(orchestrator, "_evaluate_batch", slow_evaluate)
+    orchestrator.enable_decision_log(str(tmp_path))
+    try:
+        result = asyncio.run(orchestrator.run_guardrail_async("Show me 1 doctor", timeout=0.05))
+        # Let the abandoned call finish on its worker thread
+        time.sleep(0.5)
+    finally:
+        orchestrator.disable_decision_log()
+
+    assert result["decision"]["reason"] == orchestrator.TIMEOUT_REASON
+    assert [record["result"] for record in read_decisions(str(tmp_path))] == [result]
+
+
+def test_async_calls_never_wait_on_the_log(tmp_path, fake_models, monkeypatch):
+    log = orchestrator.enable_decision_log(str(tmp_path))
+    append = log.append
+
+    def slow_append(record):
+        # As if the buffer were full with on_full="block"
+        time.sleep(0.5)
+        return append(record)
+
+    monkeypatch.setattr(log, "append", slow_append)
+    try:
+        async def scenario():
+            started = time.monotonic()
+            results = await asyncio.gather(*(
+                orchestrator.run_guardrail_async(f"Show me {i} doctor", timeout=5) for i in range(3)
+            ))
+            return results, time.monotonic() - started
+
+        results, elapsed = asyncio.run(scenario())
+        assert elapsed < 0.5
+    finally:
+        # Waits for the recorder thread before closing
+        orchestrator.disable_decision_log()
+
+    logged = [record["result"]["original_prompt"] for record in read_decisions(str(tmp_path))]
+    assert sorted(logged) == sorted(result["original_prompt"] for result in results)
+
+
+def test_micro_batched_results_are_recorded_once_per_flush(tmp_path, fake_models, monkeypatch):
+    calls = []
+    record = orchestrator._record_results
+
+    def counting_record(results, tenant=None, background=False):
+        if results:
+            calls.append(len(results))
+        record(results, tenant, background)
+
+    monkeypatch.setattr(orchestrator, "_record_results", counting_record)
+    orchestrator.enable_decision_log(str(tmp_path))
+    orchestrator.enable_micro_batching(max_batch_size=8, max_wait_ms=200)
+    try:
+        prompts = [f"Show me {i} doctor" for i in range(8)]
+        threads = [threading.Thread(target=orchestrator.run_guardrail, args=(p,)) for p in prompts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        asyncio.run(orchestrator.run_guardrail_async("async doctor", timeout=5))
+    finally:
+        orchestrator.disable_micro_batching()
+        orchestrator.disable_decision_log()
+
+    # One call for the 8-prompt flush, one for the async caller
+    assert calls == [8, 1]
+    logged = sorted(r["result"]["original_prompt"] for r in read_decisions(str(tmp_path)))
+    assert logged == sorted(prompts + ["async doctor"])
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+import decision_engine
+from decision_engine import decide
+from test_policy_matrix import random_policies, random_signal
+
+SALARY = {"entities": ["employee"], "mentioned_fields": ["salary"], "domain": "hr", "granularity": "record_level"}
+PHONE = {"entities": ["employee"], "mentioned_fields": ["phone"], "domain": "finance", "granularity": "record_level"}
+EFN = {"entities": ["employee"], "mentioned_fields": ["EFN"], "domain": "hr", "granularity": "aggregate"}
+
+
+@pytest.fixture(autouse=True)
+def restore_policies():
+    original = decision_engine.POLICIES
+    snapshot = [dict(policy) for policy in original]
+    yield
+    decision_engine.disable_decision_table()
+    original[:] = snapshot
+    decision_engine.reload_policies(original)
+
+
+def test_matches_decide():
+    rng = random.Random(0)
+    decision_engine.reload_policies(random_policies(rng, 30))
+    signals = [random_signal(rng) for _ in range(300)]
+    signals += rng.sample(signals, 100)
+    expected = [decide(signal) for signal in signals]
+
+    table = decision_engine.enable_decision_table()
+    assert [decide(signal) for signal in signals] == expected
+    assert table.stats()["hits"] >= 100
+
+
+def test_hit_returns_a_copy():
+    table = decision_engine.enable_decision_table()
+    first = decide(SALARY)
+    expected = decide(SALARY)
+    assert first == expected and first["suggested_alternatives"]
+
+    first["blocked_fields"].append("tampered")
+    first["suggested_alternatives"].clear()
+    assert decide(SALARY) == expected
+    assert table.stats()["hits"] == 2
+
+
+def test_ungoverned_parts_share_an_entry():
+    table = decision_engine.enable_decision_table()
+    decide(SALARY)
+    decide({**SALARY, "intent": "write", "mentioned_fields": ["salary", "favourite colour"]})
+    assert table.stats()["hits"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    table = decision_engine.enable_decision_table(max_entries=2)
+    decide(SALARY)
+    decide(PHONE)
+    decide(SALARY)
+    # PHONE is now the least recently used
+    decide(EFN)
+    assert table.stats()["entries"] == 2
+    assert table.stats()["evictions"] == 1
+
+    hits = table.stats()["hits"]
+    decide(SALARY)
+    assert table.stats()["hits"] == hits + 1
+    decide(PHONE)
+    assert table.stats()["hits"] == hits + 1
+    assert table.stats()["entries"] == 2
+
+
+def test_policy_changes_empty_the_table():
+    table = decision_engine.enable_decision_table()
+    assert decide(SALARY)["action"] == "deny"
+    version = table.stats()["policy_version"]
+
+    decision_engine.reload_policies([])
+    assert decide(SALARY)["action"] == "allow"
+    assert table.stats()["entries"] == 1
+    assert table.stats()["policy_version"] > version
+
+    # In-place list edits bump POLICY_VERSION too
+    decision_engine.POLICIES.append({
+        "id": "salary",
+        "applies_to_entity": "employee",
+        "blocked_fields": ["salary"],
+        "action": "rewrite",
+        "reason": "Salary is restricted",
+    })
+    assert decide(SALARY)["action"] == "rewrite"
+    assert table.stats()["hits"] == 0
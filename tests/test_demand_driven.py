@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+import decision_engine
+import orchestrator
+from conftest import fake_signals
+from decision_engine import decide, required_signals
+from test_policy_matrix import DOMAINS, GRANULARITIES, random_policies, random_signal
+
+PROMPTS = [
+    "Show employee EFN",
+    "Show 1 employee salary",
+    "Count employee salary by department",
+    "employee phone and email",
+    "hr employee phone and email",
+    "Show me 1 doctor with all information",
+    "Show me 1 doctor",
+    "user address",
+    "hr user address",
+    "What is the weather today",
+]
+
+
+@pytest.fixture(autouse=True)
+def restore_policies():
+    original = decision_engine.POLICIES
+    yield
+    decision_engine.reload_policies(original)
+
+
+def _result(task, value):
+    return {task: value, "confidence": 0.9}
+
+
+def _skipped(task):
+    return {task: orchestrator.SKIPPED, "confidence": None}
+
+
+def test_skipped_signals_never_change_the_decision():
+    denies = 0
+    for seed in range(20):
+        rng = random.Random(seed)
+        decision_engine.reload_policies(random_policies(rng, rng.randint(0, 40)))
+        for _ in range(300):
+            extraction = random_signal(rng)
+            required = required_signals(extraction)
+            intent = _result("intent", "read")
+            for domain in DOMAINS + ["legal"]:
+                for granularity in GRANULARITIES:
+                    full = orchestrator._build_signal(
+                        intent, _result("domain", domain), _result("granularity", granularity), extraction,
+                    )
+                    demand = orchestrator._build_signal(
+                        intent,
+                        _result("domain", domain) if "domain" in required else _skipped("domain"),
+                        _result("granularity", granularity) if "granularity" in required else _skipped("granularity"),
+                        extraction,
+                    )
+                    expected = decide(full)
+                    assert decide(demand) == expected, (seed, extraction, domain, granularity)
+                    denies += expected["action"] == "deny"
+    assert denies
+
+
+def test_demand_driven_pipeline_matches_full_signals(fake_models, monkeypatch):
+    def demand_signals(prompts, needed=None):
+        # Like _predict_signals_batch: prompts not needed for a task are skipped
+        results = fake_signals(prompts)
+        if needed is not None:
+            for task, rows in results.items():
+                wanted = set(needed[task])
+                results[task] = [row if i in wanted else _skipped(task) for i, row in enumerate(rows)]
+        return results
+
+    monkeypatch.setattr(orchestrator, "_predict_signals_batch", demand_signals)
+    expected = orchestrator.run_guardrail_batch(PROMPTS)
+    monkeypatch.setattr(orchestrator, "DEMAND_DRIVEN_SIGNALS", True)
+    results = orchestrator.run_guardrail_batch(PROMPTS)
+
+    assert [r["decision"] for r in results] == [r["decision"] for r in expected]
+    assert {r["decision"]["action"] for r in expected} == {"allow", "deny", "rewrite"}
+    # The models were skipped where the policies allowed it
+    assert any(r["domain"] == orchestrator.SKIPPED for r in results)
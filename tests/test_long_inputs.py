@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+import orchestrator
+from conftest import fake_signals, requires_models
+from decision_engine import deny_certain
+from field_extractor import extract_fields_and_entities
+from test_batch_parity import PROMPTS, _comparable
+
+WINDOW_WORDS = 4
+
+
+class WordWindowClassifier:
+    # Stand-in for a classifier: windows of WINDOW_WORDS words, and a label
+    # chosen by a trigger word anywhere in the window
+    tokenizer_fingerprint = "words"
+
+    def __init__(self, task, labels, trigger):
+        self.tasks = [task]
+        self.task_labels = {task: dict(enumerate(labels))}
+        self.trigger = trigger
+        self.windows_scored = 0
+
+    def encode_windows(self, prompts, stride):
+        windows, owners = [], []
+        for owner, prompt in enumerate(prompts):
+            words = prompt.split() or [""]
+            for start in range(0, len(words), WINDOW_WORDS):
+                windows.append(words[start:start + WINDOW_WORDS])
+                owners.append(owner)
+        return windows, owners
+
+    def pad_windows(self, windows):
+        return windows
+
+    def probabilities(self, inputs):
+        self.windows_scored += len(inputs)
+        # Column 1 holds the label the trigger word selects
+        rows = [[0.1, 0.9] if self.trigger in window else [0.8, 0.2] for window in inputs]
+        return {self.tasks[0]: np.array(rows)}
+
+
+@pytest.fixture
+def word_models(monkeypatch):
+    models = {
+        "intent": WordWindowClassifier("intent", ["read", "write"], "delete"),
+        "domain": WordWindowClassifier("domain", ["healthcare", "hr"], "hr"),
+        "granularity": WordWindowClassifier("granularity", ["aggregate", "record_level"], "record"),
+    }
+    monkeypatch.setattr(orchestrator, "MODEL_MODE", "separate")
+    monkeypatch.setattr(orchestrator, "_models", models)
+    orchestrator.enable_long_inputs(max_windows=8)
+    yield models
+    orchestrator.disable_long_inputs()
+
+
+def test_certain_deny_runs_no_model(fake_models, monkeypatch):
+    calls = []
+
+    def recording_signals(prompts, needed=None):
+        calls.append(needed)
+        return fake_signals(prompts, needed)
+
+    monkeypatch.setattr(orchestrator, "_predict_signals_batch", recording_signals)
+    orchestrator.enable_long_inputs()
+    try:
+        results = orchestrator.run_guardrail_batch(["Show employee EFN", "Show 1 doctor"])
+    finally:
+        orchestrator.disable_long_inputs()
+
+    assert calls == [{task: [1] for task in orchestrator.SIGNAL_TASKS}]
+    assert results[0]["decision"]["action"] == "deny"
+    assert results[0]["decision"]["blocked_fields"] == ["EFN"]
+
+
+def test_late_sensitive_window_wins(word_models):
+    benign = "count the doctors " * 5
+    result = orchestrator._predict_signals_batch([benign, benign + "per record"])
+
+    assert [r["granularity"] for r in result["granularity"]] == ["aggregate", "record_level"]
+    assert result["granularity"][1]["confidence"] == 0.9
+    assert [r["domain"] for r in result["domain"]] == ["healthcare", "healthcare"]
+
+
+def test_disagreeing_domains_are_mixed(word_models):
+    result = orchestrator._predict_signals_batch(["hr staff list " * 2 + "patients of the clinic"])
+    assert result["domain"][0] == {"domain": orchestrator.MIXED_DOMAIN, "confidence": 0.8}
+
+
+def test_saturated_prompt_stops_being_scored(word_models, monkeypatch):
+    # One window per pass, so the loop can stop between windows
+    monkeypatch.setattr(orchestrator, "MAX_BATCH_SIZE", 1)
+    prompt = "delete hr record here " + "count the doctors now " * 6
+    result = orchestrator._predict_signals_batch([prompt])
+
+    # The second window disagrees on the domain; nothing after it is scored
+    assert word_models["granularity"].windows_scored == 2
+    assert result["intent"][0]["intent"] == "write"
+    assert result["granularity"][0]["granularity"] == "record_level"
+
+
+def test_truncated_prompt_gets_conservative_labels(word_models):
+    orchestrator.enable_long_inputs(max_windows=2)
+    # The trigger words sit past the second window, so they are never scored
+    prompt = "count the doctors now " * 3 + "delete hr record"
+    result = orchestrator._predict_signals_batch([prompt])
+
+    assert result["intent"][0] == {"intent": "write", "confidence": 0.0}
+    assert result["granularity"][0] == {"granularity": "record_level", "confidence": 0.0}
+    assert result["domain"][0] == {"domain": orchestrator.MIXED_DOMAIN, "confidence": 0.0}
+
+
+def test_aggregate_windows():
+    windows = [{"granularity": "aggregate", "confidence": 0.9}, {"granularity": "record_level", "confidence": 0.6}]
+    assert orchestrator._aggregate_windows("granularity", windows, False) == {"granularity": "record_level", "confidence": 0.6}
+    # A benign label is only as confident as its weakest window
+    windows = [{"domain": "hr", "confidence": 0.9}, {"domain": "hr", "confidence": 0.7}]
+    assert orchestrator._aggregate_windows("domain", windows, False) == {"domain": "hr", "confidence": 0.7}
+    assert orchestrator._aggregate_windows("domain", windows, True) == {"domain": orchestrator.MIXED_DOMAIN, "confidence": 0.0}
+
+
+@requires_models
+def test_single_window_prompts_match_the_normal_path():
+    # Certain denies skip the models in long-input mode, so leave them out
+    prompts = [
+        p for p in PROMPTS
+        if len(p.split()) < 40 and not deny_certain(extract_fields_and_entities(p))
+    ]
+    expected = orchestrator.run_guardrail_batch(prompts)
+    orchestrator.enable_long_inputs()
+    try:
+        results = orchestrator.run_guardrail_batch(prompts)
+    finally:
+        orchestrator.disable_long_inputs()
+    assert [_comparable(r) for r in results] == [_comparable(r) for r in expected]
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_results_in_order():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [future.result(timeout=5) for future in futures] == [i * 2 for i in range(10)]
+    finally:
+        batcher.close()
+
+
+@pytest.mark.parametrize("batch_fn", [
+    lambda items: items[:-1],
+    lambda items: items + [None],
+    lambda items: iter(items[:1]),
+])
+def test_wrong_result_count_fails_every_caller(batch_fn):
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(i) for i in (1, 2, 3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="results for"):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_batch_error_fails_every_caller_and_worker_survives():
+    failing = threading.Event()
+    failing.set()
+
+    def batch_fn(items):
+        if failing.is_set():
+            raise ValueError("model crashed")
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=50)
+    try:
+        for future in [batcher.submit(1), batcher.submit(2)]:
+            with pytest.raises(ValueError, match="model crashed"):
+                future.result(timeout=5)
+        failing.clear()
+        assert batcher.run(3, timeout=5) == 3
+    finally:
+        batcher.close()
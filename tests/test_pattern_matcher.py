@@ -0,0 +1,135 @@
+import random
+import re
+
+import pytest
+
+import field_extractor
+from pattern_matcher import FlatPatternMatcher, PatternMatcher, write_index
+
+# Overlapping synonyms, shared prefixes and suffixes, multi-word phrases
+# and patterns that start or end with a non-word character
+VOCABULARY = [
+    "staff", "medical staff", "staff member", "member", "doctor", "doc",
+    "phone", "phone number", "number", "e-mail", "mail", "email",
+    "date of birth", "birth", "of", "(pii)", "pii", "ssn", "a",
+]
+SEPARATORS = [" ", "  ", "_", "-", ".", ",", "", "1", "é", "\n", "'s "]
+
+
+def regex_matches(patterns, text):
+    # The extractor's original rule: re.search(rf"\b{s}\b", text)
+    return {s for s in patterns if re.search(rf"\b{re.escape(s)}\b", text)}
+
+
+def random_text(rng: random.Random, words) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        word = rng.choice(words)
+        if rng.random() < 0.2:
+            # Cut a word so partial matches show up
+            word = word[: rng.randint(1, len(word))]
+        parts.append(word)
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts).lower()
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    matcher = PatternMatcher()
+    for pattern in VOCABULARY:
+        matcher.add(pattern, pattern)
+    return matcher.compile()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("medical staff", {"medical staff", "staff"}),
+    ("staff member", {"staff", "staff member", "member"}),
+    ("staffing", set()),
+    ("the_staff", set()),
+    ("staff's phone number", {"staff", "phone", "phone number", "number"}),
+    ("e-mail", {"e-mail", "mail"}),
+    ("email", {"email"}),
+    ("x(pii)", {"pii"}),
+    ("see (pii) ", {"pii"}),
+    ("date of  birth", {"of", "birth"}),
+    ("docé doc", {"doc"}),
+    ("a", {"a"}),
+    ("", set()),
+])
+def test_word_boundaries(matcher, text, expected):
+    assert set(matcher.payloads(text)) == expected == regex_matches(VOCABULARY, text)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_regex_on_random_text(matcher, seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        text = random_text(rng, VOCABULARY)
+        assert set(matcher.payloads(text)) == regex_matches(VOCABULARY, text), text
+
+
+def test_recompiling_after_add_matches_a_fresh_build(tmp_path):
+    half = len(VOCABULARY) // 2
+    grown = PatternMatcher()
+    for pattern in VOCABULARY[:half]:
+        grown.add(pattern, ("word", pattern))
+    grown.compile()
+    grown.compile()
+    for pattern in VOCABULARY[half:]:
+        grown.add(pattern, ("word", pattern))
+    grown.compile()
+
+    fresh = PatternMatcher()
+    for pattern in VOCABULARY:
+        fresh.add(pattern, ("word", pattern))
+    fresh.compile()
+
+    write_index(grown, str(tmp_path / "grown"), "key")
+    flat = FlatPatternMatcher(str(tmp_path / "grown"))
+    rng = random.Random(0)
+    for _ in range(500):
+        text = random_text(rng, VOCABULARY)
+        # Lists, not sets: an output inherited twice would show up twice
+        expected = list(fresh.iter_matches(text))
+        assert list(grown.iter_matches(text)) == expected, text
+        assert list(flat.iter_matches(text)) == expected, text
+
+
+def _regex_extract(text: str):
+    text = text.lower()
+    entities = [
+        entity for entity, synonyms in field_extractor.ENTITY_SYNONYMS.items()
+        if regex_matches(synonyms, text)
+    ]
+    fields = [
+        field for field, synonyms in field_extractor.FIELD_SYNONYMS.items()
+        if regex_matches(synonyms, text)
+    ]
+    return entities, fields
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_extractor_matches_regex(seed):
+    rng = random.Random(seed)
+    words = [
+        s for vocabulary in (field_extractor.ENTITY_SYNONYMS, field_extractor.FIELD_SYNONYMS)
+        for synonyms in vocabulary.values() for s in synonyms
+    ] + ["show", "me", "all", "the"]
+    for _ in range(500):
+        text = random_text(rng, words)
+        if rng.random() < 0.5:
+            text = text.upper()
+        entities, fields = _regex_extract(text)
+        assert field_extractor.extract_entities(text) == entities, text
+        assert field_extractor.extract_mentioned_fields(text) == fields, text
+
+
+def test_extractor_batch_matches_single_calls():
+    texts = ["Show me 1 doctor with all info", "SHOW ME 1 DOCTOR WITH ALL INFO", "employee phone", ""]
+    texts += texts
+    batch = field_extractor.extract_fields_and_entities_batch(texts)
+    assert batch == [field_extractor.extract_fields_and_entities(text) for text in texts]
+
+    # Texts scanned once still get their own lists
+    batch[0]["entities"].append("tampered")
+    assert batch[1]["entities"] == batch[4]["entities"] == ["doctor"]
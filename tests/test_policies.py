@@ -0,0 +1,152 @@
+import json
+import os
+
+import pytest
+
+import decision_engine
+from decision_engine import PolicyList, decide
+from policy_store import PolicyStore, PolicyValidationError, UnknownTenantError
+
+SIGNAL = {
+    "intent": "read",
+    "domain": "support",
+    "granularity": "record_level",
+    "entities": ["customer"],
+    "mentioned_fields": ["email"],
+    "implied_fields": [],
+}
+
+CUSTOMER_EMAIL = {
+    "id": "no_customer_email",
+    "applies_to_entity": "customer",
+    "blocked_fields": ["email"],
+    "action": "deny",
+    "reason": "Customer email is confidential",
+}
+
+
+@pytest.fixture(autouse=True)
+def restore_policies():
+    original = decision_engine.POLICIES
+    snapshot = [dict(policy) for policy in original]
+    yield
+    original[:] = snapshot
+    decision_engine.reload_policies(original)
+
+
+def test_in_place_list_edits_are_picked_up():
+    assert decide(SIGNAL)["action"] == "allow"
+
+    decision_engine.POLICIES.append(CUSTOMER_EMAIL)
+    assert decide(SIGNAL)["action"] == "deny"
+
+    del decision_engine.POLICIES[-1]
+    assert decide(SIGNAL)["action"] == "allow"
+
+    decision_engine.POLICIES[0] = CUSTOMER_EMAIL
+    assert decide(SIGNAL)["action"] == "deny"
+
+    decision_engine.POLICIES[:] = []
+    assert decide(SIGNAL)["action"] == "allow"
+
+
+def test_each_change_bumps_the_policy_version():
+    version = decision_engine.policy_version()
+    decision_engine.POLICIES.extend([CUSTOMER_EMAIL])
+    assert decision_engine.policy_version() == version + 1
+    assert decision_engine.policy_version() == version + 1
+
+
+def test_rebinding_and_reload_policies():
+    decision_engine.POLICIES = [dict(CUSTOMER_EMAIL)]
+    assert decide(SIGNAL)["action"] == "deny"
+    assert isinstance(decision_engine.POLICIES, PolicyList)
+
+    # Dict edits are not tracked; reload_policies() applies them
+    decision_engine.POLICIES[0]["action"] = "rewrite"
+    assert decide(SIGNAL)["action"] == "deny"
+    decision_engine.reload_policies()
+    assert decide(SIGNAL)["action"] == "rewrite"
+
+
+def _write_tenant(directory, tenant, data):
+    # Atomic replace, as the store expects
+    path = os.path.join(directory, f"{tenant}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    _write_tenant(tmp_path, "acme", {
+        "policies": [CUSTOMER_EMAIL],
+        "safe_aggregate_templates": {"customer": ["Count customers by region"]},
+    })
+    _write_tenant(tmp_path, "globex", [])
+    yield decision_engine.enable_policy_store(str(tmp_path), poll_interval_s=None)
+    decision_engine.disable_policy_store()
+
+
+def test_each_tenant_gets_its_own_policies(store):
+    decision = decide(SIGNAL, tenant="acme")
+    assert decision["action"] == "deny"
+    assert decision["suggested_alternatives"] == ["Count customers by region"]
+    assert decide(SIGNAL, tenant="globex")["action"] == "allow"
+    # Calls without a tenant keep using POLICIES
+    assert decide(SIGNAL)["action"] == "allow"
+    assert store.tenants() == ["acme", "globex"]
+
+
+def test_unknown_tenant(store):
+    with pytest.raises(UnknownTenantError):
+        decide(SIGNAL, tenant="initech")
+    decision_engine.disable_policy_store()
+    with pytest.raises(RuntimeError, match="no policy store"):
+        decide(SIGNAL, tenant="acme")
+
+
+@pytest.mark.parametrize("policy", [
+    {**CUSTOMER_EMAIL, "blocked_feilds": ["email"]},
+    {**CUSTOMER_EMAIL, "blocked_fields": "email"},
+    {**CUSTOMER_EMAIL, "blocked_fields": []},
+    {**CUSTOMER_EMAIL, "action": "block"},
+    {**CUSTOMER_EMAIL, "allowed_granularity": ["record"]},
+    {key: value for key, value in CUSTOMER_EMAIL.items() if key != "reason"},
+])
+def test_invalid_policies_are_rejected(tmp_path, policy):
+    _write_tenant(tmp_path, "acme", [policy])
+    with pytest.raises(PolicyValidationError):
+        PolicyStore(str(tmp_path))
+
+
+def test_invalid_reload_keeps_the_last_good_version(store, tmp_path):
+    good = store.get("acme")
+    _write_tenant(tmp_path, "acme", [{**CUSTOMER_EMAIL, "action": "block"}])
+
+    assert store.reload() == []
+    assert store.get("acme") is good
+    assert decide(SIGNAL, tenant="acme")["action"] == "deny"
+    assert "action" in store.errors["acme"]
+    assert store.failures == 1
+
+    _write_tenant(tmp_path, "acme", [{**CUSTOMER_EMAIL, "action": "rewrite"}])
+    assert store.reload() == ["acme"]
+    assert decide(SIGNAL, tenant="acme")["action"] == "rewrite"
+    assert "acme" not in store.errors
+
+
+def test_reload_swaps_in_a_new_snapshot(store, tmp_path):
+    before = store._sets
+    old = store.get("acme")
+    _write_tenant(tmp_path, "acme", [])
+    os.remove(tmp_path / "globex.json")
+
+    assert store.reload() == ["acme", "globex"]
+    # Readers holding the old mapping still see one complete version
+    assert before["acme"] is old and "globex" in before
+    assert store.get("acme").version > old.version
+    assert store.tenants() == ["acme"]
+    assert decide(SIGNAL, tenant="acme")["action"] == "allow"
+    with pytest.raises(TypeError):
+        old.index["customer"] = {}
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+import decision_engine
+import policy_matrix
+from decision_engine import decide
+from policy_matrix import decide_vectorized
+
+ENTITIES = ["employee", "customer", "doctor", "user", "vendor"]
+FIELDS = ["email", "phone", "address", "EFN", "SSN", "salary", "notes", "dob"]
+DOMAINS = ["hr", "healthcare", "finance", "support"]
+GRANULARITIES = ["record_level", "aggregate"]
+
+
+def random_policies(rng: random.Random, count: int):
+    policies = []
+    for i in range(count):
+        policy = {
+            "id": f"p{i}",
+            "applies_to_entity": rng.choice(ENTITIES),
+            "blocked_fields": rng.sample(FIELDS, rng.randint(1, 3)),
+            "action": rng.choice(["deny", "rewrite"]),
+            # Few distinct reasons, so joined reasons are deduplicated
+            "reason": f"reason {rng.randint(0, 5)}",
+        }
+        if rng.random() < 0.4:
+            policy["allowed_domains"] = rng.sample(DOMAINS, rng.randint(1, 2))
+        if rng.random() < 0.3:
+            policy["allowed_granularity"] = rng.sample(GRANULARITIES, 1)
+        if rng.random() < 0.5:
+            policy["blocked_granularity"] = rng.sample(GRANULARITIES, rng.randint(1, 2))
+        policies.append(policy)
+    return policies
+
+
+def random_signal(rng: random.Random):
+    signal = {
+        "intent": "read",
+        "entities": rng.sample(ENTITIES + ["unknown"], rng.randint(0, 3)),
+        "mentioned_fields": rng.sample(FIELDS + ["other"], rng.randint(0, 3)),
+        "implied_fields": rng.sample(FIELDS, rng.randint(0, 1)),
+        "requested_scope": rng.choice(["partial", "partial", "full"]),
+    }
+    if rng.random() < 0.9:
+        signal["domain"] = rng.choice(DOMAINS + ["legal", None])
+    if rng.random() < 0.9:
+        signal["granularity"] = rng.choice(GRANULARITIES + ["unknown"])
+    if signal["entities"] and rng.random() < 0.2:
+        # Repeated entities are visited once
+        signal["entities"].append(signal["entities"][0])
+    return signal
+
+
+@pytest.fixture(autouse=True)
+def restore_policies():
+    original = decision_engine.POLICIES
+    yield
+    decision_engine.reload_policies(original)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_decide(seed):
+    rng = random.Random(seed)
+    decision_engine.reload_policies(random_policies(rng, rng.randint(0, 40)))
+    signals = [random_signal(rng) for _ in range(300)]
+    # Exact repeats exercise the per-chunk dedup
+    signals += rng.sample(signals, 50)
+
+    expected = [decide(signal) for signal in signals]
+    assert decide_vectorized(signals, force=True, chunk_size=97) == expected
+    assert decide_vectorized(signals) == expected
+
+
+def test_decide_batch_matches_decide():
+    rng = random.Random(0)
+    decision_engine.reload_policies(random_policies(rng, 30))
+    signals = [random_signal(rng) for _ in range(300)]
+    signals += rng.sample(signals, 100)
+    assert decision_engine.decide_batch(signals) == [decide(signal) for signal in signals]
+
+    # Signals evaluated once still get their own lists
+    repeated = {"entities": ["employee"], "mentioned_fields": ["salary"], "granularity": "record_level"}
+    first, second = decision_engine.decide_batch([repeated, dict(repeated)])
+    first["blocked_fields"].append("tampered")
+    assert second == decide(repeated)
+
+
+def test_repeated_signals_get_their_own_decision():
+    signal = {"entities": ["employee"], "mentioned_fields": ["salary"], "granularity": "record_level"}
+    first, second = decide_vectorized([signal, signal], force=True)
+    assert first == second
+    first["blocked_fields"].append("tampered")
+    first["suggested_alternatives"].append("tampered")
+    assert second == decide(signal)
+
+
+def test_sparse_policies_fall_back_to_decide_batch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(policy_matrix, "decide_batch", lambda signals, tenant=None: calls.append(len(signals)) or [])
+    signals = [{"entities": ["employee"], "mentioned_fields": ["salary"]}]
+
+    # Too few signals
+    decide_vectorized(signals)
+    # The shipped policies hold one policy per slot
+    assert policy_matrix.get_policy_matrix().density < policy_matrix.MIN_SLOT_DENSITY
+    decide_vectorized(signals * policy_matrix.MIN_SIGNALS)
+    assert calls == [1, policy_matrix.MIN_SIGNALS]
@@ -0,0 +1,20 @@
+import importlib
+
+import pytest
+
+from conftest import requires_models
+
+
+@requires_models
+@pytest.mark.parametrize("module, task", [
+    ("intent_predictor", "intent"),
+    ("domain_predictor", "domain"),
+    ("granularity_predictor", "granularity"),
+])
+def test_model_attribute_is_kept(module, task):
+    predictor = importlib.import_module(module)
+    assert predictor.model is getattr(predictor.classifier, "model", predictor.classifier)
+    if predictor.BACKEND == "torch":
+        assert predictor.model.config.id2label == predictor.classifier.task_labels[task]
+    with pytest.raises(AttributeError):
+        predictor.no_such_attribute
@@ -0,0 +1,59 @@
+import decision_engine
+import orchestrator
+
+
+def test_whitespace_variants_are_cached_separately(fake_models):
+    # The extractor only sees "all information" with a single space, so
+    # the two prompts decide differently and must not share an entry
+    double = "Show me 1 doctor with all  information"
+    single = "Show me 1 doctor with all information"
+    expected = orchestrator.run_guardrail_batch([double, single])
+    assert expected[0]["decision"]["action"] != expected[1]["decision"]["action"]
+
+    cache = orchestrator.enable_result_cache()
+    assert orchestrator.run_guardrail(double) == expected[0]
+    assert orchestrator.run_guardrail(single) == expected[1]
+    assert cache.stats()["hits"] == 0
+
+
+def test_cached_result_is_returned_for_the_same_prompt(fake_models):
+    prompt = "Show me 1 doctor with all information"
+    expected = orchestrator.run_guardrail(prompt)
+
+    cache = orchestrator.enable_result_cache()
+    first = orchestrator.run_guardrail_batch([prompt, prompt])
+    again = orchestrator.run_guardrail(prompt)
+    assert first == [expected, expected]
+    assert again == expected
+    assert cache.stats()["hits"] == 1
+
+    # Callers get their own copy
+    again["decision"]["blocked_fields"].append("tampered")
+    assert orchestrator.run_guardrail(prompt) == expected
+
+
+def test_configuration_changes_miss_the_cache(fake_models, monkeypatch):
+    prompt = "Show me 1 doctor with all information"
+    cache = orchestrator.enable_result_cache()
+    orchestrator.run_guardrail(prompt)
+
+    monkeypatch.setattr(orchestrator, "GRANULARITY_CONFIDENCE_THRESHOLD", 0.95)
+    orchestrator.run_guardrail(prompt)
+    monkeypatch.setattr(orchestrator, "BACKEND", "onnx")
+    orchestrator.run_guardrail(prompt)
+    monkeypatch.setitem(decision_engine.SAFE_AGGREGATE_TEMPLATES, "doctor", ["Count doctors"])
+    assert orchestrator.run_guardrail(prompt)["suggested_alternatives"] == ["Count doctors"]
+    assert cache.stats()["hits"] == 0
+
+    orchestrator.run_guardrail(prompt)
+    assert cache.stats()["hits"] == 1
+
+
+def test_model_version_does_not_load_models(monkeypatch):
+    def no_loading(name):
+        raise AssertionError(f"loaded {name}")
+
+    monkeypatch.setattr(orchestrator, "_get_model", no_loading)
+    version = orchestrator.model_version()
+    monkeypatch.setattr(orchestrator, "BACKEND", "onnx-int8")
+    assert orchestrator.model_version() != version
@@ -0,0 +1,96 @@
+import json
+import os
+import queue
+import socket
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from sidecar_client import SidecarClient, SidecarError
+
+
+class FakeSidecar:
+    """A Unix socket server that hands each request to the test."""
+
+    def __init__(self, path: str):
+        self.requests = queue.Queue()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(1)
+        self._conn = None
+        self._accepted = threading.Event()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        self._conn, _ = self._server.accept()
+        self._accepted.set()
+        for line in self._conn.makefile("rb"):
+            self.requests.put(json.loads(line))
+
+    def send(self, data: bytes):
+        self._accepted.wait(5)
+        self._conn.sendall(data)
+
+    def reply(self, request: dict, **fields):
+        self.send(json.dumps({"id": request["id"], **fields}).encode() + b"\n")
+
+    def close(self):
+        if self._conn is not None:
+            # The reader's makefile() keeps the descriptor open past close()
+            try:
+                self._conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._conn.close()
+        self._server.close()
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    path = os.path.join(tmp_path, "sidecar.sock")
+    server = FakeSidecar(path)
+    client = SidecarClient(unix_path=path, timeout=5)
+    yield server, client
+    client.close()
+    server.close()
+
+
+def test_malformed_response_fails_pending_and_closes(sidecar):
+    server, client = sidecar
+    futures = [client.submit({"prompt": "a"}), client.submit({"prompt": "b"})]
+    server.requests.get(timeout=5)
+    server.send(b"not json\n")
+
+    for future in futures:
+        with pytest.raises(SidecarError, match="Connection lost"):
+            future.result(timeout=5)
+    with pytest.raises(SidecarError, match="closed"):
+        client.submit({"prompt": "c"})
+
+
+def test_server_disconnect_fails_pending(sidecar):
+    server, client = sidecar
+    future = client.submit({"prompt": "a"})
+    server.requests.get(timeout=5)
+    server.close()
+
+    with pytest.raises(SidecarError, match="closed"):
+        future.result(timeout=5)
+
+
+def test_timeout_forgets_the_request(sidecar):
+    server, client = sidecar
+    client.timeout = 0.05
+    with pytest.raises(TimeoutError):
+        client.run_guardrail("slow")
+    assert client._pending == {}
+
+    # The late answer is dropped; the connection keeps working
+    server.reply(server.requests.get(timeout=5), result={"late": True})
+    client.timeout = 5
+    answered = threading.Thread(target=lambda: server.reply(server.requests.get(timeout=5), result={"ok": True}))
+    answered.start()
+    assert client.run_guardrail("fast") == {"ok": True}
+    answered.join()
+    assert client._pending == {}
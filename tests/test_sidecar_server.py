@@ -0,0 +1,58 @@
+import asyncio
+import json
+import threading
+
+import orchestrator
+from sidecar_server import SidecarServer
+
+
+async def _request(reader, writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def test_closed_connection_drops_its_queued_requests(tmp_path, fake_models, monkeypatch):
+    path = str(tmp_path / "sidecar.sock")
+    computed = []
+    started = threading.Event()
+    release = threading.Event()
+    run_batch = orchestrator.run_guardrail_batch
+
+    def blocking_batch(prompts, tenant=None):
+        computed.append(prompts)
+        started.set()
+        release.wait(5)
+        return run_batch(prompts, tenant)
+
+    monkeypatch.setattr(orchestrator, "run_guardrail_batch", blocking_batch)
+
+    async def scenario():
+        server = SidecarServer(max_batch_size=1, max_wait_ms=0)
+        await server.start(unix_path=path)
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            first = asyncio.create_task(_request(reader, writer, {"id": 1, "prompt": "Show me 1 doctor"}))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+            # Queued behind the running batch, then abandoned
+            _, gone = await asyncio.open_unix_connection(path)
+            gone.write(json.dumps({"id": 2, "prompt": "abandoned"}).encode() + b"\n")
+            await gone.drain()
+            await asyncio.sleep(0.1)
+            gone.close()
+            await asyncio.sleep(0.1)
+
+            release.set()
+            assert (await first)["result"]["original_prompt"] == "Show me 1 doctor"
+            third = await _request(reader, writer, {"id": 3, "prompt": "Show me 2 doctors"})
+            assert third["result"]["original_prompt"] == "Show me 2 doctors"
+            writer.close()
+            return server.snapshot()
+        finally:
+            release.set()
+            await server.close()
+
+    stats = asyncio.run(scenario())
+    assert computed == [["Show me 1 doctor"], ["Show me 2 doctors"]]
+    assert stats["cancelled"] == 1
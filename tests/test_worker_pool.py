@@ -0,0 +1,93 @@
+import os
+import signal
+import time
+
+import pytest
+
+import decision_engine
+import orchestrator
+from decision_log import read_decisions
+from worker_pool import WorkerPool
+
+
+@pytest.fixture
+def pool(fake_models, monkeypatch):
+    evaluate = orchestrator._evaluate_batch
+
+    def evaluate_batch(prompts, tenant=None):
+        if prompts == ["slow"]:
+            time.sleep(60)
+        return evaluate(prompts, tenant)
+
+    # Inherited by the forked workers
+    monkeypatch.setattr(orchestrator, "warmup", lambda: None)
+    monkeypatch.setattr(orchestrator, "_evaluate_batch", evaluate_batch)
+    pool = WorkerPool(num_workers=2, threads_per_worker=1).start()
+    yield pool
+    for worker in pool._workers:
+        if worker.process.exitcode is None:
+            worker.process.kill()
+    pool.close()
+
+
+def _prompt(result):
+    return result["original_prompt"]
+
+
+def _kill(worker):
+    os.kill(worker.process.pid, signal.SIGKILL)
+    worker.process.join(5)
+
+
+def test_dead_worker_fails_its_pending_requests(pool):
+    slow = pool.submit_batch(["slow"])
+    busy = next(w for w in pool._workers if w.pending)
+    _kill(busy)
+
+    with pytest.raises(RuntimeError, match="exited"):
+        slow.result(timeout=5)
+    assert pool.live_workers() == 1
+
+
+def test_dead_worker_is_never_picked(pool):
+    # Idle, so the least-loaded choice would favour it
+    _kill(pool._workers[0])
+
+    for _ in range(4):
+        assert pool.run("Show me 1 doctor", timeout=5)["decision"]["action"]
+    assert pool.live_workers() == 1
+    assert len(pool.run_batch(["Show me 1 doctor"] * 3, timeout=5)) == 3
+
+    _kill(pool._workers[1])
+    with pytest.raises(RuntimeError, match="no live workers"):
+        pool.submit_batch(["Show me 1 doctor"])
+
+
+def test_results_are_logged_by_the_parent(pool, tmp_path):
+    orchestrator.enable_decision_log(str(tmp_path))
+    try:
+        results = pool.run_batch([f"Show me {i} doctor" for i in range(4)], timeout=5)
+    finally:
+        orchestrator.disable_decision_log()
+
+    # Each worker's slice is logged as it arrives
+    logged = [record["result"] for record in read_decisions(str(tmp_path))]
+    assert sorted(logged, key=_prompt) == sorted(results, key=_prompt)
+
+
+def test_start_refuses_background_threads(tmp_path, fake_models):
+    orchestrator.enable_decision_log(str(tmp_path))
+    try:
+        with pytest.raises(RuntimeError, match="decision log"):
+            WorkerPool(num_workers=1).start()
+    finally:
+        orchestrator.disable_decision_log()
+
+
+def test_start_refuses_a_polling_policy_store(tmp_path, fake_models):
+    decision_engine.enable_policy_store(str(tmp_path), poll_interval_s=60)
+    try:
+        with pytest.raises(RuntimeError, match="policy store"):
+            WorkerPool(num_workers=1).start()
+    finally:
+        decision_engine.disable_policy_store()
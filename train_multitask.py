@@ -0,0 +1,146 @@
+import numpy as np
+from datasets import load_dataset, concatenate_datasets
+from transformers import (
+    AutoTokenizer,
+    AutoModel,
+    TrainingArguments,
+    Trainer
+)
+from sklearn.metrics import accuracy_score, f1_score
+
+from multitask_model import MultiTaskClassifier, TASKS
+
+MODEL_NAME = "distilroberta-base"
+OUTPUT_DIR = "multitask_model"
+
+# Replaces train_intent.py / train_domain.py / train_granularity.py when the
+# orchestrator runs with ABBOX_MODEL_MODE=multitask.
+DATA_FILES = {
+    "intent": {
+        "train": "data/intent_train.jsonl",
+        "validation": "data/intent_valid.jsonl"
+    },
+    "domain": {
+        "train": "data/domain_train.jsonl",
+        "validation": "data/domain_valid.jsonl"
+    },
+    "granularity": {
+        "train": "data/granularity_train.jsonl",
+        "validation": "data/granularity_valid.jsonl"
+    },
+}
+
+# The domain and granularity sets are tiny next to the intent set;
+# repeat them so every head sees enough updates per epoch.
+MIN_TRAIN_ROWS_PER_TASK = 1000
+
+LABEL_COLUMNS = [f"{task}_labels" for task in TASKS]
+
+
+def compute_metrics(eval_pred):
+    logits, labels = eval_pred
+    metrics = {}
+    f1s = []
+
+    for task, task_logits, task_labels in zip(TASKS, logits, labels):
+        mask = task_labels != -100
+        if not mask.any():
+            continue
+        preds = np.argmax(task_logits[mask], axis=-1)
+        metrics[f"{task}_accuracy"] = accuracy_score(task_labels[mask], preds)
+        metrics[f"{task}_f1_macro"] = f1_score(task_labels[mask], preds, average="macro")
+        f1s.append(metrics[f"{task}_f1_macro"])
+
+    metrics["f1_macro"] = float(np.mean(f1s)) if f1s else 0.0
+    return metrics
+
+
+def main():
+    # 1) Load every task and build its label ↔ id mapping
+    task_labels = {}
+    train_parts = []
+    valid_parts = []
+
+    for task in TASKS:
+        dataset = load_dataset("json", data_files=DATA_FILES[task])
+
+        labels = sorted(set(dataset["train"]["label"]))
+        label2id = {lbl: i for i, lbl in enumerate(labels)}
+        task_labels[task] = labels
+
+        # Rows carry a label for their own task and -100 for the others
+        def encode_labels(example, task=task, label2id=label2id):
+            for other in TASKS:
+                example[f"{other}_labels"] = -100
+            example[f"{task}_labels"] = label2id[example["label"]]
+            return example
+
+        dataset = dataset.map(encode_labels)
+
+        train = dataset["train"]
+        repeats = max(1, MIN_TRAIN_ROWS_PER_TASK // len(train))
+        train_parts.extend([train] * repeats)
+        valid_parts.append(dataset["validation"])
+
+    train = concatenate_datasets(train_parts).shuffle(seed=42)
+    valid = concatenate_datasets(valid_parts)
+
+    # 2) Tokenize text
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+
+    def tokenize(batch):
+        return tokenizer(
+            batch["text"],
+            truncation=True,
+            padding="max_length",
+            max_length=128
+        )
+
+    train = train.map(tokenize, batched=True).remove_columns(["text", "label"])
+    valid = valid.map(tokenize, batched=True).remove_columns(["text", "label"])
+    train.set_format("torch")
+    valid.set_format("torch")
+
+    # 3) One shared encoder, one head per task
+    # NOTE: These heads are signals only.
+    # They must never be used as the sole authority for allowing data mutation.
+    encoder = AutoModel.from_pretrained(MODEL_NAME, add_pooling_layer=False)
+    model = MultiTaskClassifier(encoder, task_labels)
+
+    # 4) Training configuration
+    args = TrainingArguments(
+        output_dir="out_multitask",
+        learning_rate=2e-5,
+        per_device_train_batch_size=16,
+        per_device_eval_batch_size=64,
+        num_train_epochs=6,
+        eval_strategy="epoch",
+        save_strategy="epoch",
+        logging_steps=20,
+        load_best_model_at_end=True,
+        metric_for_best_model="f1_macro",
+        label_names=LABEL_COLUMNS,
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=args,
+        train_dataset=train,
+        eval_dataset=valid,
+        compute_metrics=compute_metrics,
+    )
+
+    # 5) Train
+    trainer.train()
+
+    # 6) Save encoder + heads + tokenizer
+    trainer.model.save_pretrained(OUTPUT_DIR)
+    tokenizer.save_pretrained(OUTPUT_DIR)
+
+    print(f"Saved to ./{OUTPUT_DIR}")
+    for task in TASKS:
+        print(f"{task} labels:", task_labels[task])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import gc
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, List
+
+import decision_engine
+import orchestrator
+
+_STOP = None
+
+
+def _read_memory(pid: int) -> Dict:
+    """
+    RSS / PSS / shared and private bytes of a process, from
+    /proc/<pid>/smaps_rollup (Linux 4.14+). PSS splits each shared page
+    between the processes mapping it, so summing PSS over the pool gives
+    its real footprint; RSS counts shared weights once per worker.
+    """
+    fields = {
+        "Rss": "rss",
+        "Pss": "pss",
+        "Shared_Clean": "shared_clean",
+        "Shared_Dirty": "shared_dirty",
+        "Private_Clean": "private_clean",
+        "Private_Dirty": "private_dirty",
+    }
+    memory = {"pid": pid}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+def _worker_main(conn, threads_per_worker: int):
+    # Only this process's own threads are pinned; the weights stay the
+    # pages inherited from the parent.
+    if orchestrator.BACKEND == "torch":
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is _STOP:
+            break
+
+        request_id, prompts = message
+        try:
+            # Recorded (metrics, decision log) by the parent, not here
+            conn.send((request_id, True, orchestrator._evaluate_batch(prompts)))
+        except Exception as exc:
+            conn.send((request_id, False, f"{type(exc).__name__}: {exc}"))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        # request id -> Future, for requests sent but not yet answered
+        self.pending = {}
+        self.reader = None
+        # Cleared once the worker's pipe breaks or it exits; a dead
+        # worker is never picked again
+        self.alive = True
+
+
+class WorkerPool:
+    """
+    Pre-fork pool of processes serving run_guardrail_batch.
+
+    start() loads the models in this process, freezes the heap out of the
+    garbage collector's reach and then forks, so the workers share the
+    parent's model weights copy-on-write instead of loading their own.
+    Requests go to the live worker with the fewest requests in flight.
+    A worker that dies fails the requests it owed and is dropped from
+    the pool; it is not respawned, since forking again from the parent
+    would copy the reader threads' state.
+
+    Results are recorded (metrics, decision log) in this process as they
+    arrive, so enable_decision_log() after start() logs every result the
+    pool serves.
+
+    Requires the "fork" start method (Linux). Start the pool before
+    enable_micro_batching(), enable_parallel_stages(),
+    enable_decision_log() or a polling enable_policy_store(): threads do
+    not survive fork.
+    """
+
+    def __init__(self, num_workers: int = None, threads_per_worker: int = None):
+        cores = os.cpu_count() or 1
+        self.num_workers = num_workers or cores
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.num_workers)
+
+        self._workers: List[_Worker] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> "WorkerPool":
+        store = decision_engine._policy_store
+        if (
+            orchestrator._micro_batcher is not None
+            or orchestrator._stage_pool is not None
+            or orchestrator._decision_log is not None
+            or (store is not None and store.poll_interval_s is not None)
+        ):
+            raise RuntimeError(
+                "Start the worker pool before enabling micro-batching, parallel stages, "
+                "the decision log or a polling policy store"
+            )
+
+        # The fast tokenizers' own thread pool must not be forked mid-use
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        orchestrator.warmup()
+        # Objects alive now are never scanned by the collector again, so
+        # workers do not write to (and un-share) the pages holding them
+        gc.collect()
+        gc.freeze()
+
+        context = multiprocessing.get_context("fork")
+        for i in range(self.num_workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(child_conn, self.threads_per_worker),
+                name=f"guardrail-worker-{i}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._workers.append(_Worker(process, parent_conn))
+
+        # Reader threads start only after the last fork
+        for worker in self._workers:
+            worker.reader = threading.Thread(
+                target=self._read_results,
+                args=(worker,),
+                name=f"{worker.process.name}-reader",
+                daemon=True,
+            )
+            worker.reader.start()
+
+        gc.unfreeze()
+        return self
+
+    def submit_batch(self, prompts: List[str]) -> Future:
+        future = Future()
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("WorkerPool is not running")
+                live = self._live_workers()
+                if not live:
+                    raise RuntimeError("WorkerPool has no live workers")
+                worker = min(live, key=lambda w: len(w.pending))
+                request_id = next(self._ids)
+                worker.pending[request_id] = future
+
+            try:
+                with worker.send_lock:
+                    worker.conn.send((request_id, prompts))
+                return future
+            except (BrokenPipeError, OSError):
+                with self._lock:
+                    owned = worker.pending.pop(request_id, None) is not None
+                self._drop_worker(worker)
+                if not owned:
+                    # The reader already failed it
+                    return future
+                # Not sent: try the next worker
+
+    def run_batch(self, prompts: List[str], timeout: float = None) -> List[Dict]:
+        """
+        Split prompts into one slice per live worker, run the slices in
+        parallel and return the results in input order.
+        """
+        if not prompts:
+            return []
+        with self._lock:
+            workers = max(1, len(self._live_workers()))
+        size = -(-len(prompts) // workers)
+        futures = [self.submit_batch(prompts[i:i + size]) for i in range(0, len(prompts), size)]
+        return [result for future in futures for result in future.result(timeout=timeout)]
+
+    def run(self, prompt: str, timeout: float = None) -> Dict:
+        return self.submit_batch([prompt]).result(timeout=timeout)[0]
+
+    def live_workers(self) -> int:
+        with self._lock:
+            return len(self._live_workers())
+
+    def memory(self) -> List[Dict]:
+        """
+        Per-live-worker memory, plus the parent as the first entry.
+        """
+        with self._lock:
+            pids = [os.getpid()] + [w.process.pid for w in self._live_workers()]
+        return [_read_memory(pid) for pid in pids]
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(_STOP)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self._workers:
+            worker.process.join()
+            worker.reader.join()
+            worker.conn.close()
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_results(self, worker: _Worker):
+        while True:
+            try:
+                request_id, ok, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = worker.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                try:
+                    orchestrator._record_results(payload)
+                except RuntimeError:
+                    # The decision log was closed meanwhile
+                    pass
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+        # The worker exited (or crashed)
+        self._drop_worker(worker)
+
+    def _live_workers(self) -> List[_Worker]:
+        # Caller holds self._lock. exitcode catches a crash before the
+        # reader has seen the pipe close.
+        return [w for w in self._workers if w.alive and w.process.exitcode is None]
+
+    def _drop_worker(self, worker: _Worker):
+        # Fail whatever it still owed
+        with self._lock:
+            worker.alive = False
+            pending, worker.pending = worker.pending, {}
+        exitcode = worker.process.exitcode
+        for future in pending.values():
+            future.set_exception(RuntimeError(f"Worker {worker.process.pid} exited (exit code {exitcode})"))
+
+
+if __name__ == "__main__":
+    import json
+
+    with WorkerPool() as pool:
+        results = pool.run_batch(["What is the customer email?"] * pool.num_workers)
+        print(json.dumps(results[0], indent=2))
+        for memory in pool.memory():
+            print(memory)